@@ -0,0 +1,68 @@
+# Runs a series of small extractions the way a build system does: with one command line process
+# per call, or with one Msys2dl instance for all calls, against a local mirror stand-in.
+#
+#   python -m benchmarks.bench_api
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import KEYS_PATH, make_repository_files, timed
+from benchmarks.fake_mirror import FakeMirror, FaultProfile
+from benchmarks.signing import ThrowawayKey
+from benchmarks.synthetic import RepositoryShape, SyntheticRepository
+from msys2dl.api import ApplicationOptions, Msys2dl
+from msys2dl.package import Environment
+
+N_PACKAGES = 3000
+N_CALLS = 20
+PROFILE = FaultProfile(latency=0.02)
+
+
+def main() -> None:
+    environment = Environment.by_name_or_raise("mingw64")
+    repository = SyntheticRepository(environment, RepositoryShape(n_packages=N_PACKAGES, n_files=5))
+    targets = random.Random(0).sample(repository.packages, N_CALLS)  # noqa: S311
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        tmp = Path(tmp_str)
+        files = make_repository_files(key, repository, targets)
+        print(f"{N_CALLS} extractions of one package each, {N_PACKAGES} packages in the database:")
+        with FakeMirror(files, PROFILE) as mirror:
+            cli_args = [
+                *("--base-url", mirror.url, "--keys-url", mirror.url + KEYS_PATH),
+                *("extract", "--no-deps", "--output", str(tmp / "cli-output")),
+            ]
+            env = {**os.environ, "MSYS2DL_HOME": str(tmp / "cli-home")}
+            cli_durations = [
+                timed(
+                    lambda: subprocess.run(
+                        [sys.executable, "-m", "msys2dl.main", *cli_args, target.name],
+                        env=env,
+                        capture_output=True,
+                        check=True,
+                    )
+                )
+                for target in targets
+            ]
+
+            options = ApplicationOptions(
+                home=tmp / "api-home", base_url=[mirror.url], keys_url=mirror.url + KEYS_PATH, quiet=True
+            )
+            with Msys2dl(options) as msys2dl:
+                api_durations = [
+                    timed(lambda: msys2dl.extract([target.name], tmp / "api-output", with_dependencies=False))
+                    for target in targets
+                ]
+
+        for name, durations in (("process per call", cli_durations), ("one Msys2dl instance", api_durations)):
+            print(
+                f"  {name}: {sum(durations):.2f} s in total, first call {durations[0] * 1000:.0f} ms, "
+                f"median of the others {statistics.median(durations[1:]) * 1000:.0f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Keeps a flat apt repository of make-deb output up to date against a local mirror stand-in:
+# make-deb --apt-index only builds the debs missing from the index and adds them with the hashes
+# computed as they are written, compared with regenerating the index with dpkg-scanpackages. Also checks that both index the same debs.
+#
+#   python -m benchmarks.bench_apt_index
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import KEYS_PATH, make_repository_files, timed
+from benchmarks.fake_mirror import FakeMirror
+from benchmarks.signing import ThrowawayKey
+from benchmarks.synthetic import RepositoryShape, SyntheticRepository
+from msys2dl.apt_index import parse_control
+from msys2dl.package import Environment
+
+N_PACKAGES = 2000
+N_ROOTS = 10
+CHURN = 0.02  # share of the packages updated upstream
+
+
+def run_make_deb(
+    mirror: FakeMirror, output: Path, roots: list[str], env: dict[str, str], trace: Path
+) -> None:
+    argv = ["--base-url", mirror.url, "--keys-url", mirror.url + KEYS_PATH, "--trace", str(trace)]
+    argv += ["make-deb", "--apt-index", "--output", str(output), *roots]
+    subprocess.run([sys.executable, "-m", "msys2dl.main", *argv], env=env, capture_output=True, check=True)
+
+
+def index_time(trace: Path) -> float:
+    # Hashing of the written debs and writing of the index, in seconds
+    events = json.loads(trace.read_text())
+    events = events["traceEvents"] if isinstance(events, dict) else events
+    return (
+        float(sum(event.get("dur", 0) for event in events if event.get("name") in ("index", "apt index")))
+        / 1e6
+    )
+
+
+def indexed_debs(packages: str) -> set[tuple[str, str]]:
+    return {
+        (Path(fields["Filename"]).name, fields["SHA256"])
+        for fields in map(parse_control, packages.split("\n\n"))
+        if "Filename" in fields
+    }
+
+
+def main() -> None:
+    if shutil.which("dpkg-scanpackages") is None:
+        print("dpkg-scanpackages not found")
+        return
+    rng = random.Random(0)  # noqa: S311
+    environment = Environment.by_name_or_raise("mingw64")
+    repository = SyntheticRepository(environment, RepositoryShape(n_packages=N_PACKAGES, n_files=5))
+    roots = [package.name for package in rng.sample(repository.roots, N_ROOTS)]
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        tmp = Path(tmp_str)
+        output = tmp / "repo"
+        env = {**os.environ, "MSYS2DL_HOME": str(tmp / "home")}
+        with FakeMirror(make_repository_files(key, repository, repository.packages)) as mirror:
+            run_make_deb(mirror, output, roots, env, tmp / "initial.json")
+        initial = index_time(tmp / "initial.json")
+        n_debs = len(list(output.glob("*.deb")))
+
+        updated = rng.sample(repository.packages, round(N_PACKAGES * CHURN))
+        for package in updated:
+            package.version = "2.0-1"
+            package.filename = f"{package.name}-{package.version}-any.pkg.tar.zst"
+        with FakeMirror(make_repository_files(key, repository, repository.packages)) as mirror:
+            # The databases on disk are kept by make-deb: start from a fresh home to see the update
+            shutil.rmtree(tmp / "home" / "db")
+            update_total = timed(lambda: run_make_deb(mirror, output, roots, env, tmp / "update.json"))
+        update = index_time(tmp / "update.json")
+        n_new = len(list(output.glob("*.deb"))) - n_debs
+
+        scan_output = ""
+
+        def scan() -> None:
+            nonlocal scan_output
+            scan_output = subprocess.run(
+                ["dpkg-scanpackages", "--multiversion", "."],  # noqa: S607
+                cwd=output,
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout
+
+        rescan = timed(scan)
+        same = indexed_debs((output / "Packages").read_text()) == indexed_debs(scan_output)
+        print(
+            f"apt repository of {n_debs} debs, then {n_new} new debs after {len(updated)} upstream updates:"
+        )
+        print(f"  make-deb --apt-index, initial: {initial:.2f} s in hashing and indexing")
+        print(f"  make-deb --apt-index, update: {update_total:.2f} s, {update:.2f} s in hashing and indexing")
+        print(f"  dpkg-scanpackages of the whole directory: {rescan:.2f} s")
+        print(f"  same debs indexed: {'yes' if same else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
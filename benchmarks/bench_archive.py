@@ -0,0 +1,76 @@
+# Builds a sysroot archive against a local mirror stand-in: with extract --format tar.zst, which
+# streams the package members into the archive, or by extracting into a directory and archiving
+# that. Also checks that both archives have the same files.
+#
+#   python -m benchmarks.bench_archive
+import os
+import tarfile
+import tempfile
+from pathlib import Path
+
+import zstandard as zstd
+
+from benchmarks.common import KEYS_PATH, make_repository_files, run_cli, timed
+from benchmarks.fake_mirror import FakeMirror
+from benchmarks.signing import ThrowawayKey
+from benchmarks.synthetic import RepositoryShape, SyntheticRepository
+from msys2dl.package import Environment
+
+N_PACKAGES = 2000
+N_ROOTS = 10
+N_FILES = 40
+
+
+def archive_directory(directory: Path, path: Path) -> None:
+    with (
+        path.open("wb") as file,
+        zstd.ZstdCompressor(threads=-1).stream_writer(file) as writer,
+        tarfile.open(fileobj=writer, mode="w|", format=tarfile.PAX_FORMAT) as tar,
+    ):
+        for child in sorted(directory.iterdir()):
+            tar.add(child, arcname=child.name)
+
+
+def archive_files(path: Path) -> dict[str, bytes]:
+    with (
+        path.open("rb") as file,
+        zstd.ZstdDecompressor().stream_reader(file) as reader,
+        tarfile.open(fileobj=reader, mode="r|") as tar,
+    ):
+        return {
+            member.name: tar.extractfile(member).read()  # type: ignore[union-attr]
+            for member in tar
+            if member.isreg()
+        }
+
+
+def main() -> None:
+    environment = Environment.by_name_or_raise("mingw64")
+    repository = SyntheticRepository(environment, RepositoryShape(n_packages=N_PACKAGES, n_files=N_FILES))
+    roots = [package.name for package in repository.roots[:N_ROOTS]]
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        tmp = Path(tmp_str)
+        env = {**os.environ, "MSYS2DL_HOME": str(tmp / "home")}
+        with FakeMirror(make_repository_files(key, repository, repository.packages)) as mirror:
+            mirror_args = ["--base-url", mirror.url, "--keys-url", mirror.url + KEYS_PATH]
+            # Downloads the packages, so that both variants only extract and compress
+            run_cli([*mirror_args, "extract", "--output", str(tmp / "warmup"), *roots], env)
+            archive_args = ["extract", "--format", "tar.zst", "--output", str(tmp / "streamed.tar.zst")]
+            streamed = timed(lambda: run_cli([*mirror_args, *archive_args, *roots], env))
+
+            def extract_and_archive() -> None:
+                run_cli([*mirror_args, "extract", "--output", str(tmp / "tree"), *roots], env)
+                archive_directory(tmp / "tree", tmp / "tree.tar.zst")
+
+            two_steps = timed(extract_and_archive)
+        n_files = sum(1 for path in (tmp / "tree").rglob("*") if path.is_file())
+        same = archive_files(tmp / "streamed.tar.zst") == archive_files(tmp / "tree.tar.zst")
+        size = (tmp / "streamed.tar.zst").stat().st_size
+        print(f"sysroot archive of {n_files} files, {size / 1024 / 1024:.1f} MiB:")
+        print(f"  extract --format tar.zst: {streamed:.2f} s")
+        print(f"  extract into a directory, then archive it: {two_steps:.2f} s")
+        print(f"  same files: {'yes' if same else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Builds a sysroot and its Debian packages for three environments against a local mirror stand-in:
+# with one process per environment and command, or with one batch manifest listing all of them.
+#
+#   python -m benchmarks.bench_batch
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+
+from benchmarks.common import KEYS_PATH, make_repository_files, run_cli, timed
+from benchmarks.fake_mirror import FakeMirror, FaultProfile
+from benchmarks.signing import ThrowawayKey
+from benchmarks.synthetic import RepositoryShape, SyntheticRepository
+from msys2dl.package import Environment
+
+ENVIRONMENTS = ("mingw64", "ucrt64", "clang64")
+N_PACKAGES = 1500
+N_ROOTS = 5
+SHAPE = RepositoryShape(n_packages=N_PACKAGES, graph="hub", mean_dependencies=2.0, n_files=5)
+PROFILE = FaultProfile(latency=0.02)
+
+
+def main() -> None:
+    repositories = [SyntheticRepository(Environment.by_name_or_raise(name), SHAPE) for name in ENVIRONMENTS]
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        tmp = Path(tmp_str)
+        files: dict[str, bytes] = {}
+        for repository in repositories:
+            files.update(make_repository_files(key, repository, repository.packages))
+        targets: list[dict[str, Any]] = [
+            {
+                "command": command,
+                "include": [package.name for package in repository.roots[:N_ROOTS]],
+                "output": f"{command}/{name}",
+            }
+            for name, repository in zip(ENVIRONMENTS, repositories)
+            for command in ("extract", "make-deb")
+        ]
+        print(
+            f"extract and make-deb of {N_ROOTS} packages and their dependencies in {len(ENVIRONMENTS)} environments:"
+        )
+        with FakeMirror(files, PROFILE) as mirror:
+            mirror_args = ["--base-url", mirror.url, "--keys-url", mirror.url + KEYS_PATH]
+
+            separate_env = {**os.environ, "MSYS2DL_HOME": str(tmp / "separate-home")}
+
+            def run_separately() -> None:
+                for target in targets:
+                    output = str(tmp / target["output"])
+                    run_cli(
+                        [*mirror_args, target["command"], "--output", output, *target["include"]],
+                        separate_env,
+                    )
+
+            separate = timed(run_separately)
+
+            manifest = tmp / "batch" / "manifest.json"
+            manifest.parent.mkdir()
+            manifest.write_text(json.dumps({"targets": targets}))
+            batch_env = {**os.environ, "MSYS2DL_HOME": str(tmp / "batch-home")}
+            batch = timed(lambda: run_cli([*mirror_args, "batch", str(manifest)], batch_env))
+
+        print(f"  one process per environment and command: {separate:.2f} s")
+        print(f"  one batch manifest: {batch:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Compares fixed download thread counts with the adaptive mode on a mirror stand-in limited
+# by per-connection bandwidth, and on a congested one that rejects excess connections.
+#
+#   python -m benchmarks.bench_concurrency
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import make_download_requests, make_signed_files, timed
+from benchmarks.fake_mirror import FakeMirror, FaultProfile
+from benchmarks.signing import ThrowawayKey
+from msys2dl.download.concurrency_controller import ConcurrencyController
+from msys2dl.download.download_callback import DownloadCallbacks
+from msys2dl.download.download_request import DownloadRequest
+from msys2dl.download.mirror_pool import MirrorPool
+from msys2dl.download.parallel_downloader import ParallelDownloader
+from msys2dl.download.simple_downloader import SimpleDownloader
+
+N_PACKAGES = 200
+PACKAGE_SIZE = 256 * 1024
+SCENARIOS = {
+    "per-connection bandwidth limit": (FaultProfile(latency=0.05, bandwidth=1024 * 1024), [5]),
+    "congested mirror": (FaultProfile(latency=0.05, bandwidth=2 * 1024 * 1024, max_connections=4), [16]),
+}
+
+
+def run(files: dict[str, bytes], url: str, tmp: Path, key: ThrowawayKey, n_threads: int | None) -> None:
+    retries = 0
+
+    def register_callbacks(_request: DownloadRequest, callbacks: DownloadCallbacks) -> None:
+        def on_retry(_error: str) -> None:
+            nonlocal retries
+            retries += 1
+
+        callbacks.retry_handlers.register(on_retry)
+
+    mirrors = MirrorPool([url])
+    downloader = ParallelDownloader(
+        downloader=SimpleDownloader(key.make_keybox(tmp / "keybox.gpg"), mirrors),
+        n_threads=n_threads or 1,
+        adaptive_concurrency=ConcurrencyController(2, 32, initial_limit=5) if n_threads is None else None,
+    )
+    requests = make_download_requests(files, Path(tempfile.mkdtemp(dir=tmp)))
+    try:
+        seconds = timed(lambda: downloader.execute_requests(requests, register_callbacks))
+    finally:
+        downloader.close()
+    threads = f"auto (settled at {downloader.concurrency})" if n_threads is None else str(n_threads)
+    print(f"  threads={threads}: {seconds:.2f} s, {retries} retries")
+
+
+def main() -> None:
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        files = make_signed_files(key, [PACKAGE_SIZE] * N_PACKAGES)
+        for name, (profile, fixed_threads) in SCENARIOS.items():
+            print(f"{name}:")
+            with FakeMirror(files, profile) as mirror:
+                for n_threads in [*fixed_threads, None]:
+                    run(files, mirror.url, Path(tmp_str), key, n_threads)
+
+
+if __name__ == "__main__":
+    main()
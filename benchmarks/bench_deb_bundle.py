@@ -0,0 +1,80 @@
+# Converts a package and its dependencies to Debian packages against a local mirror stand-in and
+# installs them into a private dpkg root: one deb per MSYS2 package, or one bundle deb.
+#
+#   python -m benchmarks.bench_deb_bundle
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import KEYS_PATH, make_repository_files, run_cli, timed
+from benchmarks.fake_mirror import FakeMirror
+from benchmarks.signing import ThrowawayKey
+from benchmarks.synthetic import RepositoryShape, SyntheticRepository
+from msys2dl.package import Environment
+
+N_PACKAGES = 1000
+N_ROOTS = 5
+N_FILES = 20
+
+
+def install(debs: list[Path], root: Path) -> None:
+    # dpkg with its database under root, like a container image being built
+    admin_dir = root / "var/lib/dpkg"
+    for directory in ("info", "updates", "triggers"):
+        (admin_dir / directory).mkdir(parents=True)
+    (admin_dir / "status").touch()
+    (admin_dir / "available").touch()
+    subprocess.run(
+        [
+            "dpkg",
+            f"--root={root}",
+            f"--admindir={admin_dir}",
+            "--force-not-root",
+            "--force-script-chrootless",
+            "-i",
+        ]
+        + [str(deb) for deb in debs],
+        capture_output=True,
+        check=True,
+    )
+
+
+def main() -> None:
+    if shutil.which("dpkg") is None:
+        print("dpkg not found")
+        return
+    environment = Environment.by_name_or_raise("mingw64")
+    repository = SyntheticRepository(environment, RepositoryShape(n_packages=N_PACKAGES, n_files=N_FILES))
+    roots = [package.name for package in repository.roots[:N_ROOTS]]
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        tmp = Path(tmp_str)
+        env = {**os.environ, "MSYS2DL_HOME": str(tmp / "home")}
+        results = {}
+        with FakeMirror(make_repository_files(key, repository, repository.packages)) as mirror:
+            mirror_args = ["--base-url", mirror.url, "--keys-url", mirror.url + KEYS_PATH]
+            # Downloads the packages, so that both variants only convert and install
+            run_cli([*mirror_args, "make-deb", "--output", str(tmp / "warmup"), *roots], env)
+            for variant, options in (
+                ("one deb per package", []),
+                ("one bundle deb", ["--bundle", "sysroot"]),
+            ):
+                output = tmp / variant.replace(" ", "-")
+                make = timed(
+                    lambda: run_cli(
+                        [*mirror_args, "make-deb", "--output", str(output), *options, *roots], env
+                    )
+                )
+                debs = sorted(output.glob("*.deb"))
+                installation = timed(lambda: install(debs, output / "root"))
+                results[variant] = (len(debs), make, installation)
+        print(
+            f"make-deb of {N_ROOTS} packages and their dependencies, {N_FILES} files per package, then dpkg -i:"
+        )
+        for variant, (n_debs, make, installation) in results.items():
+            print(f"  {variant}: {n_debs} debs, make-deb {make:.2f} s, dpkg -i {installation:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# Compares the thread pool and the asyncio download engines on a local mirror stand-in,
+# for many small packages and for fewer large ones.
+#
+#   python -m benchmarks.bench_engines
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import make_download_requests, make_signed_files, no_callbacks, timed
+from benchmarks.fake_mirror import FakeMirror, FaultProfile
+from benchmarks.signing import ThrowawayKey
+from msys2dl.download.async_downloader import AsyncDownloader
+from msys2dl.download.download_engine import DownloadEngine
+from msys2dl.download.mirror_pool import MirrorPool
+from msys2dl.download.parallel_downloader import ParallelDownloader
+from msys2dl.download.simple_downloader import SimpleDownloader
+
+PACKAGE_SETS = {
+    "1000 x 16 KiB": [16 * 1024] * 1000,
+    "40 x 8 MiB": [8 * 1024 * 1024] * 40,
+}
+PROFILE = FaultProfile(latency=0.02)
+
+
+def make_engine(name: str, keybox_path: Path, key: ThrowawayKey, mirrors: MirrorPool) -> DownloadEngine:
+    keybox = key.make_keybox(keybox_path)
+    if name == "asyncio":
+        return AsyncDownloader(keybox=keybox, mirrors=mirrors, n_concurrent=32)
+    return ParallelDownloader(downloader=SimpleDownloader(keybox, mirrors), n_threads=32)
+
+
+def main() -> None:
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        tmp = Path(tmp_str)
+        for set_name, sizes in PACKAGE_SETS.items():
+            files = make_signed_files(key, sizes)
+            total_size = sum(sizes)
+            print(f"{set_name}:")
+            with FakeMirror(files, PROFILE) as mirror:
+                for engine_name in ("threads", "asyncio"):
+                    mirrors = MirrorPool([mirror.url])
+                    engine = make_engine(engine_name, tmp / "keybox.gpg", key, mirrors)
+                    requests = make_download_requests(files, Path(tempfile.mkdtemp(dir=tmp)))
+                    try:
+                        seconds = timed(lambda: engine.execute_requests(requests, no_callbacks))
+                    finally:
+                        engine.close()
+                    print(f"  {engine_name}: {seconds:.2f} s, {total_size / seconds / 1024**2:.1f} MiB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Looks up which package ships a file: with the command line against the files index, in-process
+# against the index, and by scanning the .files database. Also compares updating the index after
+# a few packages changed with building it from scratch.
+#
+#   python -m benchmarks.bench_files
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import KEYS_PATH, make_repository_files, timed
+from benchmarks.fake_mirror import FakeMirror
+from benchmarks.signing import ThrowawayKey
+from benchmarks.synthetic import RepositoryShape, SyntheticRepository
+from msys2dl.files_index import FilesIndex
+from msys2dl.package import Environment
+from msys2dl.utilities import decompress_zst
+
+N_PACKAGES = 3000
+N_FILES = 20
+N_CHANGED = 20
+N_RUNS = 10
+
+
+def scan_files_database(files_db: Path, path: str) -> list[str]:
+    # What a lookup costs without an index
+    tar = tarfile.open(fileobj=io.BytesIO(decompress_zst(files_db.read_bytes())), mode="r")
+    owners = []
+    for member in tar.getmembers():
+        file = tar.extractfile(member)
+        if file is not None and member.name.endswith("/files") and path in file.read().decode().splitlines():
+            owners.append(member.name.split("/")[0])
+    return owners
+
+
+def main() -> None:
+    environment = Environment.by_name_or_raise("mingw64")
+    repository = SyntheticRepository(environment, RepositoryShape(n_packages=N_PACKAGES, n_files=N_FILES))
+    query = repository.package_paths(repository.packages[N_PACKAGES // 2])[3]
+    print(f"{N_PACKAGES} packages with {N_FILES} files each, looking up {query}:")
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        tmp = Path(tmp_str)
+        files = make_repository_files(key, repository, [])
+        env = {**os.environ, "MSYS2DL_HOME": str(tmp / "home")}
+        with FakeMirror(files) as mirror:
+            argv = [
+                sys.executable,
+                "-m",
+                "msys2dl.main",
+                "--base-url",
+                mirror.url,
+                "--keys-url",
+                mirror.url + KEYS_PATH,
+            ]
+            first = timed(
+                lambda: subprocess.run([*argv, "which", "--env", "mingw64", query], env=env, check=True)
+            )
+            cli = statistics.median(
+                timed(
+                    lambda: subprocess.run([*argv, "which", query], env=env, capture_output=True, check=True)
+                )
+                for _ in range(N_RUNS)
+            )
+        print(f"  first command, downloads and indexes the files database: {first * 1000:.0f} ms")
+        print(f"  command line: {cli * 1000:.0f} ms")
+
+        files_db = tmp / "home" / "db" / "mingw64.files"
+        index = FilesIndex(tmp / "home" / "db" / "files.sqlite")
+        in_process = statistics.median(
+            timed(lambda: index.which(query, [environment])) for _ in range(N_RUNS)
+        )
+        scan = statistics.median(timed(lambda: scan_files_database(files_db, query)) for _ in range(3))
+        print(f"  index lookup in-process: {in_process * 1000:.2f} ms")
+        print(f"  scanning the .files database: {scan * 1000:.0f} ms")
+
+        full = timed(lambda: FilesIndex(tmp / "full.sqlite").update(environment, files_db))
+        for package in repository.packages[:N_CHANGED]:
+            package.version = "2.0-1"
+        files_db.write_bytes(repository.make_files_database())
+        incremental = timed(lambda: index.update(environment, files_db))
+        print(f"  building the index: {full * 1000:.0f} ms")
+        print(f"  updating the index after {N_CHANGED} packages changed: {incremental * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Downloads a package set from local mirror stand-ins where a few responses trickle,
+# with and without hedged requests, and reports per-package completion time percentiles.
+#
+#   python -m benchmarks.bench_hedging
+import contextlib
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import make_download_requests, make_signed_files, timed
+from benchmarks.fake_mirror import FakeMirror, FaultProfile
+from benchmarks.signing import ThrowawayKey
+from msys2dl.download.download_callback import DownloadCallbacks
+from msys2dl.download.download_request import DownloadRequest
+from msys2dl.download.mirror_pool import MirrorPool
+from msys2dl.download.parallel_downloader import ParallelDownloader
+from msys2dl.download.simple_downloader import SimpleDownloader
+
+N_PACKAGES = 200
+PACKAGE_SIZE = 256 * 1024
+PROFILE = FaultProfile(latency=0.01, bandwidth=4 * 1024 * 1024, stall_rate=0.03, stall_bandwidth=16 * 1024)
+
+
+def run(mirror_urls: list[str], files: dict[str, bytes], tmp: Path, key: ThrowawayKey, hedging: bool) -> None:
+    durations: list[float] = []
+
+    def register_callbacks(_request: DownloadRequest, callbacks: DownloadCallbacks) -> None:
+        start: list[float] = []
+
+        def on_progress(_bytes_downloaded: int, _bytes_total: int) -> None:
+            if not start:
+                start.append(time.monotonic())
+
+        callbacks.progress_handlers.register(on_progress)
+        callbacks.success_handlers.register(lambda: durations.append(time.monotonic() - start[0]))
+
+    mirrors = MirrorPool(mirror_urls)
+    downloader = ParallelDownloader(
+        downloader=SimpleDownloader(key.make_keybox(tmp / "keybox.gpg"), mirrors),
+        n_threads=8,
+        hedging=hedging,
+    )
+    requests = make_download_requests(files, Path(tempfile.mkdtemp(dir=tmp)))
+    try:
+        seconds = timed(lambda: downloader.execute_requests(requests, register_callbacks))
+    finally:
+        downloader.close()
+        mirrors.close()
+    percentiles = statistics.quantiles(durations, n=100)
+    print(
+        f"  hedging={hedging}: total {seconds:.2f} s, "
+        f"p50 {percentiles[49]:.2f} s, p99 {percentiles[98]:.2f} s, max {max(durations):.2f} s"
+    )
+
+
+def main() -> None:
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str, contextlib.ExitStack() as stack:
+        files = make_signed_files(key, [PACKAGE_SIZE] * N_PACKAGES)
+        urls = [stack.enter_context(FakeMirror(files, PROFILE, seed=i)).url for i in range(2)]
+        print(f"{N_PACKAGES} packages, 2 mirrors, {PROFILE.stall_rate:.0%} of responses stall:")
+        for hedging in (False, True):
+            run(urls, files, Path(tmp_str), key, hedging)
+
+
+if __name__ == "__main__":
+    main()
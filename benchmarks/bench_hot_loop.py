@@ -0,0 +1,59 @@
+# Measures download throughput of a single download thread against a local mirror stand-in,
+# with progress and interrupt callbacks registered like the application does.
+#
+#   python -m benchmarks.bench_hot_loop
+import tempfile
+import threading
+from pathlib import Path
+
+from benchmarks.common import make_download_requests, make_signed_files, timed
+from benchmarks.fake_mirror import FakeMirror
+from benchmarks.signing import ThrowawayKey
+from msys2dl.download.async_downloader import AsyncDownloader
+from msys2dl.download.download_callback import DownloadCallbacks
+from msys2dl.download.download_engine import DownloadEngine
+from msys2dl.download.download_request import DownloadRequest
+from msys2dl.download.mirror_pool import MirrorPool
+from msys2dl.download.parallel_downloader import ParallelDownloader
+from msys2dl.download.simple_downloader import SimpleDownloader
+
+N_PACKAGES = 8
+PACKAGE_SIZE = 64 * 1024 * 1024
+
+
+def main() -> None:
+    interrupted = threading.Event()
+    n_progress_events = 0
+
+    def register_callbacks(_request: DownloadRequest, callbacks: DownloadCallbacks) -> None:
+        def on_progress(_current: int, _total: int) -> None:
+            nonlocal n_progress_events
+            n_progress_events += 1
+
+        callbacks.progress_handlers.register(on_progress)
+        callbacks.is_interrupted_handlers.register(interrupted.is_set)
+
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        tmp = Path(tmp_str)
+        files = make_signed_files(key, [PACKAGE_SIZE] * N_PACKAGES)
+        keybox = key.make_keybox(tmp / "keybox.gpg")
+        with FakeMirror(files) as mirror:
+            engines: dict[str, DownloadEngine] = {
+                "threads": ParallelDownloader(
+                    downloader=SimpleDownloader(keybox, MirrorPool([mirror.url])), n_threads=1, hedging=False
+                ),
+                "asyncio": AsyncDownloader(keybox=keybox, mirrors=MirrorPool([mirror.url]), n_concurrent=1),
+            }
+            for name, engine in engines.items():
+                n_progress_events = 0
+                requests = make_download_requests(files, Path(tempfile.mkdtemp(dir=tmp)))
+                try:
+                    seconds = timed(lambda: engine.execute_requests(requests, register_callbacks))
+                finally:
+                    engine.close()
+                throughput = N_PACKAGES * PACKAGE_SIZE / seconds / 1024**2
+                print(f"{name}: {throughput:.0f} MiB/s, {n_progress_events} progress events")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Downloads a package set from local mirror stand-ins with different latency and error rates,
+# once from the first mirror only and once from the whole mirror pool.
+#
+#   python -m benchmarks.bench_mirror_pool
+import contextlib
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import make_download_requests, make_signed_files, no_callbacks, timed
+from benchmarks.fake_mirror import FakeMirror, FaultProfile
+from benchmarks.signing import ThrowawayKey
+from msys2dl.download.mirror_pool import MirrorPool
+from msys2dl.download.parallel_downloader import ParallelDownloader
+from msys2dl.download.simple_downloader import SimpleDownloader
+
+N_PACKAGES = 100
+PACKAGE_SIZE = 256 * 1024
+
+PROFILES = {
+    "flaky": FaultProfile(latency=0.02, error_rate=0.3),
+    "slow": FaultProfile(latency=0.15, bandwidth=2 * 1024 * 1024),
+    "fast": FaultProfile(latency=0.01),
+}
+
+
+def run(
+    mirror_urls: list[str], files: dict[str, bytes], tmp: Path, keybox_path: Path, key: ThrowawayKey
+) -> None:
+    dest = Path(tempfile.mkdtemp(dir=tmp))
+    mirrors = MirrorPool(mirror_urls)
+    mirrors.start_probing()
+    downloader = ParallelDownloader(
+        downloader=SimpleDownloader(key.make_keybox(keybox_path), mirrors), n_threads=5
+    )
+    try:
+        seconds = timed(
+            lambda: downloader.execute_requests(make_download_requests(files, dest), no_callbacks)
+        )
+    finally:
+        downloader.close()
+        mirrors.close()
+    print(f"  total: {seconds:.2f} s")
+    for mirror in mirrors.mirrors:
+        latency = f"{mirror.latency * 1000:.0f} ms" if mirror.latency is not None else "-"
+        print(
+            f"  {mirror.url}: {mirror.n_requests} requests, {mirror.n_failures} failures, latency {latency}"
+        )
+
+
+def main() -> None:
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        tmp = Path(tmp_str)
+        files = make_signed_files(key, [PACKAGE_SIZE] * N_PACKAGES)
+        with contextlib.ExitStack() as stack:
+            mirrors = {
+                name: stack.enter_context(FakeMirror(files, profile, seed=i))
+                for i, (name, profile) in enumerate(PROFILES.items())
+            }
+            print("Single mirror (flaky):")
+            run([mirrors["flaky"].url], files, tmp, tmp / "keybox.gpg", key)
+            print("Mirror pool (flaky, slow, fast):")
+            run([m.url for m in mirrors.values()], files, tmp, tmp / "keybox.gpg", key)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Writes a sysroot as an OCI image against a local mirror stand-in, then updates it after a day
+# of upstream changes: in the same layout, which reuses the layers of unchanged packages, or in a
+# fresh one. Also checks that both give the same layers, and that unpacking the layers gives the
+# files of extract.
+#
+#   python -m benchmarks.bench_oci
+import filecmp
+import json
+import os
+import random
+import tarfile
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import KEYS_PATH, list_files, make_repository_files, run_cli, timed
+from benchmarks.fake_mirror import FakeMirror
+from benchmarks.signing import ThrowawayKey
+from benchmarks.synthetic import RepositoryShape, SyntheticRepository
+from msys2dl.package import Environment
+
+N_PACKAGES = 2000
+N_ROOTS = 10
+CHURN = 0.02  # share of the packages updated upstream
+
+
+def image_layers(layout: Path) -> list[str]:
+    index = json.loads((layout / "index.json").read_text())
+    manifest_digest = index["manifests"][-1]["digest"].removeprefix("sha256:")
+    manifest = json.loads((layout / "blobs" / "sha256" / manifest_digest).read_text())
+    return [layer["digest"].removeprefix("sha256:") for layer in manifest["layers"]]
+
+
+def unpack(layout: Path, dst: Path) -> None:
+    for digest in image_layers(layout):
+        with tarfile.open(layout / "blobs" / "sha256" / digest) as tar:
+            tar.extractall(dst, filter="data")
+
+
+def main() -> None:
+    rng = random.Random(0)  # noqa: S311
+    environment = Environment.by_name_or_raise("mingw64")
+    repository = SyntheticRepository(environment, RepositoryShape(n_packages=N_PACKAGES, n_files=5))
+    roots = [package.name for package in rng.sample(repository.roots, N_ROOTS)]
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        tmp = Path(tmp_str)
+        layout = tmp / "image"
+        env = {**os.environ, "MSYS2DL_HOME": str(tmp / "home")}
+        with FakeMirror(make_repository_files(key, repository, repository.packages)) as mirror:
+            mirror_args = ["--base-url", mirror.url, "--keys-url", mirror.url + KEYS_PATH]
+            oci = [*mirror_args, "extract", "--format", "oci"]
+            initial = timed(lambda: run_cli([*oci, "--output", str(layout), *roots], env))
+        initial_layers = set(image_layers(layout))
+
+        for package in rng.sample(repository.packages, round(N_PACKAGES * CHURN)):
+            package.version = "2.0-1"
+            package.filename = f"{package.name}-{package.version}-any.pkg.tar.zst"
+        with FakeMirror(make_repository_files(key, repository, repository.packages)) as mirror:
+            mirror_args = ["--base-url", mirror.url, "--keys-url", mirror.url + KEYS_PATH]
+            oci = [*mirror_args, "extract", "--format", "oci"]
+            fresh_env = {**os.environ, "MSYS2DL_HOME": str(tmp / "fresh-home")}
+            # Also downloads the packages, so that both variants only write layers
+            run_cli([*mirror_args, "extract", "--output", str(tmp / "extract"), *roots], fresh_env)
+            update = timed(lambda: run_cli([*oci, "--output", str(layout), *roots], fresh_env))
+            fresh = timed(lambda: run_cli([*oci, "--output", str(tmp / "fresh-image"), *roots], fresh_env))
+
+        layers = image_layers(layout)
+        unpack(layout, tmp / "unpacked")
+        files = list_files(tmp / "extract")
+        same_files = (
+            files == list_files(tmp / "unpacked")
+            and not filecmp.cmpfiles(tmp / "extract", tmp / "unpacked", files, shallow=False)[1]
+        )
+        print(f"image of {len(layers)} layers, after {round(N_PACKAGES * CHURN)} upstream updates:")
+        print(f"  initial image: {initial:.2f} s")
+        print(
+            f"  update in the same layout: {update:.2f} s, {len(set(layers) - initial_layers)} layers written"
+        )
+        print(f"  new layout: {fresh:.2f} s")
+        print(
+            f"  same layers as the new layout: {'yes' if layers == image_layers(tmp / 'fresh-image') else 'NO'}"
+        )
+        print(f"  unpacked layers give the files of extract: {'yes' if same_files else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
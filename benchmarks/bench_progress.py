@@ -0,0 +1,81 @@
+# Measures the CPU time and the output size of the download progress display while many
+# downloads report progress concurrently, on a terminal and with redirected output.
+#
+#   python -m benchmarks.bench_progress
+import contextlib
+import io
+import threading
+import time
+from pathlib import Path
+
+import rich
+
+from msys2dl.download.download_callback import DownloadCallbacks
+from msys2dl.download.download_request import DownloadRequest
+from msys2dl.progress import DownloadProgress, DownloadProgressLog, create_download_progress
+from msys2dl.utilities import format_size
+
+N_PACKAGES = 1000
+N_CONCURRENT = 200
+PACKAGE_SIZE = 1024 * 1024
+BLOCK_SIZE = 64 * 1024
+CALLBACK_INTERVAL = 0.1  # seconds between progress callbacks of each download, like the downloaders
+
+
+def simulate(progress: DownloadProgress | DownloadProgressLog, requests: list[DownloadRequest]) -> None:
+    # Each worker runs its downloads one after another, reporting progress like a downloader
+    lock = threading.Lock()
+    pending = list(reversed(requests))
+
+    def worker() -> None:
+        while True:
+            with lock:
+                if not pending:
+                    return
+                request = pending.pop()
+            callbacks = DownloadCallbacks()
+            progress.register_callbacks(request, callbacks)
+            for n_bytes in range(0, PACKAGE_SIZE + 1, BLOCK_SIZE * 4):
+                callbacks.on_progress(n_bytes, PACKAGE_SIZE)
+                time.sleep(CALLBACK_INTERVAL)
+            callbacks.on_success()
+
+    threads = [threading.Thread(target=worker) for _ in range(N_CONCURRENT)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run(terminal: bool) -> None:
+    output = io.StringIO()
+    rich.reconfigure(file=output, force_terminal=terminal, force_interactive=terminal, width=120)
+    requests = [
+        DownloadRequest(
+            name=f"package-{i}", path=f"/package-{i}", dest=Path(f"package-{i}"), expected_size=PACKAGE_SIZE
+        )
+        for i in range(N_PACKAGES)
+    ]
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    with (
+        contextlib.redirect_stdout(output),
+        create_download_progress(N_PACKAGES, "Downloading packages") as progress,
+    ):
+        simulate(progress, requests)
+    cpu = time.process_time() - start_cpu
+    wall = time.perf_counter() - start_wall
+    print(
+        f"  terminal={terminal}: {cpu:.2f} s CPU in {wall:.2f} s, "
+        f"{format_size(len(output.getvalue()))} of output"
+    )
+
+
+def main() -> None:
+    print(f"{N_PACKAGES} packages, {N_CONCURRENT} concurrent downloads:")
+    for terminal in (True, False):
+        run(terminal)
+
+
+if __name__ == "__main__":
+    main()
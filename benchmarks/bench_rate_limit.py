@@ -0,0 +1,158 @@
+# Measures the achieved download rate and its variation over time against a local mirror
+# stand-in for several --max-rate limits, and the retries caused by a mirror rejecting
+# excess connections with and without a per-host connection cap.
+#
+#   python -m benchmarks.bench_rate_limit
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import make_download_requests, make_signed_files, no_callbacks, timed
+from benchmarks.fake_mirror import FakeMirror, FaultProfile
+from benchmarks.signing import ThrowawayKey
+from msys2dl.download.async_downloader import AsyncDownloader
+from msys2dl.download.download_callback import DownloadCallbacks
+from msys2dl.download.download_engine import DownloadEngine
+from msys2dl.download.download_request import DownloadRequest
+from msys2dl.download.mirror_pool import MirrorPool
+from msys2dl.download.parallel_downloader import ParallelDownloader
+from msys2dl.download.rate_limiter import HostConnectionLimiter, TokenBucket
+from msys2dl.download.simple_downloader import SimpleDownloader
+from msys2dl.utilities import AppError
+
+N_PACKAGES = 48
+PACKAGE_SIZE = 512 * 1024
+N_CONCURRENT = 16
+ENGINES = ("threads", "asyncio")
+RATE_LIMITS = [2 * 1024 * 1024, 8 * 1024 * 1024]
+WINDOW = 0.25  # seconds
+CONGESTED_PROFILE = FaultProfile(latency=0.05, bandwidth=2 * 1024 * 1024, max_connections=4)
+
+
+class RecordingTokenBucket(TokenBucket):
+    # Records the bytes read over time: progress callbacks are too coarse to show bursts
+    def __init__(self, rate: float) -> None:
+        super().__init__(rate)
+        self._start = time.monotonic()
+        self._windows: dict[int, int] = {}
+
+    def reserve(self, n_bytes: int) -> float:
+        delay = super().reserve(n_bytes)
+        if delay == 0:
+            self._record(n_bytes)
+        return delay
+
+    def refund(self, n_bytes: int) -> None:
+        super().refund(n_bytes)
+        self._record(-n_bytes)
+
+    def window_rates(self) -> list[float]:
+        # The last window is partial
+        n_windows = max(self._windows, default=0)
+        return [self._windows.get(i, 0) / WINDOW for i in range(n_windows)]
+
+    def _record(self, n_bytes: int) -> None:
+        with self._lock:
+            window = int((time.monotonic() - self._start) / WINDOW)
+            self._windows[window] = self._windows.get(window, 0) + n_bytes
+
+
+def make_engine(
+    name: str,
+    keybox_path: Path,
+    key: ThrowawayKey,
+    mirrors: MirrorPool,
+    rate_limiter: TokenBucket | None = None,
+    max_connections_per_host: int | None = None,
+) -> DownloadEngine:
+    keybox = key.make_keybox(keybox_path)
+    if name == "asyncio":
+        return AsyncDownloader(
+            keybox=keybox,
+            mirrors=mirrors,
+            n_concurrent=N_CONCURRENT,
+            rate_limiter=rate_limiter,
+            max_connections_per_host=max_connections_per_host,
+        )
+    connection_limiter = HostConnectionLimiter(max_connections_per_host) if max_connections_per_host else None
+    return ParallelDownloader(
+        downloader=SimpleDownloader(
+            keybox, mirrors, rate_limiter=rate_limiter, connection_limiter=connection_limiter
+        ),
+        n_threads=N_CONCURRENT,
+    )
+
+
+def measure_rate(
+    engine_name: str, max_rate: int, url: str, files: dict[str, bytes], key: ThrowawayKey, tmp: Path
+) -> None:
+    rate_limiter = RecordingTokenBucket(max_rate)
+    mirrors = MirrorPool([url])
+    engine = make_engine(engine_name, tmp / "keybox.gpg", key, mirrors, rate_limiter=rate_limiter)
+    requests = make_download_requests(files, Path(tempfile.mkdtemp(dir=tmp)))
+    try:
+        seconds = timed(lambda: engine.execute_requests(requests, no_callbacks))
+    finally:
+        engine.close()
+    rates = rate_limiter.window_rates()
+    print(
+        f"  {engine_name}, limit {max_rate / 1024**2:.0f} MiB/s: "
+        f"achieved {N_PACKAGES * PACKAGE_SIZE / seconds / 1024**2:.2f} MiB/s, "
+        f"{WINDOW} s windows min {min(rates) / 1024**2:.2f} / max {max(rates) / 1024**2:.2f} MiB/s, "
+        f"variation {statistics.pstdev(rates) / statistics.mean(rates):.1%}"
+    )
+
+
+def measure_retries(
+    engine_name: str,
+    max_connections: int | None,
+    url: str,
+    files: dict[str, bytes],
+    key: ThrowawayKey,
+    tmp: Path,
+) -> None:
+    retries = 0
+
+    def register_callbacks(_request: DownloadRequest, callbacks: DownloadCallbacks) -> None:
+        def on_retry(_error: str) -> None:
+            nonlocal retries
+            retries += 1
+
+        callbacks.retry_handlers.register(on_retry)
+
+    mirrors = MirrorPool([url])
+    engine = make_engine(
+        engine_name, tmp / "keybox.gpg", key, mirrors, max_connections_per_host=max_connections
+    )
+    requests = make_download_requests(files, Path(tempfile.mkdtemp(dir=tmp)))
+    try:
+        seconds = timed(lambda: engine.execute_requests(requests, register_callbacks))
+    except AppError:
+        # A download ran out of tries
+        result = "failed"
+    else:
+        result = f"{seconds:.2f} s"
+    finally:
+        engine.close()
+    print(f"  {engine_name}, max {max_connections} connections per host: {result}, {retries} retries")
+
+
+def main() -> None:
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        tmp = Path(tmp_str)
+        files = make_signed_files(key, [PACKAGE_SIZE] * N_PACKAGES)
+        print(f"{N_PACKAGES} x {PACKAGE_SIZE // 1024} KiB, {N_CONCURRENT} concurrent downloads:")
+        with FakeMirror(files) as mirror:
+            for engine_name in ENGINES:
+                for max_rate in RATE_LIMITS:
+                    measure_rate(engine_name, max_rate, mirror.url, files, key, tmp)
+        print(f"mirror rejecting more than {CONGESTED_PROFILE.max_connections} connections:")
+        with FakeMirror(files, CONGESTED_PROFILE) as mirror:
+            for engine_name in ENGINES:
+                for max_connections in (None, CONGESTED_PROFILE.max_connections):
+                    measure_retries(engine_name, max_connections, mirror.url, files, key, tmp)
+
+
+if __name__ == "__main__":
+    main()
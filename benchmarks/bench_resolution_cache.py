@@ -0,0 +1,76 @@
+# Resolves a few hundred include/exclude combinations on a synthetic repository: cold, with an
+# empty resolution cache, then warm, and again after a few packages changed in the database, which
+# invalidates the cache. Also checks that the cached sets are the ones resolved cold.
+#
+#   python -m benchmarks.bench_resolution_cache [--packages N] [--requests N]
+import contextlib
+import io
+import random
+import tempfile
+from argparse import ArgumentParser
+from pathlib import Path
+
+from benchmarks.common import timed
+from benchmarks.synthetic import RepositoryShape, SyntheticRepository
+from msys2dl.application import Application
+from msys2dl.arguments import ApplicationOptions
+from msys2dl.package import Environment
+from msys2dl.utilities import AppError
+
+ENVIRONMENT = Environment.by_name_or_raise("mingw64")
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Benchmark the resolution cache")
+    parser.add_argument("--packages", type=int, default=2000, help="packages in the database")
+    parser.add_argument("--requests", type=int, default=300, help="include/exclude combinations")
+    parser.add_argument("--changed", type=int, default=20, help="packages changed between runs")
+    args = parser.parse_args()
+
+    rng = random.Random(0)  # noqa: S311
+    repository = SyntheticRepository(ENVIRONMENT, RepositoryShape(n_packages=args.packages))
+    names = [package.name for package in repository.packages]
+    requests = [
+        (
+            rng.sample([p.name for p in repository.roots], rng.randint(1, 5)),
+            rng.sample(names, rng.randint(0, 3)),
+        )
+        for _ in range(args.requests)
+    ]
+    with tempfile.TemporaryDirectory() as tmp_str:
+        home = Path(tmp_str)
+        database_path = home / "db" / f"{ENVIRONMENT.name}.db"
+        database_path.parent.mkdir(parents=True)
+        database_path.write_bytes(repository.make_database())
+        with Application(ApplicationOptions(home=home, quiet=True)) as app:
+            results: dict[str, list[set[str]]] = {"cold": [], "warm": [], "changed": []}
+
+            def resolve_all(run: str) -> None:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for include, exclude in requests:
+                        try:
+                            package_set = app.resolve_package_set(include, exclude, with_dependencies=True)
+                        except AppError:
+                            # Conflicting alternatives: failures are resolved again every time
+                            results[run].append(set())
+                            continue
+                        results[run].append({package.name for package in package_set})
+
+            cold = timed(lambda: resolve_all("cold"))
+            warm = timed(lambda: resolve_all("warm"))
+            for package in rng.sample(repository.packages, args.changed):
+                package.version = "2.0-1"
+            database_path.write_bytes(repository.make_database())
+            app.download_databases([], force=False)
+            changed = timed(lambda: resolve_all("changed"))
+
+    n_failed = sum(not result for result in results["cold"])
+    print(f"{args.requests} requests on {args.packages} packages ({n_failed} failing with conflicts):")
+    print(f"  cold: {cold:.2f} s")
+    print(f"  warm: {warm:.2f} s ({cold / warm:.0f}x)")
+    print(f"  after {args.changed} packages changed: {changed:.2f} s")
+    print(f"  same sets: {'yes' if results['cold'] == results['warm'] else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Simulates downloading package sets with skewed size distributions on a fixed number of
+# connections, and compares the makespan of the set iteration order with the scheduled order.
+#
+#   python -m benchmarks.bench_scheduling
+import heapq
+import random
+import statistics
+from collections.abc import Callable
+from pathlib import Path
+
+from msys2dl.download.download_request import DownloadRequest
+from msys2dl.download.scheduler import schedule_requests
+
+N_PACKAGES = 300
+N_WORKERS = 5
+N_RUNS = 50
+LATENCY = 0.2  # seconds per request
+BANDWIDTH = 4 * 1024 * 1024  # bytes per second per connection
+MEDIAN_SIZE = 512 * 1024
+
+DISTRIBUTIONS: dict[str, Callable[[random.Random], float]] = {
+    "lognormal(sigma=1.5)": lambda rng: MEDIAN_SIZE * rng.lognormvariate(0, 1.5),
+    "pareto(alpha=1.1)": lambda rng: MEDIAN_SIZE / 2 * rng.paretovariate(1.1),
+    "uniform": lambda rng: rng.uniform(0, 2 * MEDIAN_SIZE),
+}
+
+
+def makespan(requests: list[DownloadRequest]) -> float:
+    # List scheduling: each request goes to the first free connection
+    workers = [0.0] * N_WORKERS
+    for request in requests:
+        start = heapq.heappop(workers)
+        heapq.heappush(workers, start + LATENCY + (request.expected_size or 0) / BANDWIDTH)
+    return max(workers)
+
+
+def main() -> None:
+    print(f"{N_PACKAGES} packages, {N_WORKERS} connections, makespan relative to the lower bound:")
+    for name, distribution in DISTRIBUTIONS.items():
+        unordered, scheduled = [], []
+        for seed in range(N_RUNS):
+            rng = random.Random(seed)  # noqa: S311
+            requests = [
+                DownloadRequest(
+                    name=str(i), path=str(i), dest=Path(str(i)), expected_size=int(distribution(rng))
+                )
+                for i in range(N_PACKAGES)
+            ]
+            durations = [LATENCY + (r.expected_size or 0) / BANDWIDTH for r in requests]
+            lower_bound = max(sum(durations) / N_WORKERS, *durations)
+            unordered.append(makespan(requests) / lower_bound)
+            scheduled.append(makespan(schedule_requests(requests)) / lower_bound)
+        print(
+            f"  {name}: set order {statistics.mean(unordered):.3f} (worst {max(unordered):.3f}), "
+            f"largest first {statistics.mean(scheduled):.3f} (worst {max(scheduled):.3f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
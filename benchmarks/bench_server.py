@@ -0,0 +1,84 @@
+# Runs a series of small extractions against a local mirror stand-in: with one command line
+# process per call, with `--server` sending each call to `msys2dl serve`, and as requests written
+# directly to the server socket.
+#
+#   python -m benchmarks.bench_server
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import KEYS_PATH, make_repository_files, run_cli, timed
+from benchmarks.fake_mirror import FakeMirror, FaultProfile
+from benchmarks.signing import ThrowawayKey
+from benchmarks.synthetic import RepositoryShape, SyntheticRepository
+from msys2dl.client import send_request
+from msys2dl.package import Environment
+
+N_PACKAGES = 3000
+N_CALLS = 20
+PROFILE = FaultProfile(latency=0.02)
+SERVER_START_TIMEOUT = 60
+
+
+def main() -> None:
+    environment = Environment.by_name_or_raise("mingw64")
+    repository = SyntheticRepository(environment, RepositoryShape(n_packages=N_PACKAGES, n_files=5))
+    targets = random.Random(0).sample(repository.packages, N_CALLS)  # noqa: S311
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        tmp = Path(tmp_str)
+        files = make_repository_files(key, repository, targets)
+        print(f"{N_CALLS} extractions of one package each, {N_PACKAGES} packages in the database:")
+        with FakeMirror(files, PROFILE) as mirror:
+            mirror_args = ["--base-url", mirror.url, "--keys-url", mirror.url + KEYS_PATH]
+            extract_args = ["extract", "--no-deps", "--output", str(tmp / "output")]
+            cli_env = {**os.environ, "MSYS2DL_HOME": str(tmp / "cli-home")}
+            cli_durations = [
+                timed(lambda: run_cli([*mirror_args, *extract_args, target.name], cli_env))
+                for target in targets
+            ]
+
+            socket_path = tmp / "msys2dl.sock"
+            server_env = {**os.environ, "MSYS2DL_HOME": str(tmp / "server-home")}
+            server = subprocess.Popen(
+                [sys.executable, "-m", "msys2dl.main", *mirror_args, "serve", "--socket", str(socket_path)],
+                env=server_env,
+                stdout=subprocess.DEVNULL,
+            )
+            try:
+                deadline = time.monotonic() + SERVER_START_TIMEOUT
+                while not socket_path.exists():
+                    if time.monotonic() > deadline or server.poll() is not None:
+                        raise RuntimeError("the server didn't start")
+                    time.sleep(0.05)
+                server_args = ["--server", str(socket_path), *extract_args]
+                server_durations = [
+                    timed(lambda: run_cli([*server_args, target.name], server_env)) for target in targets
+                ]
+                request = {"command": "extract", "with_dependencies": False, "output": str(tmp / "output")}
+                socket_durations = [
+                    timed(lambda: send_request(socket_path, {**request, "packages": [target.name]}))
+                    for target in targets
+                ]
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait()
+
+        for name, durations in (
+            ("process per call", cli_durations),
+            ("--server, first calls download", server_durations),
+            ("socket requests, cached packages", socket_durations),
+        ):
+            print(
+                f"  {name}: {sum(durations):.2f} s in total, first call {durations[0] * 1000:.0f} ms, "
+                f"median of the others {statistics.median(durations[1:]) * 1000:.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
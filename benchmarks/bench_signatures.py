@@ -0,0 +1,75 @@
+# Downloads small packages from a local mirror stand-in with a simulated 200 ms round trip,
+# fetching each signature after its package or alongside it, and reports per-package latency.
+#
+#   python -m benchmarks.bench_signatures
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import make_download_requests, make_signed_files, timed
+from benchmarks.fake_mirror import FakeMirror, FaultProfile
+from benchmarks.signing import ThrowawayKey
+from msys2dl.download.async_downloader import AsyncDownloader
+from msys2dl.download.download_callback import DownloadCallbacks
+from msys2dl.download.download_engine import DownloadEngine
+from msys2dl.download.download_request import DownloadRequest
+from msys2dl.download.mirror_pool import MirrorPool
+from msys2dl.download.parallel_downloader import ParallelDownloader
+from msys2dl.download.simple_downloader import SimpleDownloader
+
+N_PACKAGES = 100
+N_CONCURRENT = 8
+PACKAGE_SIZE = 32 * 1024
+PROFILE = FaultProfile(latency=0.2)
+ENGINES = ("threads, sequential signatures", "threads, parallel signatures", "asyncio")
+
+
+def make_engine(name: str, keybox_path: Path, key: ThrowawayKey, mirrors: MirrorPool) -> DownloadEngine:
+    keybox = key.make_keybox(keybox_path)
+    if name == "asyncio":
+        return AsyncDownloader(keybox=keybox, mirrors=mirrors, n_concurrent=N_CONCURRENT)
+    return ParallelDownloader(
+        downloader=SimpleDownloader(keybox, mirrors),
+        n_threads=N_CONCURRENT,
+        parallel_signatures=name.endswith("parallel signatures"),
+    )
+
+
+def main() -> None:
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        tmp = Path(tmp_str)
+        files = make_signed_files(key, [PACKAGE_SIZE] * N_PACKAGES)
+        print(
+            f"{N_PACKAGES} packages, {N_CONCURRENT} concurrent downloads, {PROFILE.latency * 1000:.0f} ms latency:"
+        )
+        with FakeMirror(files, PROFILE) as mirror:
+            for engine_name in ENGINES:
+                durations: list[float] = []
+
+                def register_callbacks(_request: DownloadRequest, callbacks: DownloadCallbacks) -> None:
+                    start: list[float] = []
+
+                    def on_progress(_bytes_downloaded: int, _bytes_total: int) -> None:
+                        if not start:
+                            start.append(time.monotonic())
+
+                    callbacks.progress_handlers.register(on_progress)
+                    callbacks.success_handlers.register(lambda: durations.append(time.monotonic() - start[0]))
+
+                mirrors = MirrorPool([mirror.url])
+                engine = make_engine(engine_name, tmp / "keybox.gpg", key, mirrors)
+                requests = make_download_requests(files, Path(tempfile.mkdtemp(dir=tmp)))
+                try:
+                    seconds = timed(lambda: engine.execute_requests(requests, register_callbacks))
+                finally:
+                    engine.close()
+                    mirrors.close()
+                print(
+                    f"  {engine_name}: total {seconds:.2f} s, per package "
+                    f"median {statistics.median(durations):.3f} s, max {max(durations):.3f} s"
+                )
+
+
+if __name__ == "__main__":
+    main()
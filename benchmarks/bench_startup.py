@@ -0,0 +1,53 @@
+# Measures the startup time of the command line: wall time of --help and of a usage error,
+# and the slowest imports reported by python -X importtime.
+#
+#   python -m benchmarks.bench_startup
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import timed
+
+COMMAND_LINES = {
+    "--help": ["--help"],
+    "usage error": ["extract", "--no-such-option"],
+}
+N_RUNS = 10
+N_SLOWEST_IMPORTS = 15
+
+
+def run_cli(argv: list[str], *python_options: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, *python_options, "-m", "msys2dl.main", *argv],
+        capture_output=True,
+        check=False,
+        text=True,
+    )
+
+
+def slowest_imports(argv: list[str]) -> list[tuple[int, str]]:
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    imports = []
+    for line in run_cli(argv, "-X", "importtime").stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        imports.append((int(cumulative_us), name.rstrip()))
+    return sorted(imports, reverse=True)[:N_SLOWEST_IMPORTS]
+
+
+def main() -> None:
+    interpreter = statistics.median(
+        timed(lambda: subprocess.run([sys.executable, "-c", "pass"], check=False)) for _ in range(N_RUNS)
+    )
+    print(f"interpreter alone: {interpreter * 1000:.0f} ms")
+    for name, argv in COMMAND_LINES.items():
+        seconds = statistics.median(timed(lambda: run_cli(argv)) for _ in range(N_RUNS))
+        print(f"{name}: {seconds * 1000:.0f} ms")
+    print("slowest imports for --help (cumulative):")
+    for cumulative_us, name in slowest_imports(["--help"]):
+        print(f"  {cumulative_us / 1000:7.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# Times the main stages of a run on a synthetic repository: starting the command line, loading
+# the package database, reloading it after a few packages changed, resolving dependencies without and
+# with the resolution cache, downloading from a local mirror stand-in,
+# extracting packages and building Debian packages. With --record, results are appended to a JSON lines file together
+# with the commit they were measured on, and compared with the last matching record.
+#
+#   python -m benchmarks.bench_suite [--packages N] [--graph layered|hub|chain] [--record FILE]
+import contextlib
+import io
+import json
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from benchmarks.bench_startup import run_cli
+from benchmarks.common import no_callbacks, timed
+from benchmarks.fake_mirror import FakeMirror, FaultProfile
+from benchmarks.signing import ThrowawayKey
+from benchmarks.synthetic import GRAPH_SHAPES, RepositoryShape, SyntheticRepository
+from msys2dl.application import Application
+from msys2dl.arguments import ApplicationOptions
+from msys2dl.commands.command_make_deb import DebBuilder
+from msys2dl.download.mirror_pool import MirrorPool
+from msys2dl.download.parallel_downloader import ParallelDownloader
+from msys2dl.download.simple_downloader import SimpleDownloader
+from msys2dl.package import Environment, PackageSet
+from msys2dl.package_database import PackageDatabase
+from msys2dl.package_store import PackageFile, PackageStore
+
+ENVIRONMENT = Environment.by_name_or_raise("mingw64")
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser(description="Benchmark msys2dl on a synthetic repository")
+    parser.add_argument("--packages", type=int, default=2000, help="packages in the database")
+    parser.add_argument(
+        "--graph", choices=GRAPH_SHAPES, default="layered", help="shape of the dependency graph"
+    )
+    parser.add_argument("--dependencies", type=float, default=4.0, help="mean dependencies per package")
+    parser.add_argument("--targets", type=int, default=10, help="packages requested from the resolver")
+    parser.add_argument(
+        "--sample", type=int, default=100, help="packages downloaded, extracted and converted"
+    )
+    parser.add_argument("--changed", type=int, default=20, help="packages changed between database reloads")
+    parser.add_argument("--files", type=int, default=20, help="files in each package")
+    parser.add_argument("--file-size", type=int, default=16 * 1024, help="size of each file in bytes")
+    parser.add_argument("--threads", type=int, default=8, help="download threads")
+    parser.add_argument("--latency", type=float, default=0.02, help="mirror latency in seconds")
+    parser.add_argument("--bandwidth", type=float, default=None, help="mirror bandwidth per connection (B/s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 503")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each stage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--record", type=Path, default=None, help="JSON lines file to append results to")
+    return parser.parse_args()
+
+
+class Suite:
+    def __init__(self, args: Namespace, key: ThrowawayKey, tmp: Path) -> None:
+        self._args = args
+        self._tmp = tmp
+        self._home = tmp / "home"
+        self._repository = SyntheticRepository(
+            ENVIRONMENT,
+            RepositoryShape(
+                n_packages=args.packages,
+                graph=args.graph,
+                mean_dependencies=args.dependencies,
+                n_files=args.files,
+                file_size=args.file_size,
+                seed=args.seed,
+            ),
+        )
+        self._database_path = self._home / "db" / f"{ENVIRONMENT.name}.db"
+        self._database_path.parent.mkdir(parents=True)
+        self._database_path.write_bytes(self._repository.make_database())
+        self._keybox = key.make_keybox(self._home / "keybox.gpg")
+
+        # Resolve the targets once to pick the packages used by the later stages
+        rng = random.Random(args.seed)  # noqa: S311
+        roots = self._repository.roots
+        self.targets = sorted(p.name for p in rng.sample(roots, min(args.targets, len(roots))))
+        database = PackageDatabase(self._home / "db")
+        package_set = PackageSet(database.get_all_or_raise(self.targets))
+        with contextlib.redirect_stdout(io.StringIO()):
+            package_set.add_dependencies_recursively(exclude=None)
+        self.n_resolved = len(package_set)
+        sample_names = set(sorted(p.name for p in package_set)[: args.sample])
+        sample = [p for p in self._repository.packages if p.name in sample_names]
+
+        # Package files also set the compressed sizes, so the database is written again
+        package_files = self._repository.make_package_files(sample)
+        self._database_path.write_bytes(self._repository.make_database())
+        database.reload()
+        self.mirror_files = {}
+        for filename, content in package_files.items():
+            path = ENVIRONMENT.package_download_path(filename)
+            self.mirror_files[path] = content
+            self.mirror_files[path + ".sig"] = key.sign(content)
+        self.sample_size = sum(len(content) for content in package_files.values())
+        self.sample = database.get_all_or_raise(sorted(sample_names))
+        self._package_files: list[PackageFile] = []
+        self._refreshed_databases: list[bytes] = []
+
+    def reload(self) -> None:
+        PackageDatabase(self._home / "db").reload()
+
+    def prepare_refresh(self, repeat: int) -> PackageDatabase:
+        # Database versions with a few more packages changed each time, like daily updates. They
+        # go to their own directory: the other stages need the database matching the sample.
+        rng = random.Random(self._args.seed)  # noqa: S311
+        packages = self._repository.packages
+        versions = {p.name: p.version for p in packages}
+        self._refreshed_databases = []
+        for i in range(repeat):
+            for package in rng.sample(packages, self._args.changed):
+                package.version = f"2.{i}-1"
+            self._refreshed_databases.append(self._repository.make_database())
+        for package in packages:
+            package.version = versions[package.name]
+        database_dir = self._tmp / "refresh-db"
+        database_dir.mkdir()
+        shutil.copy(self._database_path, database_dir)
+        database = PackageDatabase(database_dir)
+        database.reload()
+        return database
+
+    def refresh(self, database: PackageDatabase) -> None:
+        (self._tmp / "refresh-db" / self._database_path.name).write_bytes(self._refreshed_databases.pop(0))
+        database.reload()
+
+    def resolve(self, app: Application, cached: bool = False) -> None:
+        if not cached:
+            (self._home / "db" / "resolutions.sqlite").unlink(missing_ok=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            app.resolve_package_set(self.targets, [], with_dependencies=True)
+
+    def download(self, mirror_url: str) -> None:
+        store = PackageStore(Path(tempfile.mkdtemp(dir=self._tmp)))
+        engine = ParallelDownloader(
+            downloader=SimpleDownloader(self._keybox, MirrorPool([mirror_url])), n_threads=self._args.threads
+        )
+        try:
+            engine.execute_requests(store.make_download_requests(self.sample), no_callbacks)
+        finally:
+            engine.close()
+        self._package_files = [store.get_package_file(package) for package in self.sample]
+
+    def extract(self) -> None:
+        dest = Path(tempfile.mkdtemp(dir=self._tmp))
+        for package_file in self._package_files:
+            package_file.extract(dest)
+        shutil.rmtree(dest)
+
+    def make_deb(self) -> None:
+        dest = Path(tempfile.mkdtemp(dir=self._tmp))
+        builder = DebBuilder()
+        for package_file in self._package_files:
+            builder.build(package_file, dest)
+        shutil.rmtree(dest)
+
+    def make_app(self, mirror_url: str) -> Application:
+        return Application(ApplicationOptions(home=self._home, base_url=[mirror_url], quiet=True))
+
+
+def measure(repeat: int, fn: Callable[[], object]) -> dict[str, float]:
+    durations = [timed(fn) for _ in range(repeat)]
+    return {"min": min(durations), "median": statistics.median(durations)}
+
+
+def git_commit() -> tuple[str | None, bool]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],  # noqa: S607
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],  # noqa: S607
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, bool(status.strip())
+
+
+def last_matching_record(path: Path, parameters: dict[str, Any]) -> dict[str, Any] | None:
+    if not path.exists():
+        return None
+    records = [json.loads(line) for line in path.read_text("utf-8").splitlines() if line.strip()]
+    return next((r for r in reversed(records) if r["parameters"] == parameters), None)
+
+
+def main() -> None:
+    args = parse_args()
+    parameters = {name: value for name, value in vars(args).items() if name not in ("record", "repeat")}
+    results: dict[str, dict[str, float]] = {}
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        suite = Suite(args, key, Path(tmp_str))
+        print(
+            f"{args.packages} packages ({args.graph}), {len(suite.targets)} targets resolving to "
+            f"{suite.n_resolved} packages, {len(suite.sample)} packages of "
+            f"{suite.sample_size / len(suite.sample) / 1024:.0f} KiB on average in the sample"
+        )
+        with FakeMirror(
+            suite.mirror_files,
+            FaultProfile(latency=args.latency, bandwidth=args.bandwidth, error_rate=args.error_rate),
+            seed=args.seed,
+        ) as mirror:
+            results["startup"] = measure(args.repeat, lambda: run_cli(["--help"]))
+            results["reload"] = measure(args.repeat, suite.reload)
+            database = suite.prepare_refresh(args.repeat)
+            results["refresh"] = measure(args.repeat, lambda: suite.refresh(database))
+            with suite.make_app(mirror.url) as app:
+                results["resolve"] = measure(args.repeat, lambda: suite.resolve(app))
+                results["resolve-cached"] = measure(args.repeat, lambda: suite.resolve(app, cached=True))
+            results["download"] = measure(args.repeat, lambda: suite.download(mirror.url))
+        results["extract"] = measure(args.repeat, suite.extract)
+        if shutil.which("dpkg-deb"):
+            results["make-deb"] = measure(args.repeat, suite.make_deb)
+        else:
+            print("dpkg-deb not found: skipping make-deb")
+
+    previous = last_matching_record(args.record, parameters) if args.record else None
+    header = "stage            min (s)   median (s)"
+    if previous is not None:
+        header += f"   vs {(previous['commit'] or 'unknown')[:10]}"
+    print(header)
+    for stage, result in results.items():
+        line = f"{stage:<14} {result['min']:>9.3f} {result['median']:>12.3f}"
+        if previous is not None and stage in previous["results"]:
+            change = result["median"] / previous["results"][stage]["median"] - 1
+            line += f"   {change:+.1%}"
+        print(line)
+
+    if args.record:
+        commit, dirty = git_commit()
+        record = {
+            "commit": commit,
+            "dirty": dirty,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "parameters": parameters,
+            "results": results,
+        }
+        with args.record.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
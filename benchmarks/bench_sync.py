@@ -0,0 +1,72 @@
+# Updates a sysroot after a day of upstream changes against a local mirror stand-in: with sync,
+# which only fetches and extracts the changed packages, or with a full extract into a fresh
+# directory. Also checks that both produce the same files.
+#
+#   python -m benchmarks.bench_sync
+import filecmp
+import os
+import random
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import KEYS_PATH, list_files, make_repository_files, run_cli, timed
+from benchmarks.fake_mirror import FakeMirror, FaultProfile
+from benchmarks.signing import ThrowawayKey
+from benchmarks.synthetic import RepositoryShape, SyntheticRepository
+from msys2dl.package import Environment
+from msys2dl.sysroot import Sysroot
+
+N_PACKAGES = 2000
+N_ROOTS = 10
+CHURN = 0.02  # share of the packages updated upstream
+PROFILE = FaultProfile(latency=0.02)
+
+
+def main() -> None:
+    rng = random.Random(0)  # noqa: S311
+    environment = Environment.by_name_or_raise("mingw64")
+    repository = SyntheticRepository(environment, RepositoryShape(n_packages=N_PACKAGES, n_files=5))
+    roots = [package.name for package in rng.sample(repository.roots, N_ROOTS)]
+    with ThrowawayKey() as key, tempfile.TemporaryDirectory() as tmp_str:
+        tmp = Path(tmp_str)
+        sysroot = tmp / "sysroot"
+        env = {**os.environ, "MSYS2DL_HOME": str(tmp / "home")}
+        with FakeMirror(make_repository_files(key, repository, repository.packages), PROFILE) as mirror:
+            mirror_args = ["--base-url", mirror.url, "--keys-url", mirror.url + KEYS_PATH]
+            initial = timed(lambda: run_cli([*mirror_args, "sync", "--output", str(sysroot), *roots], env))
+        n_installed = len(Sysroot(sysroot).packages)
+
+        # A day later: some packages have new versions, and one of the roots is no longer needed
+        installed = [package for package in repository.packages if package.name in Sysroot(sysroot).packages]
+        updated = rng.sample(installed, round(len(installed) * CHURN))
+        for package in updated:
+            package.version = "2.0-1"
+            package.filename = f"{package.name}-{package.version}-any.pkg.tar.zst"
+        roots = roots[1:]
+        with FakeMirror(make_repository_files(key, repository, repository.packages), PROFILE) as mirror:
+            mirror_args = ["--base-url", mirror.url, "--keys-url", mirror.url + KEYS_PATH]
+            sync = timed(lambda: run_cli([*mirror_args, "sync", "--output", str(sysroot), *roots], env))
+            sync_requests = mirror.n_requests
+
+            fresh = tmp / "fresh"
+            fresh_env = {**os.environ, "MSYS2DL_HOME": str(tmp / "fresh-home")}
+            mirror.n_requests = 0
+            extract = timed(
+                lambda: run_cli([*mirror_args, "extract", "--output", str(fresh), *roots], fresh_env)
+            )
+            extract_requests = mirror.n_requests
+
+        files = list_files(sysroot, ignore=[Sysroot.state_file_name])
+        identical = (
+            files == list_files(fresh, ignore=[Sysroot.state_file_name])
+            and not filecmp.cmpfiles(sysroot, fresh, files, shallow=False)[1]
+        )
+        print(f"sysroot of {n_installed} packages, {len(updated)} updated and one root dropped upstream:")
+        print(f"  initial sync: {initial:.2f} s")
+        print(f"  sync: {sync:.2f} s, {sync_requests} requests")
+        print(f"  extract into a fresh directory: {extract:.2f} s, {extract_requests} requests")
+        print(f"  same files: {'yes' if identical else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
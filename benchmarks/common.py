@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+import time
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+from benchmarks.signing import ThrowawayKey
+from benchmarks.synthetic import SyntheticPackage, SyntheticRepository
+from msys2dl.download.download_callback import DownloadCallbacks
+from msys2dl.download.download_request import DownloadRequest
+
+
+def make_signed_files(
+    key: ThrowawayKey, sizes: Iterable[int], prefix: str = "/mingw/bench"
+) -> dict[str, bytes]:
+    files = {}
+    for i, size in enumerate(sizes):
+        path = f"{prefix}/package-{i}.pkg.tar.zst"
+        files[path] = os.urandom(size)
+        files[path + ".sig"] = key.sign(files[path])
+    return files
+
+
+KEYS_PATH = "/keys.gpg"
+
+
+def make_repository_files(
+    key: ThrowawayKey, repository: SyntheticRepository, packages: Iterable[SyntheticPackage]
+) -> dict[str, bytes]:
+    # Signed package files and databases of a synthetic repository, and the public key at KEYS_PATH,
+    # laid out like on a mirror
+    environment = repository.environment
+    files = {KEYS_PATH: key.public_key()}
+    for filename, content in repository.make_package_files(packages).items():
+        files[environment.package_download_path(filename)] = content
+    files[environment.database_download_path] = repository.make_database()
+    files[environment.files_database_download_path] = repository.make_files_database()
+    for path in list(files):
+        if path != KEYS_PATH:
+            files[path + ".sig"] = key.sign(files[path])
+    return files
+
+
+def make_download_requests(files: dict[str, bytes], dest_dir: Path) -> list[DownloadRequest]:
+    return [
+        DownloadRequest(
+            name=path.rsplit("/", 1)[-1],
+            path=path,
+            dest=dest_dir / path.rsplit("/", 1)[-1],
+            expected_size=len(content),
+        )
+        for path, content in files.items()
+        if not path.endswith(".sig")
+    ]
+
+
+def no_callbacks(_request: DownloadRequest, _callbacks: DownloadCallbacks) -> None:
+    pass
+
+
+def timed(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run_cli(argv: list[str], env: dict[str, str]) -> None:
+    subprocess.run([sys.executable, "-m", "msys2dl.main", *argv], env=env, capture_output=True, check=True)
+
+
+def list_files(root: Path, ignore: Iterable[str] = ()) -> set[Path]:
+    # Files under root, relative to it
+    return {path.relative_to(root) for path in root.rglob("*") if path.is_file()} - {
+        Path(name) for name in ignore
+    }
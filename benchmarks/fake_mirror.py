@@ -0,0 +1,148 @@
+import contextlib
+import random
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import TracebackType
+
+
+@dataclass
+class FaultProfile:
+    latency: float = 0.0  # seconds before the response headers are sent
+    bandwidth: float | None = None  # bytes per second for each connection
+    error_rate: float = 0.0  # share of requests answered with 503
+    stall_rate: float = 0.0  # share of responses trickling at stall_bandwidth
+    stall_bandwidth: float = 16 * 1024
+    max_connections: int | None = None  # requests beyond this many concurrent ones are answered with 503
+
+
+class _Server(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connections when many downloads start at once
+    request_queue_size = 128
+    daemon_threads = True
+
+
+# Local HTTP stand-in for an MSYS2 mirror, serving in-memory files with injected faults
+class FakeMirror:
+    chunk_size = 16 * 1024
+
+    def __init__(self, files: dict[str, bytes], profile: FaultProfile | None = None, seed: int = 0) -> None:
+        self.files = files
+        self.profile = profile or FaultProfile()
+        self.n_requests = 0
+        self.n_errors = 0
+        self.n_active = 0
+        self._random = random.Random(seed)  # noqa: S311
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def __enter__(self) -> "FakeMirror":
+        self._thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.n_requests += 1
+            failed = self._random.random() < self.profile.error_rate
+            self.n_errors += failed
+            return failed
+
+    @contextlib.contextmanager
+    def _track_connection(self) -> Iterator[bool]:
+        with self._lock:
+            self.n_active += 1
+            max_connections = self.profile.max_connections
+            overloaded = max_connections is not None and self.n_active > max_connections
+        try:
+            yield overloaded
+        finally:
+            with self._lock:
+                self.n_active -= 1
+
+    def _should_stall(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.profile.stall_rate
+
+    def _make_handler(self) -> type[BaseHTTPRequestHandler]:
+        mirror = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def handle(self) -> None:
+                # Clients drop keep-alive connections when they are done
+                with contextlib.suppress(ConnectionError):
+                    super().handle()
+
+            def do_HEAD(self) -> None:  # noqa: N802
+                self._respond(send_body=False)
+
+            def do_GET(self) -> None:  # noqa: N802
+                self._respond(send_body=True)
+
+            def _respond(self, send_body: bool) -> None:
+                with mirror._track_connection() as overloaded:
+                    self._respond_tracked(send_body, overloaded)
+
+            def _respond_tracked(self, send_body: bool, overloaded: bool) -> None:
+                time.sleep(mirror.profile.latency)
+                if mirror._should_fail() or overloaded:
+                    self._send_status(503)
+                    return
+                if self.path.endswith("/"):
+                    self._send_status(200)
+                    return
+                content = mirror.files.get(self.path)
+                if content is None:
+                    self._send_status(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                if send_body:
+                    self._send_body(content)
+
+            def _send_status(self, code: int) -> None:
+                self.send_response(code)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def _send_body(self, content: bytes) -> None:
+                bandwidth = mirror.profile.bandwidth
+                if mirror._should_stall():
+                    bandwidth = mirror.profile.stall_bandwidth
+                start = time.monotonic()
+                chunk_size = mirror.chunk_size if bandwidth else 1024 * 1024
+                view = memoryview(content)
+                for offset in range(0, len(content), chunk_size):
+                    chunk = view[offset : offset + chunk_size]
+                    try:
+                        self.wfile.write(chunk)
+                    except (BrokenPipeError, ConnectionResetError):
+                        return
+                    if bandwidth:
+                        delay = start + (offset + len(chunk)) / bandwidth - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+        return Handler
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+from types import TracebackType
+
+from msys2dl.gpg_keyring import GpgKeybox
+
+
+# Signing key in a temporary GnuPG home, used to sign generated packages and databases
+class ThrowawayKey:
+    def __init__(self) -> None:
+        self._home = tempfile.TemporaryDirectory(prefix="msys2dl-bench-gpg-")
+        os.chmod(self._home.name, 0o700)  # noqa: PTH101
+        self._gpg(
+            "--passphrase", "", "--quick-gen-key", "msys2dl benchmark <bench@example.invalid>", "ed25519"
+        )
+
+    def __enter__(self) -> "ThrowawayKey":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self._home.cleanup()
+
+    def sign(self, data: bytes) -> bytes:
+        return self._gpg("--detach-sign", stdin=data)
+
+    def make_keybox(self, location: Path) -> GpgKeybox:
+        keybox = GpgKeybox(location)
+        keybox.update_keys(self.public_key())
+        return keybox
+
+    def public_key(self) -> bytes:
+        return self._gpg("--armor", "--export")
+
+    def _gpg(self, *args: str, stdin: bytes = b"") -> bytes:
+        return subprocess.run(
+            ["gpg", "--homedir", self._home.name, "--batch", *args],  # noqa: S607
+            input=stdin,
+            capture_output=True,
+            check=True,
+        ).stdout
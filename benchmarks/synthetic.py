@@ -0,0 +1,172 @@
+import io
+import random
+import tarfile
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+import zstandard as zstd
+
+from msys2dl.package import Environment
+
+GRAPH_SHAPES = ("layered", "hub", "chain")
+
+
+@dataclass
+class RepositoryShape:
+    n_packages: int = 2000
+    # layered: dependencies picked uniformly among earlier packages
+    # hub: dependencies picked by popularity, so a few libraries are needed by most packages
+    # chain: every package depends on the previous one, the deepest possible graph
+    graph: str = "layered"
+    mean_dependencies: float = 4.0
+    # Share of packages providing a virtual name together with one or two other packages.
+    # Dependencies on a virtual name resolve to alternatives; providers conflict with each other.
+    virtual_share: float = 0.05
+    n_files: int = 20  # files in each package tarball
+    file_size: int = 16 * 1024
+    seed: int = 0
+
+
+@dataclass
+class SyntheticPackage:
+    name: str
+    version: str
+    filename: str
+    depends: list[str] = field(default_factory=list)
+    provides: list[str] = field(default_factory=list)
+    conflicts: list[str] = field(default_factory=list)
+    compressed_size: int | None = None
+
+    def desc(self) -> str:
+        sections = {
+            "FILENAME": [self.filename],
+            "NAME": [self.name],
+            "VERSION": [self.version],
+            "DESC": [f"Synthetic package {self.name}"],
+            "CSIZE": [str(self.compressed_size)] if self.compressed_size is not None else [],
+            "DEPENDS": self.depends,
+            "PROVIDES": self.provides,
+            "CONFLICTS": self.conflicts,
+        }
+        return "".join(
+            f"%{name}%\n" + "".join(f"{v}\n" for v in values) + "\n"
+            for name, values in sections.items()
+            if values
+        )
+
+
+# Generated package graph of one environment, with its package database and package tarballs
+class SyntheticRepository:
+    def __init__(self, environment: Environment, shape: RepositoryShape) -> None:
+        if shape.graph not in GRAPH_SHAPES:
+            raise ValueError(f"unknown graph shape: {shape.graph}")
+        self.environment = environment
+        self.shape = shape
+        self._random = random.Random(shape.seed)  # noqa: S311
+        self.packages = self._make_packages()
+        self.providers = {p.name for p in self.packages if p.provides}
+
+    @property
+    def roots(self) -> list[SyntheticPackage]:
+        # Packages no other package depends on, the natural targets of a command
+        needed = {dep for p in self.packages for dep in p.depends}
+        return [p for p in self.packages if p.name not in needed and p.name not in self.providers]
+
+    def make_package_file(self, package: SyntheticPackage) -> bytes:
+        files = {
+            ".PKGINFO": f"pkgname = {package.name}\npkgver = {package.version}\n".encode(),
+            ".MTREE": b"",
+        }
+        # Content only depends on the package version, so regenerated files of unchanged packages are identical
+        rng = random.Random(f"{self.shape.seed}-{package.name}-{package.version}")  # noqa: S311
+        for path in self.package_paths(package):
+            # Half random, half repetitive, so the tarball compresses like a typical binary package
+            half = self.shape.file_size // 2
+            files[path] = rng.randbytes(half) + bytes(self.shape.file_size - half)
+        return _compress_tar(files)
+
+    def package_paths(self, package: SyntheticPackage) -> list[str]:
+        prefix = self.environment.name
+        return [f"{prefix}/share/{package.name}/file-{i}.bin" for i in range(self.shape.n_files)]
+
+    def make_package_files(self, packages: Iterable[SyntheticPackage]) -> dict[str, bytes]:
+        # Also records the compressed size in the package metadata, like a real database
+        package_files = {}
+        for package in packages:
+            content = self.make_package_file(package)
+            package.compressed_size = len(content)
+            package_files[package.filename] = content
+        return package_files
+
+    def make_database(self) -> bytes:
+        return _compress_tar({f"{p.name}-{p.version}/desc": p.desc().encode("utf-8") for p in self.packages})
+
+    def make_files_database(self) -> bytes:
+        # Like the database, plus the file list of each package
+        files = {}
+        for p in self.packages:
+            files[f"{p.name}-{p.version}/desc"] = p.desc().encode("utf-8")
+            files[f"{p.name}-{p.version}/files"] = "\n".join(["%FILES%", *self.package_paths(p), ""]).encode(
+                "utf-8"
+            )
+        return _compress_tar(files)
+
+    def _make_packages(self) -> list[SyntheticPackage]:
+        shape = self.shape
+        prefix = self.environment.package_name_prefix
+        packages = []
+        for i in range(shape.n_packages):
+            name = f"{prefix}pkg{i:05d}"
+            version = f"1.{i % 10}.{i % 7}-{1 + i % 3}"
+            packages.append(SyntheticPackage(name, version, f"{name}-{version}-any.pkg.tar.zst"))
+
+        # Groups of two or three providers of a virtual name, conflicting with each other
+        n_providers = int(shape.n_packages * shape.virtual_share)
+        provider_indices = self._random.sample(range(shape.n_packages), n_providers)
+        virtual_names: list[str] = []
+        while len(provider_indices) >= 2:
+            group_size = min(len(provider_indices), self._random.choice((2, 3)))
+            group = [packages[provider_indices.pop()] for _ in range(group_size)]
+            virtual_name = f"{prefix}virtual{len(virtual_names):04d}"
+            virtual_names.append(virtual_name)
+            for p in group:
+                p.provides.append(virtual_name)
+                p.conflicts.extend(other.name for other in group if other is not p)
+        providers = {p.name for p in packages if p.provides}
+
+        # Dependencies only point to earlier packages, so the graph has no cycles
+        candidates: list[str] = []
+        candidates_set: set[str] = set()
+        popularity: list[str] = []
+        for package in packages:
+            if shape.graph == "chain":
+                package.depends = candidates[-1:]
+            elif candidates:
+                n_dependencies = min(
+                    len(candidates), self._random.randint(0, round(2 * shape.mean_dependencies))
+                )
+                if shape.graph == "hub" and popularity:
+                    chosen = {self._random.choice(popularity) for _ in range(n_dependencies)}
+                else:
+                    chosen = set(self._random.sample(candidates, n_dependencies))
+                package.depends = sorted(chosen)
+            if virtual_names and self._random.random() < shape.virtual_share * 4:
+                package.depends.append(self._random.choice(virtual_names) + ">=1.0")
+            # Each package starts with one share of popularity and gains one per dependent
+            popularity.extend(dep for dep in package.depends if dep in candidates_set)
+            if package.name not in providers:
+                candidates.append(package.name)
+                candidates_set.add(package.name)
+                popularity.append(package.name)
+        return packages
+
+
+def _compress_tar(files: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name, content in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            info.mode = 0o644
+            tar.addfile(info, io.BytesIO(content))
+    return zstd.ZstdCompressor().compress(buffer.getvalue())
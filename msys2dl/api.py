@@ -0,0 +1,173 @@
+import threading
+from collections.abc import Iterable
+from dataclasses import replace
+from pathlib import Path
+from types import TracebackType
+
+from msys2dl.application import Application
+from msys2dl.arguments import ApplicationOptions
+from msys2dl.commands.command_make_deb import DebOutput
+from msys2dl.package import Environment, Package
+from msys2dl.package_database import DatabaseChanges, PackageNameResolver
+from msys2dl.package_store import PackageFile
+from msys2dl.utilities import AppError
+
+__all__ = ["AppError", "ApplicationOptions", "DatabaseChanges", "Msys2dl", "Package", "PackageFile"]
+
+
+class Msys2dl:
+    # Library interface for programs running many operations in one process, e.g. build systems.
+    # An instance keeps the parsed package databases, the signature keys and the download threads
+    # with their HTTP sessions between calls. Signature keys are fetched on the first call, and
+    # the database of an environment when a call first needs it; refresh() fetches both again.
+    # An instance may be shared between threads: resolution and downloads run one call at a time,
+    # extraction and package building run in parallel. Failures raise AppError.
+    def __init__(
+        self,
+        options: ApplicationOptions | None = None,
+        *,
+        env: str | None = None,
+        application: Application | None = None,
+    ) -> None:
+        # Either creates an application from options or wraps an existing one, e.g. of a command.
+        # The interrupt flag and the lifetime of a wrapped application belong to its owner.
+        self._owns_application = application is None
+        if application is None:
+            options = options or ApplicationOptions(quiet=True)
+            # Signal handlers belong to the host program
+            application = Application(replace(options, handle_signals=False))
+        self._app = application
+        self._default_env = Environment.by_name_or_raise(env) if env else None
+        self._lock = threading.Lock()
+        self._keys_updated = False
+        self._loaded_environments: set[Environment] = set()
+
+    def __enter__(self) -> "Msys2dl":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._owns_application:
+            with self._lock:
+                self._app.close()
+
+    def interrupt(self) -> None:
+        # Makes the running call raise InterruptedError; may be called from any thread
+        self._app.interrupt()
+
+    def refresh(self) -> DatabaseChanges:
+        # Returns the packages that were added, updated or removed
+        with self._lock:
+            self._clear_interrupt()
+            self._app.update_keys()
+            self._keys_updated = True
+            return self._app.download_databases(self._loaded_environments, force=True)
+
+    def resolve(
+        self,
+        packages: Iterable[str],
+        *,
+        exclude: Iterable[str] = (),
+        with_dependencies: bool = True,
+        check_conflicts: bool = True,
+    ) -> list[Package]:
+        with self._lock:
+            return self._resolve(packages, exclude, with_dependencies, check_conflicts)
+
+    def download(
+        self,
+        packages: Iterable[str],
+        *,
+        exclude: Iterable[str] = (),
+        with_dependencies: bool = True,
+        check_conflicts: bool = True,
+    ) -> list[PackageFile]:
+        with self._lock:
+            return self._app.download_packages(
+                self._resolve(packages, exclude, with_dependencies, check_conflicts)
+            )
+
+    def extract(
+        self,
+        packages: Iterable[str],
+        output_dir: Path,
+        *,
+        exclude: Iterable[str] = (),
+        with_dependencies: bool = True,
+        check_conflicts: bool = True,
+    ) -> list[PackageFile]:
+        with self._lock:
+            package_files = self._app.download_packages(
+                self._resolve(packages, exclude, with_dependencies, check_conflicts)
+            )
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for package_file in package_files:
+            self._app.check_interrupted()
+            package_file.extract(output_dir)
+        return package_files
+
+    def make_deb(
+        self,
+        packages: Iterable[str],
+        output_dir: Path,
+        *,
+        exclude: Iterable[str] = (),
+        with_dependencies: bool = True,
+        check_conflicts: bool = True,
+        bundle: str | None = None,
+        bundle_version: str = "1",
+        apt_index: bool = False,
+    ) -> list[Path]:
+        # Returns the paths of the generated .deb files. With a bundle name, the packages of each
+        # environment are packed into one deb named <bundle>-msys2-<environment>. With apt_index,
+        # the apt repository index in output_dir is updated.
+        with self._lock:
+            package_files = self._app.download_packages(
+                self._resolve(packages, exclude, with_dependencies, check_conflicts)
+            )
+        output_dir.mkdir(parents=True, exist_ok=True)
+        with DebOutput(
+            output_dir, self._app.trace, bundle=bundle, bundle_version=bundle_version, apt_index=apt_index
+        ) as debs:
+            for package_file in package_files:
+                self._app.check_interrupted()
+                debs.add(package_file)
+            return debs.finish(self._app.check_interrupted)
+
+    def _clear_interrupt(self) -> None:
+        # An interrupt ends the call it happened in, later calls run normally
+        if self._owns_application:
+            self._app.clear_interrupt()
+
+    def _resolve(
+        self, packages: Iterable[str], exclude: Iterable[str], with_dependencies: bool, check_conflicts: bool
+    ) -> list[Package]:
+        self._clear_interrupt()
+        name_resolver = PackageNameResolver(self._default_env)
+        include_names = name_resolver.resolve_full_names(packages)
+        exclude_names = name_resolver.resolve_full_names(exclude)
+        try:
+            environments = {
+                Environment.by_package_name_or_raise(name) for name in include_names + exclude_names
+            }
+        except ValueError as exc:
+            raise AppError(str(exc))
+        if not self._keys_updated:
+            self._app.update_keys()
+            self._keys_updated = True
+        # Databases are only parsed again when a call needs a new environment
+        new_environments = environments - self._loaded_environments
+        if new_environments:
+            self._app.download_databases(new_environments)
+            self._loaded_environments |= new_environments
+        package_set = self._app.resolve_package_set(
+            include_names, exclude_names, with_dependencies=with_dependencies, check_conflicts=check_conflicts
+        )
+        return sorted(package_set, key=lambda package: package.name)
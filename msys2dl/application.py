@@ -1,41 +1,51 @@
+import contextlib
 import os
 import signal
-from argparse import ArgumentParser, Namespace
 from collections.abc import Iterable
+from contextlib import AbstractContextManager
 from pathlib import Path
 from threading import Event
 from types import FrameType, TracebackType
 
-import requests
-from requests import RequestException
-
+from msys2dl.arguments import ApplicationOptions
 from msys2dl.download.download_callback import DownloadCallbacks
+from msys2dl.download.download_engine import DownloadEngine
 from msys2dl.download.download_request import DownloadRequest
-from msys2dl.download.parallel_downloader import ParallelDownloader
-from msys2dl.download.simple_downloader import SimpleDownloader
+from msys2dl.download.mirror_pool import MirrorPool
+from msys2dl.files_index import FilesIndex, FilesIndexUpdate
 from msys2dl.gpg_keyring import GpgKeybox
+from msys2dl.metrics import Metrics
 from msys2dl.package import Environment, Package, PackageSet
-from msys2dl.package_database import PackageDatabase
-from msys2dl.package_store import PackageFile, PackageStore
-from msys2dl.progress import DownloadProgress
+from msys2dl.package_database import DatabaseChanges, PackageDatabase
+from msys2dl.package_store import GarbageCollectionResult, PackageFile, PackageStore
+from msys2dl.resolution_cache import ResolutionCache, make_request_key
+from msys2dl.tracing import Tracer
+from msys2dl.utilities import AppError, format_size
 
 
 class Application:
-    def __init__(self, args: Namespace):
-        home = Path(os.getenv("MSYS2DL_HOME") or Path("~/.local/share/msys2dl").expanduser())
+    # The package databases are parsed and the download threads started on first use, so
+    # that invalid arguments are reported right away
+    def __init__(self, options: ApplicationOptions):
+        self._options = options
+        home = options.home or Path(os.getenv("MSYS2DL_HOME") or Path("~/.local/share/msys2dl").expanduser())
         home.mkdir(parents=True, exist_ok=True)
         self._database = PackageDatabase(home / "db")
         self._package_store = PackageStore(home / "packages")
+        self._resolution_cache = ResolutionCache(home / "db" / "resolutions.sqlite")
         self._keybox = GpgKeybox(home / "keybox.gpg")
-        self._n_download_threads: int = args.download_threads
-        self._base_url: str = args.base_url
-        self._keys_url: str = args.keys_url
+        self._mirrors = MirrorPool(self._mirror_urls(options))
+        self._keys_url: str = options.keys_url
+        self._cache_size_limit: int | None = options.cache_size_limit
         self._interrupt_event: Event = Event()
-        self._downloader = ParallelDownloader(
-            downloader=SimpleDownloader(self._keybox), n_threads=args.download_threads
-        )
-        signal.signal(signal.SIGINT, self.handle_interrupt)
-        signal.signal(signal.SIGTERM, self.handle_interrupt)
+        self._tracer = Tracer(options.trace) if options.trace is not None else None
+        self._metrics_path: Path | None = options.metrics
+        self._metrics_format: str = options.metrics_format
+        self.metrics = Metrics()
+        self._downloader: DownloadEngine | None = None
+        if options.handle_signals:
+            signal.signal(signal.SIGINT, self.handle_interrupt)
+            signal.signal(signal.SIGTERM, self.handle_interrupt)
 
     def __enter__(self) -> "Application":
         return self
@@ -46,35 +56,119 @@ class Application:
         exc_val: BaseException | None,
         exc_tb: TracebackType | None,
     ) -> None:
-        self._downloader.close()
+        self.close()
         if exc_val is not None:
             raise exc_val
 
+    def close(self) -> None:
+        if self._downloader is not None:
+            self._downloader.close()
+            self._downloader = None
+        self._mirrors.close()
+        if self._tracer is not None:
+            self._tracer.write()
+        if self._metrics_path is not None:
+            self.metrics.record_mirrors(self._mirrors)
+            self.metrics.write(self._metrics_path, self._metrics_format)
+
     def handle_interrupt(self, _sig: int, _frame: FrameType | None) -> None:
+        self.interrupt()
+
+    def interrupt(self) -> None:
+        # Running downloads stop at their next check, package actions before the next package
         self._interrupt_event.set()
 
+    def clear_interrupt(self) -> None:
+        self._interrupt_event.clear()
+
+    def wait_for_interrupt(self, timeout: float | None = None) -> bool:
+        return self._interrupt_event.wait(timeout)
+
     def check_interrupted(self) -> None:
         if self._interrupt_event.is_set():
             raise InterruptedError()
 
+    def trace(self, name: str, **args: object) -> AbstractContextManager[None]:
+        # Records a span with --trace, does nothing otherwise
+        if self._tracer is None:
+            return contextlib.nullcontext()
+        return self._tracer.span(name, **args)
+
     def update_keys(self) -> None:
+        # requests is slow to import: commands answering from local data don't need it
+        import requests
+        from requests import RequestException
+
+        # Keys are fetched first: measure the mirrors meanwhile
+        self._mirrors.start_probing()
         try:
             response = requests.get(self._keys_url, timeout=5)
             response.raise_for_status()
         except RequestException as exc:
-            print(f"Warning: failed to update signature keys: {exc}")
+            self._info(f"Warning: failed to update signature keys: {exc}")
             return
         self._keybox.update_keys(response.content)
 
-    def download_databases(self, environments: Iterable[Environment], force: bool = False) -> None:
-        reqs = self._database.make_download_requests(self._base_url, environments)
-        self._download("Downloading package database", reqs, force)
-        self._database.reload()
+    def download_databases(self, environments: Iterable[Environment], force: bool = False) -> DatabaseChanges:
+        reqs = self._database.make_download_requests(environments)
+        if force:
+            # Changes are reported against the databases on disk, which a new process hasn't loaded yet
+            with self.trace("load databases"):
+                self._database.reload()
+        self._download("Downloading package database", reqs, "database", force)
+        with self.trace("load databases"):
+            changes = self._database.reload()
+        if force and changes:
+            self._info(f"Package database: {changes}")
+        return changes
+
+    def download_files_databases(
+        self, environments: Iterable[Environment], force: bool = False
+    ) -> dict[Environment, FilesIndexUpdate]:
+        # Indexed files databases are queried without network access: keys are only updated when
+        # something has to be downloaded
+        reqs = self._database.make_files_download_requests(environments)
+        if force or not all(request.dest.exists() for request in reqs):
+            self.update_keys()
+        self._download("Downloading files database", reqs, "files", force)
+        with self.trace("index files databases"):
+            updates = self._database.update_files_index(environments)
+        for env, update in updates.items():
+            self._info(
+                f"Indexed {env.name} files database: {update.added} packages added, {update.removed} removed, "
+                f"{update.unchanged} unchanged"
+            )
+        return updates
+
+    @property
+    def files_index(self) -> FilesIndex:
+        return self._database.files_index
 
     def download_packages(self, packages: Iterable[Package], force: bool = False) -> list[PackageFile]:
-        reqs = self._package_store.make_download_requests(self._base_url, packages)
-        self._download("Downloading packages", reqs, force)
-        return self.resolve_package_files(packages)
+        reqs = self._package_store.make_download_requests(packages)
+        self._download("Downloading packages", reqs, "package", force)
+        package_files = self.resolve_package_files(packages)
+        if self._cache_size_limit is not None:
+            result = self.collect_garbage(self._cache_size_limit)
+            if result.removed_files:
+                self._info(
+                    f"Package cache: removed {len(result.removed_files)} files ({format_size(result.freed_bytes)})"
+                )
+        return package_files
+
+    def collect_garbage(
+        self, max_size: int | None = None, pin_files: Iterable[Path] = ()
+    ) -> GarbageCollectionResult:
+        # Files referenced by the current database or pinned by lockfiles are never removed
+        protected = {self._package_store.path_for_package(package) for package in self._database}
+        for pin_file in pin_files:
+            protected.update(self._read_pin_file(pin_file))
+        with self.trace("collect garbage"):
+            return self._package_store.collect_garbage(
+                environments=(env.name for env in self._database.environments),
+                protected=protected,
+                max_size=max_size,
+            )
 
     def resolve_package_set(
         self,
@@ -88,45 +182,145 @@ class Application:
         for excluded_name in exclude:
             package = self._database.get(excluded_name)
             if not package:
-                print(f"Warning: unknown excluded package '{excluded_name}'")
+                self._info(f"Warning: unknown excluded package '{excluded_name}'")
                 continue
             excluded_packages.append(package)
+        include = list(include)
+        # Resolved sets are cached until the databases change: alternatives aren't reported again
+        request = make_request_key(
+            include, (p.name for p in excluded_packages), with_dependencies, check_conflicts
+        )
+        fingerprint = self._database.fingerprint
+        try:
+            cached = self._resolution_cache.get(fingerprint, request)
+        except AppError as exc:
+            # The cache only saves work: resolve again when it can't be read
+            self._info(f"Warning: {exc.display()}")
+            cached = None
+        if cached is not None:
+            packages = [self._database.get(name) for name in cached]
+            if all(packages):
+                return PackageSet(p for p in packages if p is not None)
         # Create set from includes and excludes
         requested_packages = PackageSet(self._database.get_all_or_raise(include)) - excluded_packages
         # Add dependencies
         if with_dependencies:
-            requested_packages.add_dependencies_recursively(exclude=excluded_packages)
+            requested_packages.add_dependencies_recursively(exclude=excluded_packages, report=self._info)
         # Check for conflicts
         if check_conflicts:
             requested_packages.check_for_conflicts()
+        try:
+            self._resolution_cache.put(fingerprint, request, (p.name for p in requested_packages))
+        except AppError as exc:
+            self._info(f"Warning: {exc.display()}")
         return requested_packages
 
     def resolve_package_files(self, packages: Iterable[Package]) -> list[PackageFile]:
         return [self._package_store.get_package_file(package) for package in packages]
 
-    def _download(self, description: str, reqs: list[DownloadRequest], force: bool = False) -> None:
+    @staticmethod
+    def _mirror_urls(options: ApplicationOptions) -> list[str]:
+        urls = list(options.base_url or [])
+        if options.mirrorlist:
+            urls.extend(MirrorPool.read_mirrorlist(options.mirrorlist))
+        return urls or ["https://mirror.msys2.org"]
+
+    def _read_pin_file(self, path: Path) -> list[Path]:
+        try:
+            lines = [line.strip() for line in path.read_text("utf-8").splitlines()]
+        except OSError as exc:
+            raise AppError(f"failed to read lockfile {path}: {exc}")
+        try:
+            return [
+                self._package_store.path_for_package_file_name(line)
+                for line in lines
+                if line and not line.startswith("#")
+            ]
+        except ValueError as exc:
+            raise AppError(f"invalid lockfile {path}: {exc}")
+
+    def _download(
+        self, description: str, reqs: list[DownloadRequest], kind: str, force: bool = False
+    ) -> None:
         if not force:
             # Don't download if already downloaded
+            for request in reqs:
+                if request.dest.exists():
+                    self.metrics.record_cache_hit(kind, request.dest)
             reqs = [r for r in reqs if not r.dest.exists()]
         if not reqs:
             # Nothing to do
             return
 
-        with DownloadProgress(len(reqs), description) as progress:
+        # rich is slow to import: commands answering from local data don't need it
+        from msys2dl.progress import DownloadProgress, create_download_progress
+
+        downloader = self._get_downloader()
+        with contextlib.ExitStack() as stack:
+            progress = None if self._options.quiet else create_download_progress(len(reqs), description)
+            if progress is not None:
+                stack.enter_context(progress)
 
             def register_callbacks(request: DownloadRequest, callbacks: DownloadCallbacks) -> None:
-                progress.register_callbacks(request, callbacks)
+                if progress is not None:
+                    progress.register_callbacks(request, callbacks)
+                # Logs only get the summary lines of DownloadProgressLog
+                if isinstance(progress, DownloadProgress):
+                    callbacks.success_handlers.register(lambda: print(f"Downloaded {request.name}"))
                 callbacks.is_interrupted_handlers.register(self._interrupt_event.is_set)
-                callbacks.success_handlers.register(lambda: print(f"Downloaded {request.name}"))
+                self.metrics.register_callbacks(kind, request, callbacks)
+                if self._tracer is not None:
+                    self._tracer.register_callbacks(request, callbacks)
 
-            self._downloader.execute_requests(reqs, register_callbacks=register_callbacks)
+            with self.trace(description, files=len(reqs)):
+                downloader.execute_requests(reqs, register_callbacks=register_callbacks)
+        if downloader.concurrency is not None:
+            self._info(f"Adaptive download concurrency: {downloader.concurrency} downloads")
 
-    @staticmethod
-    def configure_parser(parser: ArgumentParser) -> None:
-        parser.add_argument("--download-threads", type=int, default=5, help="Number of download threads")
-        parser.add_argument("--base-url", type=str, default="https://mirror.msys2.org")
-        parser.add_argument(
-            "--keys-url",
-            type=str,
-            default="https://raw.githubusercontent.com/msys2/MSYS2-keyring/master/msys2.gpg",
-        )
+    def _info(self, message: str) -> None:
+        if not self._options.quiet:
+            print(message)
+
+    def _get_downloader(self) -> DownloadEngine:
+        if self._downloader is not None:
+            return self._downloader
+        # The download engines are only imported by commands that download
+        from msys2dl.download.async_downloader import AsyncDownloader
+        from msys2dl.download.concurrency_controller import ConcurrencyController
+        from msys2dl.download.parallel_downloader import ParallelDownloader
+        from msys2dl.download.rate_limiter import HostConnectionLimiter, TokenBucket
+        from msys2dl.download.simple_downloader import SimpleDownloader
+
+        options = self._options
+        n_download_threads: int | None = options.download_threads
+        rate_limiter = TokenBucket(options.max_rate) if options.max_rate is not None else None
+        if options.download_engine == "asyncio":
+            self._downloader = AsyncDownloader(
+                keybox=self._keybox,
+                mirrors=self._mirrors,
+                n_concurrent=n_download_threads or options.max_download_threads,
+                rate_limiter=rate_limiter,
+                max_connections_per_host=options.max_connections_per_host,
+            )
+        else:
+            concurrency_controller = None
+            if n_download_threads is None:
+                concurrency_controller = ConcurrencyController(
+                    options.min_download_threads, options.max_download_threads, initial_limit=5
+                )
+            connection_limiter = None
+            if options.max_connections_per_host is not None:
+                connection_limiter = HostConnectionLimiter(options.max_connections_per_host)
+            self._downloader = ParallelDownloader(
+                downloader=SimpleDownloader(
+                    self._keybox,
+                    self._mirrors,
+                    rate_limiter=rate_limiter,
+                    connection_limiter=connection_limiter,
+                ),
+                n_threads=n_download_threads or 1,
+                hedging=not options.no_hedging,
+                adaptive_concurrency=concurrency_controller,
+            )
+        self._mirrors.start_probing()
+        return self._downloader
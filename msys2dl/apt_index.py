@@ -0,0 +1,120 @@
+import email.utils
+import gzip
+import hashlib
+import threading
+from pathlib import Path
+
+from msys2dl.utilities import run_subprocess
+
+
+def parse_control(text: str) -> dict[str, str]:
+    # Fields of one control stanza; continuation lines are kept with their leading space
+    fields: dict[str, str] = {}
+    key = None
+    for line in text.splitlines():
+        if line.startswith((" ", "\t")) and key is not None:
+            fields[key] += "\n" + line
+        elif ":" in line:
+            key, value = line.split(":", 1)
+            fields[key] = value.strip()
+    return {key: value for key, value in fields.items() if value}
+
+
+def format_control(fields: dict[str, str]) -> str:
+    return "".join(f"{key}: {value}\n" for key, value in fields.items())
+
+
+class AptIndex:
+    # The index of a flat apt repository, i.e. a directory of debs used with
+    # "deb [trusted=yes] file:/path/to/dir ./". Debs generated by msys2dl are added with the
+    # control fields and hashes computed when they are written. The other entries are kept from
+    # the previous index as long as their file is there with the same size. Only debs that are not
+    # indexed yet, e.g. generated before the index was enabled, are read again.
+    index_names = ("Packages", "Packages.gz", "Release")
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._entries: dict[str, dict[str, str]] = {}
+        self._lock = threading.Lock()
+        self._previous = ""
+        packages_path = root / "Packages"
+        if packages_path.exists():
+            self._previous = packages_path.read_text("utf-8")
+            for stanza in self._previous.split("\n\n"):
+                fields = parse_control(stanza)
+                if "Filename" in fields:
+                    self._entries[fields["Filename"]] = fields
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_indexed(self, deb_path: Path) -> bool:
+        # Whether the deb is in the index and its file still has the indexed size
+        with self._lock:
+            fields = self._entries.get(self._filename(deb_path))
+        return fields is not None and deb_path.exists() and str(deb_path.stat().st_size) == fields.get("Size")
+
+    def add(self, deb_path: Path, control: str) -> None:
+        fields = self._make_entry(deb_path, control)
+        with self._lock:
+            self._entries[fields["Filename"]] = fields
+
+    def save(self) -> bool:
+        # Writes the index if its content changed; returns whether it did.
+        # Entries of removed or replaced debs are dropped, debs without an entry are read first.
+        debs = {f"./{path.name}": path for path in self.root.glob("*.deb")}
+        with self._lock:
+            for filename in list(self._entries):
+                path = debs.get(filename)
+                if path is None or str(path.stat().st_size) != self._entries[filename].get("Size"):
+                    del self._entries[filename]
+            unknown = [path for filename, path in debs.items() if filename not in self._entries]
+        for path in unknown:
+            self.add(path, run_subprocess(["dpkg-deb", "--field", str(path)]))
+        with self._lock:
+            entries = sorted(
+                self._entries.values(),
+                key=lambda f: (f.get("Package", ""), f.get("Version", ""), f["Filename"]),
+            )
+            content = "\n".join(format_control(fields) for fields in entries)
+            if content == self._previous and all((self.root / name).exists() for name in self.index_names):
+                return False
+            packages = content.encode("utf-8")
+            # No timestamp in the compressed index: the same entries give the same bytes
+            packages_gz = gzip.compress(packages, mtime=0)
+            self._write("Packages", packages)
+            self._write("Packages.gz", packages_gz)
+            self._write("Release", self._release({"Packages": packages, "Packages.gz": packages_gz}))
+            self._previous = content
+            return True
+
+    def _make_entry(self, deb_path: Path, control: str) -> dict[str, str]:
+        # Only SHA256: apt rejects an entry with MD5sum and SHA256 but without SHA1, and ignores the
+        # weaker hashes when SHA256 is there
+        fields = parse_control(control)
+        sha256 = hashlib.sha256()
+        size = 0
+        with deb_path.open("rb") as deb_file:
+            while chunk := deb_file.read(1024 * 1024):
+                sha256.update(chunk)
+                size += len(chunk)
+        fields.update(Filename=self._filename(deb_path), Size=str(size), SHA256=sha256.hexdigest())
+        return fields
+
+    def _filename(self, deb_path: Path) -> str:
+        return f"./{deb_path.relative_to(self.root).as_posix()}"
+
+    @staticmethod
+    def _release(files: dict[str, bytes]) -> bytes:
+        lines = [f"Date: {email.utils.formatdate(usegmt=True)}", "SHA256:"]
+        lines.extend(
+            f" {hashlib.sha256(data).hexdigest()} {len(data)} {name}" for name, data in files.items()
+        )
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def _write(self, name: str, data: bytes) -> None:
+        # Replaced in one step: apt never reads a partial index
+        path = self.root / name
+        partial_path = path.with_name(name + ".part")
+        partial_path.write_bytes(data)
+        partial_path.replace(path)
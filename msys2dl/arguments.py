@@ -0,0 +1,128 @@
+import os
+from argparse import ArgumentParser, Namespace
+from dataclasses import dataclass, fields
+from pathlib import Path
+
+from msys2dl.utilities import parse_size
+
+# Only light modules may be imported here: the parser is built before the application is
+# imported, so that --help and usage errors don't pay for loading the download stack.
+
+
+@dataclass
+class ApplicationOptions:
+    # Settings of an Application. The command line fills them from its options; library users
+    # create them directly.
+    home: Path | None = None  # default: $MSYS2DL_HOME or ~/.local/share/msys2dl
+    base_url: list[str] | None = None  # default: https://mirror.msys2.org
+    mirrorlist: Path | None = None
+    keys_url: str = "https://raw.githubusercontent.com/msys2/MSYS2-keyring/master/msys2.gpg"
+    download_threads: int | None = 5  # None adapts the number of downloads to the throughput
+    download_engine: str = "threads"
+    min_download_threads: int = 2
+    max_download_threads: int = 32
+    max_rate: int | None = None
+    max_connections_per_host: int | None = None
+    no_hedging: bool = False
+    trace: Path | None = None
+    metrics: Path | None = None
+    metrics_format: str = "prometheus"
+    cache_size_limit: int | None = None
+    quiet: bool = False  # no progress display, warnings or message for each file
+    handle_signals: bool = True  # SIGINT and SIGTERM interrupt the running downloads
+
+    @classmethod
+    def from_args(cls, args: Namespace) -> "ApplicationOptions":
+        return cls(**{f.name: getattr(args, f.name) for f in fields(cls) if hasattr(args, f.name)})
+
+
+def _download_threads(value: str) -> int | None:
+    return None if value == "auto" else int(value)
+
+
+def configure_parser(parser: ArgumentParser) -> None:
+    # Options of the application, shared by all commands
+    parser.add_argument(
+        "--download-threads",
+        metavar="N",
+        type=_download_threads,
+        default=ApplicationOptions.download_threads,
+        help="Number of download threads, or 'auto' to adapt it to the measured throughput",
+    )
+    parser.add_argument(
+        "--download-engine",
+        choices=["threads", "asyncio"],
+        default=ApplicationOptions.download_engine,
+        help="'asyncio' runs all downloads on one thread, --download-threads sets the number of connections",
+    )
+    parser.add_argument(
+        "--min-download-threads", metavar="N", type=int, default=ApplicationOptions.min_download_threads
+    )
+    parser.add_argument(
+        "--max-download-threads", metavar="N", type=int, default=ApplicationOptions.max_download_threads
+    )
+    parser.add_argument(
+        "--max-rate",
+        metavar="RATE",
+        type=parse_size,
+        default=None,
+        help="Limit the combined download rate to RATE bytes per second (e.g. 10M)",
+    )
+    parser.add_argument(
+        "--max-connections-per-host",
+        metavar="N",
+        type=int,
+        default=None,
+        help="Limit the number of concurrent requests to each mirror",
+    )
+    parser.add_argument(
+        "--base-url",
+        metavar="URL",
+        type=str,
+        action="append",
+        default=None,
+        help="Mirror URL, can be given multiple times (default: https://mirror.msys2.org)",
+    )
+    parser.add_argument("--mirrorlist", metavar="FILE", type=Path, default=None)
+    parser.add_argument(
+        "--no-hedging",
+        action="store_true",
+        default=False,
+        help="Don't send duplicate requests for stalled downloads",
+    )
+    parser.add_argument(
+        "--keys-url",
+        type=str,
+        default=ApplicationOptions.keys_url,
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        type=Path,
+        default=None,
+        help="Write the time spent in each step and download to FILE, in the Chrome trace format",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        type=Path,
+        default=None,
+        help="Write counters and histograms of the run to FILE, e.g. for the Prometheus textfile collector",
+    )
+    parser.add_argument(
+        "--metrics-format", choices=["prometheus", "json"], default=ApplicationOptions.metrics_format
+    )
+    parser.add_argument(
+        "--cache-size-limit",
+        metavar="SIZE",
+        type=parse_size,
+        default=os.getenv("MSYS2DL_CACHE_SIZE_LIMIT"),
+        help="Evict least recently used packages when the package cache grows beyond SIZE",
+    )
+    parser.add_argument(
+        "--server",
+        metavar="SOCKET",
+        type=Path,
+        default=None,
+        help="Send the command to the server started by 'msys2dl serve' listening on SOCKET",
+    )
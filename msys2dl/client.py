@@ -0,0 +1,48 @@
+import json
+import socket
+from argparse import Namespace
+from pathlib import Path
+from typing import Any
+
+from msys2dl.package import Environment
+from msys2dl.package_database import PackageNameResolver
+from msys2dl.utilities import AppError
+
+# Client side of `msys2dl serve`. It only uses light modules: a command sent to a server doesn't
+# load the download stack or the package databases.
+
+
+def send_request(socket_path: Path, request: dict[str, Any]) -> dict[str, Any]:
+    # Returns the response of the server: "result" and "messages" for the user. Raises AppError
+    # with the error reported by the server.
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(str(socket_path))
+        except OSError as exc:
+            raise AppError(f"no msys2dl server is listening on {socket_path}: {exc.strerror}")
+        connection.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with connection.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        raise AppError(f"the msys2dl server on {socket_path} closed the connection")
+    response: dict[str, Any] = json.loads(line)
+    if not response["ok"]:
+        raise AppError(response["error"])
+    return response
+
+
+def run_remote_command(socket_path: Path, args: Namespace) -> None:
+    # Runs extract or make-deb on the server; names are completed here, as --env belongs to the call
+    name_resolver = PackageNameResolver(Environment.by_name(args.env) if args.env else None)
+    request = {
+        "command": args.command_name,
+        "packages": name_resolver.resolve_full_names(args.include),
+        "exclude": name_resolver.resolve_full_names(args.exclude),
+        "with_dependencies": not args.no_deps,
+        "check_conflicts": not args.ignore_conflicts,
+        "output": str(args.output.absolute()),
+    }
+    if args.command_name == "make-deb":
+        request.update(bundle=args.bundle, bundle_version=args.bundle_version, apt_index=args.apt_index)
+    for message in send_request(socket_path, request)["messages"]:
+        print(message)
@@ -1,20 +1,23 @@
 from argparse import ArgumentParser, Namespace
-from typing import Protocol
+from typing import TYPE_CHECKING, ClassVar, Protocol
 
-from msys2dl.application import Application
+if TYPE_CHECKING:
+    from msys2dl.application import Application
 
 
 class CommandType(Protocol):
     command_name: str
 
-    def __call__(self, app: Application, args: Namespace) -> "Command": ...
+    def __call__(self, app: "Application", args: Namespace) -> "Command": ...
 
     def configure_parser(self, parser: ArgumentParser) -> None: ...
 
 
 class Command:
-    def __init__(self, app: Application, _args: Namespace):
-        self._app: Application = app
+    command_name: ClassVar[str]
+
+    def __init__(self, app: "Application", _args: Namespace):
+        self._app: "Application" = app
 
     def run(self) -> None:
         pass
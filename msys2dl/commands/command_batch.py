@@ -0,0 +1,158 @@
+import json
+import os
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, ClassVar
+
+from msys2dl.commands.command import Command
+from msys2dl.commands.command_make_deb import DebBuilder
+from msys2dl.package import Environment, Package
+from msys2dl.package_database import PackageNameResolver
+from msys2dl.package_store import PackageFile
+from msys2dl.utilities import AppError
+
+if TYPE_CHECKING:
+    from msys2dl.application import Application
+    from msys2dl.progress import ProgressCounter
+
+
+@dataclass
+class BatchTarget:
+    # One entry of a batch manifest: the package set of one environment and what to do with it
+    command: str
+    include: list[str]
+    output: Path
+    exclude: list[str] = field(default_factory=list)
+    with_dependencies: bool = True
+    check_conflicts: bool = True
+    packages: list[Package] = field(default_factory=list)
+
+    commands: ClassVar[tuple[str, ...]] = ("extract", "make-deb")
+
+    @classmethod
+    def from_json(cls, entry: dict[str, Any], manifest_dir: Path) -> "BatchTarget":
+        command = entry["command"]
+        if command not in cls.commands:
+            raise AppError(f"unknown command '{command}', expected one of {', '.join(cls.commands)}")
+        env = entry.get("env")
+        name_resolver = PackageNameResolver(Environment.by_name_or_raise(env) if env else None)
+        include = name_resolver.resolve_full_names(cls._names(entry, "include"))
+        if not include:
+            raise AppError("'include' is empty")
+        return cls(
+            command=command,
+            include=include,
+            # Relative to the manifest, so that it can be used from any directory
+            output=manifest_dir / entry.get("output", "."),
+            exclude=name_resolver.resolve_full_names(cls._names(entry, "exclude")),
+            with_dependencies=not entry.get("no_deps", False),
+            check_conflicts=not entry.get("ignore_conflicts", False),
+        )
+
+    @property
+    def environments(self) -> set[Environment]:
+        return {Environment.by_package_name_or_raise(name) for name in self.include + self.exclude}
+
+    @staticmethod
+    def _names(entry: dict[str, Any], key: str) -> list[str]:
+        # A single name would otherwise be taken as a list of one-letter names
+        names = entry.get(key, [])
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            raise AppError(f"'{key}' must be a list of package names")
+        return names
+
+
+def load_manifest(path: Path) -> list[BatchTarget]:
+    # A manifest is a JSON object with a "targets" list, see the README for the keys of a target
+    try:
+        entries = json.loads(path.read_text("utf-8"))["targets"]
+    except (OSError, ValueError, KeyError, TypeError) as exc:
+        raise AppError(f"can't read manifest {path}: {exc!r}")
+    targets = []
+    for i, entry in enumerate(entries):
+        try:
+            targets.append(BatchTarget.from_json(entry, path.parent))
+        except (AppError, ValueError, KeyError, TypeError) as exc:
+            message = exc.display() if isinstance(exc, AppError) else repr(exc)
+            raise AppError(f"invalid target {i} in manifest {path}: {message}")
+    if not targets:
+        raise AppError(f"manifest {path} has no targets")
+    return targets
+
+
+class CommandBatch(Command):
+    # Runs the targets of a manifest with one key update, one database load and one download job
+    # for the union of their packages. The actions of different targets then run in parallel.
+    command_name: ClassVar[str] = "batch"
+
+    def __init__(self, app: "Application", args: Namespace):
+        super().__init__(app, args)
+        self.targets = load_manifest(args.manifest)
+
+    def run(self) -> None:
+        # rich is slow to import: --help doesn't need it
+        from msys2dl.progress import ProgressCounter
+
+        with self._app.trace("update keys"):
+            self._app.update_keys()
+        with self._app.trace("download databases"):
+            self._app.download_databases(set().union(*(target.environments for target in self.targets)))
+        with self._app.trace("resolve packages"):
+            for target in self.targets:
+                target.packages = list(
+                    self._app.resolve_package_set(
+                        target.include,
+                        target.exclude,
+                        with_dependencies=target.with_dependencies,
+                        check_conflicts=target.check_conflicts,
+                    )
+                )
+        union = list(dict.fromkeys(package for target in self.targets for package in target.packages))
+        with self._app.trace("download packages"):
+            package_files = {
+                package_file.metadata: package_file for package_file in self._app.download_packages(union)
+            }
+
+        n_actions = sum(len(target.packages) for target in self.targets)
+        n_workers = min(len(self.targets), os.cpu_count() or 1)
+        with (
+            ProgressCounter(n_actions, description="Running targets") as progress,
+            ThreadPoolExecutor(n_workers, thread_name_prefix="target") as pool,
+        ):
+            futures = [
+                pool.submit(
+                    self._run_target,
+                    target,
+                    [package_files[package] for package in target.packages],
+                    progress,
+                )
+                for target in self.targets
+            ]
+            for future in futures:
+                future.result()
+
+    def _run_target(
+        self, target: BatchTarget, package_files: list[PackageFile], progress: "ProgressCounter"
+    ) -> None:
+        target.output.mkdir(parents=True, exist_ok=True)
+        builder = DebBuilder(self._app.trace)
+        for package_file in package_files:
+            self._app.check_interrupted()
+            with (
+                self._app.trace(package_file.metadata.name, target=str(target.output)),
+                self._app.metrics.time_action(target.command),
+            ):
+                if target.command == "extract":
+                    package_file.extract(target.output)
+                    print(f"Extracted {package_file.metadata} to {target.output}")
+                else:
+                    deb_path = builder.build(package_file, target.output)
+                    print(f"Generated {deb_path.name} in {target.output}")
+            progress.increment()
+
+    @classmethod
+    def configure_parser(cls, parser: ArgumentParser) -> None:
+        super().configure_parser(parser)
+        parser.add_argument(dest="manifest", metavar="MANIFEST", type=Path)
@@ -1,20 +1,102 @@
-from argparse import Namespace
-from typing import ClassVar
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from typing import TYPE_CHECKING, ClassVar
 
-from msys2dl.application import Application
 from msys2dl.commands.command import Command
 from msys2dl.commands.output_dir_mixin import OutputDirMixin
 from msys2dl.commands.package_set_mixin import PackageSetMixin
+from msys2dl.oci_image import Layer, OciImageLayout
 from msys2dl.package_store import PackageFile
+from msys2dl.sysroot_archive import SysrootArchive
+from msys2dl.utilities import AppError, format_size
+
+if TYPE_CHECKING:
+    from msys2dl.application import Application
 
 
 class CommandExtract(PackageSetMixin, OutputDirMixin, Command):
     command_name: ClassVar[str] = "extract"
     action_title = "Extracting files"
+    formats: ClassVar[tuple[str, ...]] = ("dir", "oci", "tar.zst")
 
-    def __init__(self, app: Application, args: Namespace):
+    def __init__(self, app: "Application", args: Namespace):
         super().__init__(app, args)
+        self.format: str = args.format
+        self.tag: str = args.tag
+        self.max_layers: int = args.max_layers
+        self.oci_arch: str = args.oci_arch
+        self.archive: SysrootArchive | None = None
+        if self.format == "tar.zst":
+            # --output is the archive: only its directory is created
+            self.archive_path: Path = args.output
+            self.output_dir = self.archive_path.absolute().parent
+
+    def run(self) -> None:
+        if self.format == "oci":
+            self.run_oci()
+        elif self.format == "tar.zst":
+            self.run_archive()
+        else:
+            super().run()
 
     def do_package_action(self, package_file: PackageFile) -> None:
+        if self.archive is not None:
+            self.archive.add(package_file)
+            print(f"Archived {package_file.metadata}")
+            return
         package_file.extract(self.output_dir)
         print(f"Extracted {package_file.metadata}")
+
+    def run_archive(self) -> None:
+        if self.archive_path.is_dir():
+            raise AppError(f"{self.archive_path} is a directory, give the path of the archive with --output")
+        with SysrootArchive(self.archive_path, self.check_for_conflicts) as archive:
+            self.archive = archive
+            super().run()
+        size = format_size(self.archive_path.stat().st_size)
+        print(f"Wrote {self.archive_path} with {len(self.package_files)} packages ({size})")
+
+    def run_oci(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        layout = OciImageLayout(self.output_dir, self.max_layers)
+        layers: list[Layer] = []
+
+        def write_layer(package_files: list[PackageFile]) -> None:
+            layer = layout.write_layer(package_files)
+            layers.append(layer)
+            names = ", ".join(str(package_file.metadata) for package_file in package_files)
+            print(f"{'Reused' if layer.reused else 'Wrote'} layer {layer.digest[7:19]} ({names})")
+
+        self.process_packages(
+            self.resolve_package_set(), title="Writing layers", group=layout.group, action=write_layer
+        )
+        digest = layout.save(layers, self.tag, self.oci_arch)
+        n_written = sum(not layer.reused for layer in layers)
+        print(f"Image {self.tag} with {len(layers)} layers ({n_written} written): {digest}")
+
+    @classmethod
+    def configure_parser(cls, parser: ArgumentParser) -> None:
+        super().configure_parser(parser)
+        parser.add_argument(
+            "--format",
+            choices=cls.formats,
+            default="dir",
+            help="dir: extract into the output directory; oci: write an image with the packages as layers "
+            "into the output directory, an OCI image layout; tar.zst: write one archive, --output is its path",
+        )
+        parser.add_argument(
+            "--tag",
+            default="latest",
+            help="Reference name of the image in the OCI image layout (default: latest)",
+        )
+        parser.add_argument(
+            "--max-layers",
+            type=int,
+            default=100,
+            help="Maximum number of layers of an OCI image; packages share layers beyond it (default: 100)",
+        )
+        parser.add_argument(
+            "--oci-arch",
+            default="amd64",
+            help="Architecture of the platform the OCI image is for, e.g. arm64 (default: amd64)",
+        )
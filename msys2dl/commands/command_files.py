@@ -0,0 +1,97 @@
+from abc import abstractmethod
+from argparse import ArgumentParser, Namespace
+from typing import TYPE_CHECKING, ClassVar
+
+from msys2dl.commands.command import Command
+from msys2dl.files_index import FileOwner
+from msys2dl.package import Environment
+from msys2dl.utilities import AppError
+
+if TYPE_CHECKING:
+    from msys2dl.application import Application
+
+
+class FilesQueryCommand(Command):
+    # Looks up files in the index of the .files databases. The databases of the environments
+    # given with --env are downloaded and indexed first if needed; without --env, all indexed
+    # environments are searched.
+    def __init__(self, app: "Application", args: Namespace):
+        super().__init__(app, args)
+        self.environments = [Environment.by_name_or_raise(name) for name in args.env]
+        self.refresh: bool = args.refresh
+
+    def run(self) -> None:
+        environments = set(self.environments) or self._app.files_index.environments
+        if not environments:
+            raise AppError("no files database has been indexed yet, select environments with --env")
+        if self.environments or self.refresh:
+            with self._app.trace("download files databases"):
+                self._app.download_files_databases(environments, force=self.refresh)
+        with self._app.trace("query files index"):
+            owners = self.query(environments)
+        for owner in owners:
+            print(owner)
+
+    @abstractmethod
+    def query(self, environments: set[Environment]) -> list[FileOwner]: ...
+
+    @classmethod
+    def configure_parser(cls, parser: ArgumentParser) -> None:
+        super().configure_parser(parser)
+        parser.add_argument(
+            "--env",
+            action="append",
+            default=[],
+            choices=[n for e in Environment.all for n in [e.name, *e.alias]],
+            help="Environment to search, can be given multiple times (default: all indexed environments)",
+        )
+        parser.add_argument(
+            "--refresh",
+            action="store_true",
+            default=False,
+            help="Download the files databases again and update the index",
+        )
+
+
+class CommandWhich(FilesQueryCommand):
+    command_name: ClassVar[str] = "which"
+
+    def __init__(self, app: "Application", args: Namespace):
+        super().__init__(app, args)
+        self.path: str = args.path
+
+    def query(self, environments: set[Environment]) -> list[FileOwner]:
+        owners = self._app.files_index.which(self.path, environments)
+        if not owners:
+            raise AppError(f"no package contains {self.path}")
+        return owners
+
+    @classmethod
+    def configure_parser(cls, parser: ArgumentParser) -> None:
+        super().configure_parser(parser)
+        parser.add_argument(
+            dest="path", metavar="PATH", help="File name or path, e.g. zlib.h or lib/libssl.dll.a"
+        )
+
+
+class CommandSearch(FilesQueryCommand):
+    command_name: ClassVar[str] = "search"
+
+    def __init__(self, app: "Application", args: Namespace):
+        super().__init__(app, args)
+        self.pattern: str = args.pattern
+
+    def query(self, environments: set[Environment]) -> list[FileOwner]:
+        owners = self._app.files_index.search(self.pattern, environments)
+        if not owners:
+            raise AppError(f"no file matches {self.pattern}")
+        return owners
+
+    @classmethod
+    def configure_parser(cls, parser: ArgumentParser) -> None:
+        super().configure_parser(parser)
+        parser.add_argument(
+            dest="pattern",
+            metavar="PATTERN",
+            help="Shell-style pattern, matched against file names, or against paths if it contains a slash",
+        )
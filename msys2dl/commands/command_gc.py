@@ -0,0 +1,32 @@
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from typing import TYPE_CHECKING, ClassVar
+
+from msys2dl.commands.command import Command
+from msys2dl.utilities import format_size, parse_size
+
+if TYPE_CHECKING:
+    from msys2dl.application import Application
+
+
+class CommandGc(Command):
+    command_name: ClassVar[str] = "gc"
+
+    def __init__(self, app: "Application", args: Namespace):
+        super().__init__(app, args)
+        self.max_size: int | None = args.max_size
+        self.pin_files: list[Path] = args.keep
+
+    def run(self) -> None:
+        result = self._app.collect_garbage(self.max_size, self.pin_files)
+        for path in result.removed_files:
+            print(f"Removed {path.name}")
+        print(
+            f"Freed {format_size(result.freed_bytes)}, package cache size is {format_size(result.remaining_bytes)}"
+        )
+
+    @classmethod
+    def configure_parser(cls, parser: ArgumentParser) -> None:
+        super().configure_parser(parser)
+        parser.add_argument("--max-size", metavar="SIZE", type=parse_size, default=None)
+        parser.add_argument("--keep", metavar="LOCKFILE", type=Path, action="append", default=[])
@@ -1,32 +1,166 @@
 import re
 import tempfile
 import textwrap
-from argparse import Namespace
+from argparse import ArgumentParser, Namespace
+from collections.abc import Callable
+from contextlib import AbstractContextManager, nullcontext
 from pathlib import Path
-from typing import ClassVar
+from typing import TYPE_CHECKING, ClassVar
 
-from msys2dl.application import Application
+from msys2dl.apt_index import AptIndex
 from msys2dl.commands.command import Command
 from msys2dl.commands.output_dir_mixin import OutputDirMixin
 from msys2dl.commands.package_set_mixin import PackageSetMixin
-from msys2dl.package import Package
+from msys2dl.package import Environment, Package
 from msys2dl.package_store import PackageFile
 from msys2dl.utilities import run_subprocess
 
+if TYPE_CHECKING:
+    from msys2dl.application import Application
+
 
 class CommandMakeDeb(PackageSetMixin, OutputDirMixin, Command):
     command_name: ClassVar[str] = "make-deb"
     action_title = "Making debian packages"
 
-    def __init__(self, app: Application, args: Namespace):
+    def __init__(self, app: "Application", args: Namespace):
         super().__init__(app, args)
+        self.debs = DebOutput(
+            self.output_dir,
+            self._app.trace,
+            print,
+            bundle=args.bundle,
+            bundle_version=args.bundle_version,
+            apt_index=args.apt_index,
+        )
+
+    def run(self) -> None:
+        with self.debs:
+            super().run()
+            self.debs.finish(self._app.check_interrupted)
 
     def do_package_action(self, package_file: PackageFile) -> None:
-        deb_path = DebBuilder().build(package_file, self.output_dir)
-        print(f"Generated {deb_path.name}")
+        self.debs.add(package_file)
+
+    @classmethod
+    def configure_parser(cls, parser: ArgumentParser) -> None:
+        super().configure_parser(parser)
+        parser.add_argument(
+            "--bundle",
+            metavar="NAME",
+            default=None,
+            help="Pack the packages of each environment into one deb named NAME-msys2-ENV",
+        )
+        parser.add_argument(
+            "--bundle-version", metavar="VERSION", default="1", help="Version of the bundle debs (default: 1)"
+        )
+        parser.add_argument(
+            "--apt-index",
+            action="store_true",
+            default=False,
+            help="Maintain Packages, Packages.gz and Release in the output directory for use as an apt repository",
+        )
+
+
+class DebBundle:
+    # Several MSYS2 packages of one environment extracted into one build directory, to be packed
+    # into a single deb: dpkg then does its database bookkeeping and triggers once, not per package
+    def __init__(self, name: str, environment: Environment, build_root: Path) -> None:
+        self.deb_name = f"{name}-msys2-{environment.name}"
+        self.build_dir = build_root / self.deb_name
+        self.packages: list[Package] = []
+        self.files: list[tuple[Package, str]] = []
+
+    def add(self, package_file: PackageFile) -> None:
+        self.packages.append(package_file.metadata)
+        self.files.extend((package_file.metadata, file) for file in package_file.extract(self.build_dir))
+
+    @property
+    def file_list_path(self) -> str:
+        # Which MSYS2 package each file of the bundle comes from, installed with the bundle
+        return f"usr/share/doc/{self.deb_name}/msys2-files"
+
+
+class DebOutput:
+    # The debs of one make-deb run: a deb per package, or with a bundle name, one deb for the
+    # packages of each environment. With apt_index, the apt repository index of output_dir is kept
+    # up to date, and the debs already in it are not built again. Packages are added in the context,
+    # and finish() packs the bundles and saves the index. Progress messages go to report.
+    def __init__(
+        self,
+        output_dir: Path,
+        trace: Callable[[str], AbstractContextManager[None]] = lambda _name: nullcontext(),
+        report: Callable[[str], None] = lambda _message: None,
+        *,
+        bundle: str | None = None,
+        bundle_version: str = "1",
+        apt_index: bool = False,
+    ) -> None:
+        self.output_dir = output_dir
+        self.bundle_name = bundle
+        self.bundle_version = bundle_version
+        self.apt_index = AptIndex(output_dir) if apt_index else None
+        self.builder = DebBuilder(trace, self.apt_index)
+        self.deb_paths: list[Path] = []
+        self._trace = trace
+        self._report = report
+        self._bundles: dict[Environment, DebBundle] = {}
+        self._bundle_dir: tempfile.TemporaryDirectory[str] | None = None
+
+    def __enter__(self) -> "DebOutput":
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        if self._bundle_dir is not None:
+            self._bundle_dir.cleanup()
+            self._bundle_dir = None
+
+    def add(self, package_file: PackageFile) -> None:
+        if self.bundle_name is None:
+            deb_path = self.output_dir / self.builder.deb_file_name(package_file.metadata)
+            if self.apt_index is not None and self.apt_index.is_indexed(deb_path):
+                # Published before: the same package version gives the same deb
+                self.deb_paths.append(deb_path)
+                self._report(f"Kept {deb_path.name}")
+                return
+            deb_path = self.builder.build(package_file, self.output_dir)
+            self.deb_paths.append(deb_path)
+            self._report(f"Generated {deb_path.name}")
+            return
+        if self._bundle_dir is None:
+            self._bundle_dir = tempfile.TemporaryDirectory(prefix=self.bundle_name, suffix="build")
+        environment = package_file.metadata.environment
+        bundle = self._bundles.setdefault(
+            environment, DebBundle(self.bundle_name, environment, Path(self._bundle_dir.name))
+        )
+        with self._trace("extract"):
+            bundle.add(package_file)
+        self._report(f"Added {package_file.metadata} to {bundle.deb_name}")
+
+    def finish(self, check_interrupted: Callable[[], None] = lambda: None) -> list[Path]:
+        # Returns the paths of the debs of the run
+        for bundle in self._bundles.values():
+            check_interrupted()
+            deb_path = self.builder.build_bundle(bundle, self.output_dir, self.bundle_version)
+            self.deb_paths.append(deb_path)
+            self._report(f"Generated {deb_path.name} with {len(bundle.packages)} packages")
+        self._bundles.clear()
+        if self.apt_index is not None:
+            with self._trace("apt index"):
+                updated = self.apt_index.save()
+            self._report(f"{'Updated' if updated else 'Unchanged'} apt index of {len(self.apt_index)} debs")
+        return self.deb_paths
 
 
 class DebBuilder:
+    def __init__(
+        self,
+        trace: Callable[[str], AbstractContextManager[None]] = lambda _name: nullcontext(),
+        apt_index: AptIndex | None = None,
+    ) -> None:
+        self._trace = trace
+        self._apt_index = apt_index
+
     def build(self, msys2_package_file: PackageFile, output_dir: Path) -> Path:
         package = msys2_package_file.metadata
 
@@ -38,7 +172,8 @@ class DebBuilder:
             build_dir = Path(tdir) / f"{deb_name}-${msys2_package_file.metadata.version}.name"
 
             # Extract package contents & perform directory renames
-            msys2_package_file.extract(build_dir)
+            with self._trace("extract"):
+                msys2_package_file.extract(build_dir)
 
             # Generate control file
             single_line_description = package.description.replace("\n", " ")
@@ -54,14 +189,70 @@ class DebBuilder:
 
                """
             )
-            (build_dir / "DEBIAN").mkdir(parents=True)
-            (build_dir / "DEBIAN/control").write_text(control_file_content, encoding="utf-8")
+            return self._pack(build_dir, deb_name, version, control_file_content, output_dir)
+
+    def deb_file_name(self, package: Package) -> str:
+        return (
+            f"{self._generate_package_name(package)}_{self._convert_package_version(package.version)}_all.deb"
+        )
+
+    def build_bundle(self, bundle: DebBundle, output_dir: Path, version: str) -> Path:
+        packages = sorted(bundle.packages, key=lambda p: p.name)
+        names = {package.name for package in packages}
+        # Each bundled package stands in for the deb that make-deb generates for it alone
+        replaced = [self._generate_package_name(package) for package in packages]
+        provides = [
+            f"{self._generate_package_name(package)} (= {self._convert_package_version(package.version)})"
+            for package in packages
+        ]
+        recommends = sorted(
+            {
+                self._generate_package_name(dependency)
+                for package in packages
+                for dependency in package.dependencies
+                if isinstance(dependency, Package) and dependency.name not in names
+            }
+        )
+        environment = packages[0].environment.name
+        fields = {
+            "Package": bundle.deb_name,
+            "Version": self._convert_package_version(version),
+            "Architecture": "all",
+            "Maintainer": "unknown",
+            "Provides": ", ".join(provides),
+            "Conflicts": ", ".join(replaced),
+            "Replaces": ", ".join(replaced),
+            "Recommends": ", ".join(recommends),
+            # Extended description lines start with a space
+            "Description": f"{len(packages)} MSYS2 {environment} packages\n"
+            + "\n".join(f" {package}" for package in packages),
+        }
+        control_file_content = "".join(f"{key}: {value}\n" for key, value in fields.items() if value)
+
+        file_list_path = bundle.build_dir / bundle.file_list_path
+        file_list_path.parent.mkdir(parents=True, exist_ok=True)
+        file_list_path.write_text(
+            "".join(f"{package} {file}\n" for package, file in sorted(bundle.files, key=lambda f: f[1])),
+            encoding="utf-8",
+        )
+        return self._pack(
+            bundle.build_dir, bundle.deb_name, fields["Version"], control_file_content, output_dir
+        )
+
+    def _pack(self, build_dir: Path, deb_name: str, version: str, control: str, output_dir: Path) -> Path:
+        (build_dir / "DEBIAN").mkdir(parents=True)
+        (build_dir / "DEBIAN/control").write_text(control, encoding="utf-8")
 
-            # Run dpkg-deb
-            deb_file_name = f"{deb_name}_{version}_all.deb"
-            deb_path = output_dir / deb_file_name
+        # Run dpkg-deb
+        deb_file_name = f"{deb_name}_{version}_all.deb"
+        deb_path = output_dir / deb_file_name
+        with self._trace("dpkg-deb"):
             run_subprocess(["dpkg-deb", "-Znone", "--root-owner-group", "-b", str(build_dir), str(deb_path)])
-            return deb_path
+        if self._apt_index is not None:
+            # Hashed right away, while the deb is still in the page cache
+            with self._trace("index"):
+                self._apt_index.add(deb_path, control)
+        return deb_path
 
     @staticmethod
     def _generate_package_name(package: Package) -> str:
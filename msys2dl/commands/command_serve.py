@@ -0,0 +1,39 @@
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from typing import TYPE_CHECKING, ClassVar
+
+from msys2dl.commands.command import Command
+
+if TYPE_CHECKING:
+    from msys2dl.application import Application
+
+
+class CommandServe(Command):
+    command_name: ClassVar[str] = "serve"
+
+    def __init__(self, app: "Application", args: Namespace):
+        super().__init__(app, args)
+        self.socket_path: Path = args.socket
+        self.refresh_interval: float = args.refresh_interval
+
+    def run(self) -> None:
+        from msys2dl.api import Msys2dl
+        from msys2dl.server import Server
+
+        with Server(Msys2dl(application=self._app), self.socket_path, self.refresh_interval):
+            print(f"Listening on {self.socket_path}")
+            # Requests are served on other threads; SIGINT or SIGTERM stops the server
+            self._app.wait_for_interrupt()
+        print("Stopped")
+
+    @classmethod
+    def configure_parser(cls, parser: ArgumentParser) -> None:
+        super().configure_parser(parser)
+        parser.add_argument("--socket", metavar="PATH", type=Path, required=True)
+        parser.add_argument(
+            "--refresh-interval",
+            metavar="SECONDS",
+            type=float,
+            default=3600.0,
+            help="Download the package databases and keys again every SECONDS, 0 disables it",
+        )
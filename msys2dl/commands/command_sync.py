@@ -0,0 +1,47 @@
+from argparse import Namespace
+from typing import TYPE_CHECKING, ClassVar
+
+from msys2dl.commands.command import Command
+from msys2dl.commands.output_dir_mixin import OutputDirMixin
+from msys2dl.commands.package_set_mixin import PackageSetMixin
+from msys2dl.package_store import PackageFile
+from msys2dl.sysroot import Sysroot
+
+if TYPE_CHECKING:
+    from msys2dl.application import Application
+
+
+class CommandSync(PackageSetMixin, OutputDirMixin, Command):
+    # Like extract, but only downloads and extracts the packages whose file name changed since
+    # the last sync into the output directory, and removes the files of dropped packages. The
+    # package databases are always downloaded again, to catch up with the mirror.
+    command_name: ClassVar[str] = "sync"
+    action_title = "Syncing packages"
+
+    def __init__(self, app: "Application", args: Namespace):
+        super().__init__(app, args)
+        self.sysroot = Sysroot(self.output_dir)
+        self.stale_files: list[str] = []
+
+    def run(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        plan = self.sysroot.plan(self.resolve_package_set(refresh=True))
+        if not plan:
+            print(f"Up to date: {plan.unchanged} packages")
+            return
+        self.process_packages(plan.install + plan.update)
+        for name in plan.remove:
+            self.stale_files.extend(self.sysroot.forget(name))
+            print(f"Removed {name}")
+        with self._app.trace("remove files"):
+            n_removed_files = self.sysroot.remove_files(self.stale_files)
+        self.sysroot.save()
+        print(
+            f"Installed {len(plan.install)}, updated {len(plan.update)}, removed {len(plan.remove)} packages "
+            f"({n_removed_files} files), {plan.unchanged} unchanged"
+        )
+
+    def do_package_action(self, package_file: PackageFile) -> None:
+        files = package_file.extract(self.output_dir)
+        self.stale_files.extend(self.sysroot.record(package_file.metadata, files))
+        print(f"Extracted {package_file.metadata}")
@@ -1,12 +1,15 @@
 from argparse import ArgumentParser, Namespace
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from msys2dl.application import Application
 from msys2dl.commands.command import Command
 
+if TYPE_CHECKING:
+    from msys2dl.application import Application
+
 
 class OutputDirMixin(Command):
-    def __init__(self, _app: Application, args: Namespace) -> None:
+    def __init__(self, _app: "Application", args: Namespace) -> None:
         super().__init__(_app, args)
         self.output_dir: Path = args.output
 
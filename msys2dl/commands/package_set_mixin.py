@@ -1,19 +1,21 @@
 from abc import abstractmethod
 from argparse import ArgumentParser, Namespace
-from typing import ClassVar
+from collections.abc import Callable, Iterable
+from typing import TYPE_CHECKING, ClassVar
 
-from msys2dl.application import Application
 from msys2dl.commands.command import Command
-from msys2dl.package import Environment
+from msys2dl.package import Environment, Package, PackageSet
 from msys2dl.package_database import PackageNameResolver
 from msys2dl.package_store import PackageFile
-from msys2dl.progress import ProgressCounter
+
+if TYPE_CHECKING:
+    from msys2dl.application import Application
 
 
 class PackageSetMixin(Command):
     action_title: ClassVar[str] = "action_title unset"
 
-    def __init__(self, app: Application, args: Namespace) -> None:
+    def __init__(self, app: "Application", args: Namespace) -> None:
         super().__init__(app, args)
         self.with_dependencies: bool = not args.no_deps
         self.default_env = Environment.by_name(args.env) if args.env else None
@@ -27,21 +29,55 @@ class PackageSetMixin(Command):
 
     def run(self) -> None:
         super().run()
-        self._app.update_keys()
-        self._app.download_databases(self.environments)
-        package_set = self._app.resolve_package_set(
-            self.include,
-            self.exclude,
-            check_conflicts=self.check_for_conflicts,
-            with_dependencies=self.with_dependencies,
-        )
-        self.package_files = self._app.download_packages(package_set)
-        with ProgressCounter(len(self.package_files), description=self.action_title) as progress:
-            for package_file in self.package_files:
+        self.process_packages(self.resolve_package_set())
+
+    def process_packages(
+        self,
+        packages: Iterable[Package],
+        title: str | None = None,
+        group: Callable[[list[PackageFile]], list[list[PackageFile]]] | None = None,
+        action: Callable[[list[PackageFile]], None] | None = None,
+    ) -> None:
+        # Downloads the packages, then runs action on each group of package files. By default, each
+        # package file is a group, and the action is do_package_action.
+        # rich is slow to import: --help doesn't need it
+        from msys2dl.progress import ProgressCounter
+
+        title = title or self.action_title
+        with self._app.trace("download packages"):
+            self.package_files = self._app.download_packages(packages)
+        groups = group(self.package_files) if group is not None else [[f] for f in self.package_files]
+        with (
+            self._app.trace(title),
+            ProgressCounter(len(groups), description=title) as progress,
+        ):
+            for package_files in groups:
                 self._app.check_interrupted()
-                self.do_package_action(package_file)
+                with (
+                    self._app.trace(package_files[0].metadata.name),
+                    self._app.metrics.time_action(self.command_name),
+                ):
+                    if action is not None:
+                        action(package_files)
+                    else:
+                        for package_file in package_files:
+                            self.do_package_action(package_file)
                 progress.increment()
 
+    def resolve_package_set(self, refresh: bool = False) -> PackageSet:
+        # refresh downloads the package databases even if they were downloaded before
+        with self._app.trace("update keys"):
+            self._app.update_keys()
+        with self._app.trace("download databases"):
+            self._app.download_databases(self.environments, force=refresh)
+        with self._app.trace("resolve packages"):
+            return self._app.resolve_package_set(
+                self.include,
+                self.exclude,
+                check_conflicts=self.check_for_conflicts,
+                with_dependencies=self.with_dependencies,
+            )
+
     @abstractmethod
     def do_package_action(self, package_file: PackageFile) -> None: ...
 
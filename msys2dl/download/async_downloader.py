@@ -0,0 +1,208 @@
+import asyncio
+import contextlib
+import time
+from collections.abc import Callable
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from msys2dl.download.download_callback import DownloadCallbacks, SigDownloadCallback
+from msys2dl.download.download_request import DownloadRequest
+from msys2dl.download.http_client import HttpConnectionPool, HttpError
+from msys2dl.download.mirror_pool import Mirror, MirrorPool
+from msys2dl.download.rate_limiter import TokenBucket
+from msys2dl.download.scheduler import schedule_requests
+from msys2dl.download.simple_downloader import SimpleDownloader
+from msys2dl.gpg_keyring import GpgKeybox, SignatureError
+from msys2dl.utilities import AppError
+
+
+class AsyncDownloader:
+    # Runs all downloads of a job as coroutines on one thread, sharing keep-alive connections
+    # for each host. Retries, mirror failover and signature checks work like in SimpleDownloader.
+    block_size = 256 * 1024
+    interrupt_check_interval = 0.1
+
+    def __init__(
+        self,
+        *,
+        keybox: GpgKeybox,
+        mirrors: MirrorPool,
+        n_concurrent: int = 64,
+        rate_limiter: TokenBucket | None = None,
+        max_connections_per_host: int | None = None,
+    ) -> None:
+        self._keybox = keybox
+        self._mirrors = mirrors
+        self._n_concurrent = n_concurrent
+        self._rate_limiter = rate_limiter
+        self._max_connections_per_host = max_connections_per_host
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def concurrency(self) -> int | None:
+        return None
+
+    def execute_requests(
+        self,
+        requests: list[DownloadRequest],
+        register_callbacks: Callable[[DownloadRequest, DownloadCallbacks], None],
+    ) -> None:
+        jobs = []
+        for request in schedule_requests(requests):
+            callbacks = DownloadCallbacks()
+            register_callbacks(request, callbacks)
+            jobs.append((request, callbacks))
+        asyncio.run(self._execute(jobs))
+
+    def close(self) -> None:
+        pass
+
+    async def _execute(self, jobs: list[tuple[DownloadRequest, DownloadCallbacks]]) -> None:
+        pool = HttpConnectionPool()
+        semaphore = asyncio.Semaphore(self._n_concurrent)
+        self._host_semaphores = {}
+        errors: list[Exception] = []
+
+        async def run(request: DownloadRequest, callbacks: DownloadCallbacks) -> None:
+            try:
+                async with semaphore:
+                    await self._download(pool, request, callbacks)
+            except asyncio.CancelledError:
+                callbacks.on_failure(InterruptedError())
+                raise
+            except Exception as exc:
+                callbacks.on_failure(exc)
+                if not errors:
+                    # Interrupt all downloads
+                    errors.append(exc)
+                    for task in tasks:
+                        if task is not asyncio.current_task():
+                            task.cancel()
+            else:
+                callbacks.on_success()
+
+        tasks = [asyncio.create_task(run(request, callbacks)) for request, callbacks in jobs]
+        watcher = asyncio.create_task(self._watch_interrupts(jobs, tasks, errors))
+        try:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            watcher.cancel()
+            pool.close()
+        if errors:
+            raise errors[0]
+
+    async def _watch_interrupts(
+        self,
+        jobs: list[tuple[DownloadRequest, DownloadCallbacks]],
+        tasks: list["asyncio.Task[None]"],
+        errors: list[Exception],
+    ) -> None:
+        # Downloads are cancelled at their next await instead of polling the interrupt flag
+        while True:
+            await asyncio.sleep(self.interrupt_check_interval)
+            running = [(job, task) for job, task in zip(jobs, tasks, strict=True) if not task.done()]
+            if any(callbacks.is_interrupted() for (_request, callbacks), _task in running):
+                errors.append(InterruptedError())
+                for _job, task in running:
+                    task.cancel()
+                return
+
+    async def _download(
+        self, pool: HttpConnectionPool, request: DownloadRequest, callbacks: DownloadCallbacks
+    ) -> None:
+        request.dest.parent.mkdir(parents=True, exist_ok=True)
+        if request.expected_size is not None:
+            callbacks.on_progress(0, request.expected_size)
+        # Fetch the signature alongside the package instead of one round trip later
+        sig_task = asyncio.create_task(
+            self._download_single_file(
+                pool, request.sig_path, request.sig_dest, SigDownloadCallback(callbacks)
+            )
+        )
+        try:
+            await self._download_single_file(pool, request.path, request.partial_dest, callbacks)
+        except BaseException:
+            sig_task.cancel()
+            await asyncio.gather(sig_task, return_exceptions=True)
+            raise
+        await sig_task
+        # Check signature
+        try:
+            verify_start = time.monotonic()
+            await asyncio.to_thread(self._keybox.validate_signature, request.sig_dest, request.partial_dest)
+            callbacks.on_span("verify", verify_start, time.monotonic())
+        except AppError as err:
+            raise SignatureError.wrap(f"failed to verify signature for {request.path}", err)
+        # Move file to final path
+        request.partial_dest.rename(request.dest)
+
+    async def _download_single_file(
+        self, pool: HttpConnectionPool, path: str, dest: Path, callbacks: DownloadCallbacks
+    ) -> None:
+        last_error = None
+        failed_mirrors: set[Mirror] = set()
+        for attempt in range(SimpleDownloader.max_tries):
+            # Fail over to a mirror that hasn't failed yet; back off once every mirror has failed
+            mirror = self._mirrors.select(exclude=failed_mirrors)
+            if mirror in failed_mirrors:
+                await asyncio.sleep(SimpleDownloader.retry_delay(attempt))
+            try:
+                await self._fetch(pool, mirror, mirror.url + path, dest, callbacks)
+            except HttpError as e:
+                last_error = f"{mirror.url}{path}: {e}"
+            else:
+                return
+            self._mirrors.report_failure(mirror)
+            callbacks.on_retry(last_error)
+            failed_mirrors.add(mirror)
+        raise AppError(f"failed to download {path}: {last_error}")
+
+    async def _fetch(
+        self, pool: HttpConnectionPool, mirror: Mirror, url: str, dest: Path, callbacks: DownloadCallbacks
+    ) -> None:
+        async with contextlib.AsyncExitStack() as stack:
+            if self._max_connections_per_host is not None:
+                host = urlsplit(url).netloc
+                host_semaphore = self._host_semaphores.setdefault(
+                    host, asyncio.Semaphore(self._max_connections_per_host)
+                )
+                await stack.enter_async_context(host_semaphore)
+            await self._fetch_response(pool, mirror, url, dest, callbacks)
+
+    async def _fetch_response(
+        self, pool: HttpConnectionPool, mirror: Mirror, url: str, dest: Path, callbacks: DownloadCallbacks
+    ) -> None:
+        start_time = time.monotonic()
+        async with await pool.get(url) as response:
+            if response.status != 200:
+                raise HttpError(f"bad status code: {response.status}")
+            first_byte_time = time.monotonic()
+            callbacks.on_span("wait for first byte", start_time, first_byte_time)
+            total_size = int(response.headers.get("content-length", 0))
+            callbacks.on_progress(0, total_size)
+            bytes_downloaded = 0
+            next_callback_time = time.monotonic() + SimpleDownloader.callback_interval
+            block_size = self._block_size()
+            blocks = response.iter_content(block_size)
+            if self._rate_limiter is not None:
+                blocks = self._rate_limiter.limit_async(blocks, block_size)
+            with dest.open("wb") as f:
+                async for data in blocks:
+                    f.write(data)
+                    bytes_downloaded += len(data)
+                    now = time.monotonic()
+                    if now >= next_callback_time:
+                        next_callback_time = now + SimpleDownloader.callback_interval
+                        callbacks.on_progress(bytes_downloaded, total_size)
+            callbacks.on_progress(bytes_downloaded, total_size)
+        self._mirrors.report_success(
+            mirror,
+            latency=first_byte_time - start_time,
+            n_bytes=bytes_downloaded,
+            duration=time.monotonic() - first_byte_time,
+        )
+
+    def _block_size(self) -> int:
+        if self._rate_limiter is None:
+            return self.block_size
+        return min(self.block_size, self._rate_limiter.max_block_size)
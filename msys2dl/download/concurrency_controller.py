@@ -0,0 +1,98 @@
+import math
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from msys2dl.download.download_callback import DownloadCallbacks
+from msys2dl.utilities import AppError
+
+
+class ConcurrencyController:
+    # Additive increase / multiplicative decrease of the number of active downloads:
+    # one more download per interval while the aggregate throughput keeps growing,
+    # one less when it drops, half as many after errors.
+    interval = 1.0
+    gain_threshold = 0.05
+    drop_threshold = 0.15
+
+    def __init__(self, min_limit: int, max_limit: int, initial_limit: int | None = None) -> None:
+        if not 1 <= min_limit <= max_limit:
+            raise AppError(f"invalid download thread bounds: {min_limit}..{max_limit}")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self._limit = max(min_limit, min(initial_limit or min_limit, max_limit))
+        self._active = 0
+        self._condition = threading.Condition()
+        self._interval_start = time.monotonic()
+        self._interval_bytes = 0
+        self._interval_errors = 0
+        self._interval_saturated = False
+        self._last_throughput: float | None = None
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._condition:
+            while self._active >= self._limit:
+                self._condition.wait()
+            self._active += 1
+            self._interval_saturated |= self._active >= self._limit
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify()
+
+    def register_callbacks(self, callbacks: DownloadCallbacks) -> None:
+        last_reported = 0
+
+        def on_progress(current: int, _total: int) -> None:
+            nonlocal last_reported
+            self.report_bytes(max(0, current - last_reported))
+            last_reported = current
+
+        callbacks.progress_handlers.register(on_progress)
+        callbacks.retry_handlers.register(lambda _error: self.report_error())
+
+    def report_bytes(self, n: int) -> None:
+        with self._condition:
+            self._interval_bytes += n
+            self._maybe_adjust()
+
+    def report_error(self) -> None:
+        with self._condition:
+            self._interval_errors += 1
+            self._maybe_adjust()
+
+    def _maybe_adjust(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._interval_start
+        if elapsed < self.interval:
+            return
+        throughput = self._interval_bytes / elapsed
+        previous_limit = self._limit
+        if self._interval_errors:
+            self._limit = max(self.min_limit, math.ceil(self._limit / 2))
+        elif (
+            self._interval_saturated
+            and self._last_throughput is not None
+            and throughput < self._last_throughput * (1 - self.drop_threshold)
+        ):
+            self._limit = max(self.min_limit, self._limit - 1)
+        elif self._interval_saturated and (
+            self._last_throughput is None or throughput > self._last_throughput * (1 + self.gain_threshold)
+        ):
+            # Only grow while all slots are in use: otherwise more slots can't help
+            self._limit = min(self.max_limit, self._limit + 1)
+        self._last_throughput = throughput
+        self._interval_start = now
+        self._interval_bytes = 0
+        self._interval_errors = 0
+        self._interval_saturated = self._active >= self._limit
+        if self._limit > previous_limit:
+            self._condition.notify(self._limit - previous_limit)
@@ -7,6 +7,9 @@ class DownloadCallbacks:
         self.success_handlers: CallbackRegistry[[]] = CallbackRegistry()
         self.failure_handlers: CallbackRegistry[[Exception]] = CallbackRegistry()
         self.progress_handlers: CallbackRegistry[[int, int]] = CallbackRegistry()
+        self.retry_handlers: CallbackRegistry[[str]] = CallbackRegistry()
+        # Timed steps of a download (name, start, end), with time.monotonic() timestamps
+        self.span_handlers: CallbackRegistry[[str, float, float]] = CallbackRegistry()
         self.is_interrupted_handlers = InterruptFlagCallbackRegistry()
 
     def on_success(self) -> None:
@@ -20,6 +23,12 @@ class DownloadCallbacks:
     def on_progress(self, current: int, total: int) -> None:
         self.progress_handlers.run_callbacks(current, total)
 
+    def on_retry(self, error: str) -> None:
+        self.retry_handlers.run_callbacks(error)
+
+    def on_span(self, name: str, start: float, end: float) -> None:
+        self.span_handlers.run_callbacks(name, start, end)
+
     def is_interrupted(self) -> bool:
         return self.is_interrupted_handlers.run_callbacks()
 
@@ -32,3 +41,4 @@ class SigDownloadCallback(DownloadCallbacks):
     def __init__(self, base: DownloadCallbacks):
         super().__init__()
         self.is_interrupted_handlers.register(base.is_interrupted)
+        self.retry_handlers.register(base.on_retry)
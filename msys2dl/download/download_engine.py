@@ -0,0 +1,18 @@
+from collections.abc import Callable
+from typing import Protocol
+
+from msys2dl.download.download_callback import DownloadCallbacks
+from msys2dl.download.download_request import DownloadRequest
+
+
+class DownloadEngine(Protocol):
+    @property
+    def concurrency(self) -> int | None: ...
+
+    def execute_requests(
+        self,
+        requests: list[DownloadRequest],
+        register_callbacks: Callable[[DownloadRequest, DownloadCallbacks], None],
+    ) -> None: ...
+
+    def close(self) -> None: ...
@@ -5,13 +5,14 @@ from pathlib import Path
 @dataclass
 class DownloadRequest:
     name: str
-    url: str
+    path: str
     dest: Path
     expected_size: int | None = None
+    priority: int = 0
 
     @property
-    def sig_url(self) -> str:
-        return self.url + ".sig"
+    def sig_path(self) -> str:
+        return self.path + ".sig"
 
     @property
     def sig_dest(self) -> Path:
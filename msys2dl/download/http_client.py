@@ -0,0 +1,187 @@
+import asyncio
+import ssl
+from collections.abc import AsyncIterator, Awaitable
+from types import TracebackType
+from urllib.parse import urljoin, urlsplit
+
+
+class HttpError(Exception):
+    pass
+
+
+_ConnectionKey = tuple[str, str, int]
+
+
+class _Connection:
+    def __init__(
+        self, key: _ConnectionKey, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.reusable = True
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class HttpResponse:
+    def __init__(
+        self, pool: "HttpConnectionPool", connection: _Connection, status: int, headers: dict[str, str]
+    ) -> None:
+        self.status = status
+        self.headers = headers
+        self._pool = pool
+        self._connection = connection
+        self._released = False
+
+    async def __aenter__(self) -> "HttpResponse":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        if not self._released:
+            # Body was not read completely: the connection can't be reused
+            self._connection.reusable = False
+            self._release()
+
+    async def iter_content(self, chunk_size: int) -> AsyncIterator[bytes]:
+        reader = self._connection.reader
+        try:
+            if self.headers.get("transfer-encoding", "").lower() == "chunked":
+                async for chunk in self._iter_chunked(reader):
+                    yield chunk
+            elif "content-length" in self.headers:
+                remaining = int(self.headers["content-length"])
+                while remaining > 0:
+                    data = await self._pool.with_timeout(reader.read(min(chunk_size, remaining)))
+                    if not data:
+                        raise HttpError(f"connection closed with {remaining} bytes left")
+                    remaining -= len(data)
+                    yield data
+            else:
+                self._connection.reusable = False
+                while data := await self._pool.with_timeout(reader.read(chunk_size)):
+                    yield data
+        except (OSError, asyncio.IncompleteReadError, ValueError) as exc:
+            raise HttpError(f"connection broken: {exc!r}") from exc
+        if self.headers.get("connection", "").lower() == "close":
+            self._connection.reusable = False
+        self._release()
+
+    async def _iter_chunked(self, reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
+        while True:
+            size_line = await self._pool.with_timeout(reader.readuntil(b"\r\n"))
+            size = int(size_line.split(b";", 1)[0], 16)
+            if size == 0:
+                # Skip trailers
+                while await self._pool.with_timeout(reader.readuntil(b"\r\n")) != b"\r\n":
+                    pass
+                return
+            yield await self._pool.with_timeout(reader.readexactly(size))
+            await self._pool.with_timeout(reader.readexactly(2))
+
+    def _release(self) -> None:
+        self._released = True
+        self._pool.release(self._connection)
+
+
+class HttpConnectionPool:
+    # Minimal HTTP/1.1 client keeping connections alive for each host
+    max_redirects = 10
+
+    def __init__(self, timeout: float = 5.0) -> None:
+        self._timeout = timeout
+        self._idle: dict[_ConnectionKey, list[_Connection]] = {}
+        self._ssl_context: ssl.SSLContext | None = None
+
+    async def get(self, url: str) -> HttpResponse:
+        for _ in range(self.max_redirects):
+            response = await self._request(url)
+            location = response.headers.get("location")
+            if response.status not in (301, 302, 303, 307, 308) or location is None:
+                return response
+            async with response:
+                url = urljoin(url, location)
+        raise HttpError(f"too many redirects: {url}")
+
+    def release(self, connection: _Connection) -> None:
+        if connection.reusable:
+            self._idle.setdefault(connection.key, []).append(connection)
+        else:
+            connection.close()
+
+    def close(self) -> None:
+        for connections in self._idle.values():
+            for connection in connections:
+                connection.close()
+        self._idle.clear()
+
+    async def with_timeout(self, awaitable: Awaitable[bytes]) -> bytes:
+        try:
+            return await asyncio.wait_for(awaitable, self._timeout)
+        except asyncio.TimeoutError as exc:
+            raise HttpError("read timed out") from exc
+
+    async def _request(self, url: str) -> HttpResponse:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise HttpError(f"unsupported URL: {url}")
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        request = (
+            f"GET {target} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            "User-Agent: msys2dl\r\n"
+            "Accept-Encoding: identity\r\n"
+            "Connection: keep-alive\r\n"
+            "\r\n"
+        ).encode("ascii")
+        idle = self._idle.get(key)
+        if idle:
+            # The server may have closed an idle connection: retry once on a new one
+            connection = idle.pop()
+            try:
+                return await self._send(connection, request)
+            except HttpError:
+                connection.close()
+        return await self._send(await self._connect(key), request)
+
+    async def _connect(self, key: _ConnectionKey) -> _Connection:
+        scheme, host, port = key
+        ssl_context = None
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            ssl_context = self._ssl_context
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=ssl_context, limit=1024 * 1024), self._timeout
+            )
+        except (OSError, asyncio.TimeoutError) as exc:
+            raise HttpError(f"failed to connect to {host}:{port}: {exc!r}") from exc
+        return _Connection(key, reader, writer)
+
+    async def _send(self, connection: _Connection, request: bytes) -> HttpResponse:
+        try:
+            connection.writer.write(request)
+            await connection.writer.drain()
+            head = await asyncio.wait_for(connection.reader.readuntil(b"\r\n\r\n"), self._timeout)
+            status_line, *header_lines = head.decode("latin-1").split("\r\n")
+            status = int(status_line.split(" ", 2)[1])
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as exc:
+            connection.close()
+            raise HttpError(f"failed to read response: {exc!r}") from exc
+        except (ValueError, IndexError) as exc:
+            connection.close()
+            raise HttpError(f"malformed response: {exc}") from exc
+        headers = {}
+        for line in header_lines:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        return HttpResponse(self, connection, status, headers)
@@ -0,0 +1,147 @@
+import re
+import threading
+import time
+from collections.abc import Collection, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from msys2dl.utilities import AppError
+
+if TYPE_CHECKING:
+    from requests import Session
+
+
+@dataclass(eq=False)
+class Mirror:
+    url: str
+    latency: float | None = None  # seconds to the first byte (moving average)
+    throughput: float | None = None  # bytes per second (moving average)
+    n_requests: int = 0
+    n_failures: int = 0
+    n_bytes: int = 0
+    consecutive_failures: int = 0
+    cooldown_until: float = 0
+
+    def __str__(self) -> str:
+        return self.url
+
+    def in_cooldown(self, now: float) -> bool:
+        return self.cooldown_until > now
+
+    def expected_time(self) -> float:
+        # Estimated time to fetch a typical package; unmeasured mirrors are tried first
+        latency = self.latency or 0
+        throughput = self.throughput or float("inf")
+        return latency + MirrorPool.reference_size / throughput
+
+
+class MirrorPool:
+    reference_size = 1024 * 1024
+    smoothing = 0.3
+    min_throughput_sample = 64 * 1024
+    failures_before_cooldown = 3
+    cooldown = 10.0
+    max_cooldown = 300.0
+    probe_interval = 60.0
+
+    def __init__(self, urls: Iterable[str]) -> None:
+        self.mirrors = [Mirror(url.rstrip("/")) for url in urls]
+        if not self.mirrors:
+            raise AppError("no mirrors configured")
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._probe_thread: threading.Thread | None = None
+
+    def __len__(self) -> int:
+        return len(self.mirrors)
+
+    def select(self, exclude: Collection[Mirror] = ()) -> Mirror:
+        with self._lock:
+            now = time.monotonic()
+            candidates = [m for m in self.mirrors if m not in exclude] or self.mirrors
+            available = [m for m in candidates if not m.in_cooldown(now)]
+            if not available:
+                # Everything is cooling down: use the mirror that recovers first
+                return min(candidates, key=lambda m: m.cooldown_until)
+            return min(available, key=lambda m: m.expected_time())
+
+    def report_success(self, mirror: Mirror, latency: float, n_bytes: int, duration: float) -> None:
+        with self._lock:
+            mirror.n_requests += 1
+            mirror.n_bytes += n_bytes
+            mirror.consecutive_failures = 0
+            mirror.cooldown_until = 0
+            mirror.latency = self._average(mirror.latency, latency)
+            if n_bytes >= self.min_throughput_sample and duration > 0:
+                mirror.throughput = self._average(mirror.throughput, n_bytes / duration)
+
+    def report_failure(self, mirror: Mirror) -> None:
+        with self._lock:
+            mirror.n_requests += 1
+            mirror.n_failures += 1
+            mirror.consecutive_failures += 1
+            excess_failures = mirror.consecutive_failures - self.failures_before_cooldown
+            if excess_failures >= 0:
+                cooldown = min(self.cooldown * 2**excess_failures, self.max_cooldown)
+                mirror.cooldown_until = time.monotonic() + cooldown
+
+    def start_probing(self) -> None:
+        # Measure latency of all mirrors in the background, so that the first requests already go
+        # to a good mirror. Throughput is measured from actual downloads.
+        if len(self.mirrors) < 2 or self._probe_thread is not None:
+            return
+        self._probe_thread = threading.Thread(target=self._probe_loop, name="mirror-probe", daemon=True)
+        self._probe_thread.start()
+
+    def close(self) -> None:
+        # The probe thread is a daemon and may be blocked in a request: don't wait for it
+        self._closed.set()
+
+    def _probe_loop(self) -> None:
+        # requests is slow to import: only load it on the probe thread
+        from requests import Session
+
+        with Session() as session:
+            while not self._closed.is_set():
+                for mirror in self.mirrors:
+                    if self._closed.is_set():
+                        return
+                    self._probe(session, mirror)
+                self._closed.wait(self.probe_interval)
+
+    def _probe(self, session: "Session", mirror: Mirror) -> None:
+        from requests import RequestException
+
+        start = time.monotonic()
+        try:
+            with session.head(mirror.url + "/", timeout=(5, 5)) as response:
+                if response.status_code >= 500:
+                    self.report_failure(mirror)
+                    return
+        except RequestException:
+            self.report_failure(mirror)
+            return
+        latency = time.monotonic() - start
+        with self._lock:
+            mirror.latency = self._average(mirror.latency, latency)
+
+    def _average(self, current: float | None, sample: float) -> float:
+        if current is None:
+            return sample
+        return current + self.smoothing * (sample - current)
+
+    @staticmethod
+    def read_mirrorlist(path: Path) -> list[str]:
+        # Accepts plain URLs as well as pacman mirrorlist entries ("Server = https://host/mingw/$repo/")
+        try:
+            lines = path.read_text("utf-8").splitlines()
+        except OSError as exc:
+            raise AppError(f"failed to read mirrorlist {path}: {exc}")
+        urls = []
+        for line in lines:
+            entry = line.split("#", 1)[0].strip()
+            if entry:
+                url = re.sub(r"^Server\s*=\s*", "", entry)
+                urls.append(re.sub(r"/mingw/\$repo/?$", "", url))
+        return urls
@@ -5,8 +5,10 @@ from contextvars import ContextVar
 from requests import Session
 from requests.adapters import HTTPAdapter
 
+from msys2dl.download.concurrency_controller import ConcurrencyController
 from msys2dl.download.download_callback import DownloadCallbacks
 from msys2dl.download.download_request import DownloadRequest
+from msys2dl.download.scheduler import schedule_requests
 from msys2dl.download.simple_downloader import SimpleDownloader
 
 
@@ -47,11 +49,32 @@ class Job:
 
 
 class ParallelDownloader:
-    def __init__(self, *, downloader: SimpleDownloader, n_threads: int = 5) -> None:
+    def __init__(
+        self,
+        *,
+        downloader: SimpleDownloader,
+        n_threads: int = 5,
+        hedging: bool = True,
+        parallel_signatures: bool = True,
+        adaptive_concurrency: ConcurrencyController | None = None,
+    ) -> None:
         self._downloader = downloader
+        self._controller = adaptive_concurrency
+        if self._controller is not None:
+            # Threads beyond the current limit wait for a free slot
+            n_threads = self._controller.max_limit
         self._pool = ThreadPoolExecutor(n_threads, initializer=self._initialize_worker_thread)
         self._session: ContextVar[Session] = ContextVar("session")
         self._sessions: list[Session] = []
+        self._hedge_pool: ThreadPoolExecutor | None = None
+        if hedging:
+            self._hedge_pool = ThreadPoolExecutor(n_threads, initializer=self._initialize_worker_thread)
+            self._downloader.enable_hedging(self._hedge_pool, self._session.get)
+        self._signature_pool: ThreadPoolExecutor | None = None
+        if parallel_signatures:
+            # Separate from the hedge pool: signature downloads may start hedged requests themselves
+            self._signature_pool = ThreadPoolExecutor(n_threads, initializer=self._initialize_worker_thread)
+            self._downloader.enable_parallel_signatures(self._signature_pool, self._session.get)
 
     def execute_requests(
         self,
@@ -60,24 +83,40 @@ class ParallelDownloader:
     ) -> None:
         job = Job()
         # Add tasks to thread pool
-        for request in requests:
+        for request in schedule_requests(requests):
             callbacks = DownloadCallbacks()
             register_callbacks(request, callbacks)
             job.register_callbacks(callbacks)
+            if self._controller is not None:
+                self._controller.register_callbacks(callbacks)
             job.add_future(self._pool.submit(self._execute_request, request, callbacks))
         # Wait for completion & raise exceptions if any
         job.join()
 
     def close(self) -> None:
+        self._downloader.close()
         for session in self._sessions:
             session.close()
         self._pool.shutdown(wait=True)
+        if self._signature_pool is not None:
+            self._signature_pool.shutdown(wait=True)
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=True)
 
     def _initialize_worker_thread(self) -> None:
         self._session.set(self.create_session())
 
+    @property
+    def concurrency(self) -> int | None:
+        # Number of downloads chosen by the adaptive mode
+        return self._controller.limit if self._controller is not None else None
+
     def _execute_request(self, request: DownloadRequest, callbacks: DownloadCallbacks) -> None:
-        self._downloader.download(self._session.get(), request, callbacks)
+        if self._controller is None:
+            self._downloader.download(self._session.get(), request, callbacks)
+            return
+        with self._controller.slot():
+            self._downloader.download(self._session.get(), request, callbacks)
 
     def create_session(self) -> Session:
         session = Session()
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from msys2dl.utilities import AppError
+
+
+class TokenBucket:
+    # Limits the combined rate of all downloads. Each block is paid for before it is read, and
+    # unused tokens are refunded after a short read. A reader may take a block whenever the
+    # bucket isn't in debt, so the debt never exceeds one block for each reader.
+    burst_time = 0.1
+    # Longest wait between interrupt checks
+    wait_slice = 0.1
+
+    def __init__(self, rate: float) -> None:
+        if rate <= 0:
+            raise AppError(f"invalid download rate limit: {rate}")
+        self.rate = rate
+        self.burst = rate * self.burst_time
+        # Blocks much smaller than the burst size keep the rate even over short periods
+        self.max_block_size = max(4096, int(self.burst / 4))
+        self._tokens = self.burst
+        self._last_update = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n_bytes: int) -> float:
+        # Returns 0 when the data may be read, or how long to wait before trying again
+        with self._lock:
+            self._refill()
+            if self._tokens < 0:
+                return -self._tokens / self.rate
+            self._tokens -= n_bytes
+            return 0.0
+
+    def refund(self, n_bytes: int) -> None:
+        # Returns tokens for data that was reserved but not read
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.burst, self._tokens + n_bytes)
+
+    def limit(
+        self, blocks: Iterator[bytes], block_size: int, check_interrupted: Callable[[], None]
+    ) -> Iterator[bytes]:
+        while True:
+            while (delay := self.reserve(block_size)) > 0:
+                check_interrupted()
+                time.sleep(min(delay, self.wait_slice))
+            data = next(blocks, b"")
+            self.refund(block_size - len(data))
+            if not data:
+                return
+            yield data
+
+    async def limit_async(self, blocks: AsyncIterator[bytes], block_size: int) -> AsyncIterator[bytes]:
+        while True:
+            while (delay := self.reserve(block_size)) > 0:
+                await asyncio.sleep(delay)
+            data = await anext(blocks, b"")
+            self.refund(block_size - len(data))
+            if not data:
+                return
+            yield data
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_update) * self.rate)
+        self._last_update = now
+
+
+class HostConnectionLimiter:
+    # Caps the number of concurrent requests to each host, including hedged requests
+    # Longest wait between interrupt checks
+    wait_slice = 0.1
+
+    def __init__(self, max_connections: int) -> None:
+        if max_connections < 1:
+            raise AppError(f"invalid connection limit: {max_connections}")
+        self.max_connections = max_connections
+        self._semaphores: dict[str, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url: str, check_interrupted: Callable[[], None]) -> Iterator[None]:
+        host = urlsplit(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.Semaphore(self.max_connections))
+        while not semaphore.acquire(timeout=self.wait_slice):
+            check_interrupted()
+        try:
+            yield
+        finally:
+            semaphore.release()
@@ -0,0 +1,16 @@
+import statistics
+from collections.abc import Iterable
+
+from msys2dl.download.download_request import DownloadRequest
+
+
+def schedule_requests(requests: Iterable[DownloadRequest]) -> list[DownloadRequest]:
+    # Higher priority first, then longest-processing-time-first: starting the largest downloads
+    # early keeps a single big package from finishing long after all other downloads
+    requests = list(requests)
+    known_sizes = [r.expected_size for r in requests if r.expected_size is not None]
+    default_size = statistics.median(known_sizes) if known_sizes else 0
+    return sorted(
+        requests,
+        key=lambda r: (-r.priority, -(r.expected_size if r.expected_size is not None else default_size)),
+    )
@@ -1,16 +1,54 @@
+import contextlib
+import socket
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, Future
 from pathlib import Path
 
-from requests import RequestException, Session
+from requests import RequestException, Response, Session
 
 from msys2dl.download.download_callback import DownloadCallbacks, SigDownloadCallback
 from msys2dl.download.download_request import DownloadRequest
-from msys2dl.gpg_keyring import GpgKeybox
+from msys2dl.download.mirror_pool import Mirror, MirrorPool
+from msys2dl.download.rate_limiter import HostConnectionLimiter, TokenBucket
+from msys2dl.download.transfer_monitor import TransferMonitor
+from msys2dl.gpg_keyring import GpgKeybox, SignatureError
 from msys2dl.utilities import AppError
 
 
 class SimpleDownloader:
-    def __init__(self, keybox: GpgKeybox):
+    max_tries = 10
+    min_block_size = 64 * 1024
+    max_block_size = 4 * 1024 * 1024
+    callback_interval = 0.1
+
+    def __init__(
+        self,
+        keybox: GpgKeybox,
+        mirrors: MirrorPool,
+        *,
+        rate_limiter: TokenBucket | None = None,
+        connection_limiter: HostConnectionLimiter | None = None,
+    ):
         self._keybox = keybox
+        self._mirrors = mirrors
+        self._rate_limiter = rate_limiter
+        self._connection_limiter = connection_limiter
+        self._monitor = TransferMonitor()
+        self._hedging: tuple[Executor, Callable[[], Session]] | None = None
+        self._signature_fetching: tuple[Executor, Callable[[], Session]] | None = None
+
+    def enable_hedging(self, executor: Executor, get_session: Callable[[], Session]) -> None:
+        # Stalled downloads get a duplicate request running on the executor, the first one to finish wins
+        self._hedging = (executor, get_session)
+
+    def enable_parallel_signatures(self, executor: Executor, get_session: Callable[[], Session]) -> None:
+        # Signatures are fetched on the executor while the package is downloading, saving a round trip
+        self._signature_fetching = (executor, get_session)
+
+    def close(self) -> None:
+        self._monitor.close()
 
     def download(self, session: Session, request: DownloadRequest, callbacks: DownloadCallbacks) -> None:
         try:
@@ -26,44 +64,263 @@ class SimpleDownloader:
         request.dest.parent.mkdir(parents=True, exist_ok=True)
         if request.expected_size is not None:
             callbacks.on_progress(0, request.expected_size)
-        self._download_single_file(session, request.url, request.partial_dest, callbacks)
-        self._download_single_file(session, request.sig_url, request.sig_dest, SigDownloadCallback(callbacks))
+        sig_callbacks = SigDownloadCallback(callbacks)
+        if self._signature_fetching is None:
+            self._download_single_file(session, request.path, request.partial_dest, callbacks)
+            self._download_single_file(session, request.sig_path, request.sig_dest, sig_callbacks)
+        else:
+            executor, get_session = self._signature_fetching
+            abandoned = threading.Event()
+            sig_callbacks.is_interrupted_handlers.register(abandoned.is_set)
+            sig_future = executor.submit(
+                lambda: self._download_single_file(
+                    get_session(), request.sig_path, request.sig_dest, sig_callbacks
+                )
+            )
+            try:
+                self._download_single_file(session, request.path, request.partial_dest, callbacks)
+            except BaseException:
+                # Don't leave the signature download running
+                abandoned.set()
+                with contextlib.suppress(Exception):
+                    sig_future.result()
+                raise
+            sig_future.result()
         # Check signature
         try:
             callbacks.check_interrupted()
+            verify_start = time.monotonic()
             self._keybox.validate_signature(request.sig_dest, request.partial_dest)
+            callbacks.on_span("verify", verify_start, time.monotonic())
         except AppError as err:
-            raise AppError.wrap(f"failed to verify signature for {request.url}", err)
+            raise SignatureError.wrap(f"failed to verify signature for {request.path}", err)
         # Move file to final path
         request.partial_dest.rename(request.dest)
 
-    @staticmethod
-    def _download_single_file(session: Session, url: str, dest: Path, callbacks: DownloadCallbacks) -> None:
-        tries_left = 10
+    def _download_single_file(
+        self, session: Session, path: str, dest: Path, callbacks: DownloadCallbacks
+    ) -> None:
         last_error = None
-        while tries_left > 0:
+        failed_mirrors: set[Mirror] = set()
+        for attempt in range(self.max_tries):
             callbacks.check_interrupted()
-            tries_left -= 1
+            # Fail over to a mirror that hasn't failed yet; back off once every mirror has failed
+            mirror = self._mirrors.select(exclude=failed_mirrors)
+            if mirror in failed_mirrors:
+                self._wait(self.retry_delay(attempt), callbacks)
             try:
-                # Start download
-                with session.get(url, timeout=(5, 5), stream=True) as response:
-                    if response.status_code != 200:
-                        # Try again
-                        last_error = "bad status code: " + str(response.status_code)
-                        continue
-                    # Download file
-                    callbacks.check_interrupted()
-                    total_size = int(response.headers.get("content-length", 0))
-                    callbacks.on_progress(0, total_size)
-                    bytes_downloaded = 0
-                    block_size = 4 * 1024  # 4 KiB
-                    with dest.open("wb") as f:
-                        for data in response.iter_content(block_size):
-                            callbacks.check_interrupted()
-                            bytes_downloaded += len(data)
-                            callbacks.on_progress(bytes_downloaded, total_size)
-                            f.write(data)
-                    return
+                self._fetch(session, mirror, path, dest, callbacks)
             except RequestException as e:
-                last_error = str(e)
-        raise AppError(f"failed to download {url}: {last_error}")
+                last_error = f"{mirror.url}{path}: {e}"
+            except _BadStatusError as e:
+                last_error = f"{mirror.url}{path}: bad status code: {e.status_code}"
+            else:
+                return
+            callbacks.on_retry(last_error)
+            failed_mirrors.add(mirror)
+        raise AppError(f"failed to download {path}: {last_error}")
+
+    def _fetch(
+        self, session: Session, mirror: Mirror, path: str, dest: Path, callbacks: DownloadCallbacks
+    ) -> None:
+        race = _HedgeRace(dest.with_name(dest.name + ".hedge.part"))
+        start_time = time.monotonic()
+        first_byte_reported = False
+
+        def on_stalled() -> None:
+            if self._hedging is not None:
+                executor, get_session = self._hedging
+                race.start_hedge(
+                    executor, lambda: self._run_hedge(get_session(), race, mirror, path, callbacks)
+                )
+
+        def on_data(bytes_downloaded: int, total_size: int) -> None:
+            nonlocal first_byte_reported
+            callbacks.check_interrupted()
+            if race.winner is _HEDGE:
+                raise _RaceLostError()
+            if not first_byte_reported:
+                first_byte_reported = True
+                callbacks.on_span("wait for first byte", start_time, time.monotonic())
+            transfer.n_bytes = bytes_downloaded
+            callbacks.on_progress(bytes_downloaded, total_size)
+
+        with self._monitor.track(on_stalled) as transfer:
+            try:
+                self._stream(
+                    session, mirror, mirror.url + path, dest, on_data, callbacks.check_interrupted, race
+                )
+            except (RequestException, _BadStatusError, _RaceLostError):
+                if race.winner is not _HEDGE:
+                    self._mirrors.report_failure(mirror)
+                # A hedged request may still complete the download
+                if not race.wait_for_hedge():
+                    raise
+            else:
+                if not race.finish(_PRIMARY):
+                    race.wait_for_hedge()
+        if race.winner is _HEDGE:
+            race.hedge_dest.replace(dest)
+
+    def _run_hedge(
+        self,
+        session: Session,
+        race: "_HedgeRace",
+        stalled_mirror: Mirror,
+        path: str,
+        callbacks: DownloadCallbacks,
+    ) -> bool:
+        # Duplicate of a stalled request, preferably to another mirror
+        mirror = self._mirrors.select(exclude=[stalled_mirror])
+
+        def on_data(_bytes_downloaded: int, _total_size: int) -> None:
+            callbacks.check_interrupted()
+            if race.winner is _PRIMARY:
+                raise _RaceLostError()
+
+        try:
+            self._stream(
+                session, mirror, mirror.url + path, race.hedge_dest, on_data, callbacks.check_interrupted
+            )
+        except (RequestException, _BadStatusError):
+            self._mirrors.report_failure(mirror)
+        except (_RaceLostError, InterruptedError):
+            pass
+        else:
+            if race.finish(_HEDGE):
+                return True
+        race.hedge_dest.unlink(missing_ok=True)
+        return False
+
+    def _stream(
+        self,
+        session: Session,
+        mirror: Mirror,
+        url: str,
+        dest: Path,
+        on_data: Callable[[int, int], None],
+        check_interrupted: Callable[[], None],
+        race: "_HedgeRace | None" = None,
+    ) -> None:
+        with contextlib.ExitStack() as stack:
+            if self._connection_limiter is not None:
+                stack.enter_context(self._connection_limiter.slot(url, check_interrupted))
+            self._stream_response(session, mirror, url, dest, on_data, check_interrupted, race)
+
+    def _stream_response(
+        self,
+        session: Session,
+        mirror: Mirror,
+        url: str,
+        dest: Path,
+        on_data: Callable[[int, int], None],
+        check_interrupted: Callable[[], None],
+        race: "_HedgeRace | None",
+    ) -> None:
+        start_time = time.monotonic()
+        with session.get(url, timeout=(5, 5), stream=True) as response:
+            if race is not None:
+                race.primary_response = response
+            if response.status_code != 200:
+                raise _BadStatusError(response.status_code)
+            # Download file
+            first_byte_time = time.monotonic()
+            total_size = int(response.headers.get("content-length", 0))
+            on_data(0, total_size)
+            bytes_downloaded = 0
+            # Progress and interrupt callbacks are too expensive to run for every block
+            next_callback_time = time.monotonic() + self.callback_interval
+            block_size = self._block_size(mirror)
+            blocks = response.iter_content(block_size)
+            if self._rate_limiter is not None:
+                blocks = self._rate_limiter.limit(blocks, block_size, check_interrupted)
+            with dest.open("wb") as f:
+                for data in blocks:
+                    f.write(data)
+                    bytes_downloaded += len(data)
+                    now = time.monotonic()
+                    if now >= next_callback_time:
+                        next_callback_time = now + self.callback_interval
+                        on_data(bytes_downloaded, total_size)
+            on_data(bytes_downloaded, total_size)
+        self._mirrors.report_success(
+            mirror,
+            latency=first_byte_time - start_time,
+            n_bytes=bytes_downloaded,
+            duration=time.monotonic() - first_byte_time,
+        )
+
+    def _block_size(self, mirror: Mirror) -> int:
+        # iter_content() waits for a whole block: read about one callback interval worth of data at once
+        block_size = self.min_block_size
+        if mirror.throughput is not None:
+            block_size = max(
+                block_size, min(int(mirror.throughput * self.callback_interval), self.max_block_size)
+            )
+        if self._rate_limiter is not None:
+            block_size = min(block_size, self._rate_limiter.max_block_size)
+        return block_size
+
+    @staticmethod
+    def retry_delay(attempt: int) -> float:
+        return min(0.2 * 2.0**attempt, 5.0)
+
+    @staticmethod
+    def _wait(seconds: float, callbacks: DownloadCallbacks) -> None:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            callbacks.check_interrupted()
+            time.sleep(max(0.0, min(0.1, deadline - time.monotonic())))
+
+
+_PRIMARY = "primary"
+_HEDGE = "hedge"
+
+
+class _HedgeRace:
+    def __init__(self, hedge_dest: Path) -> None:
+        self.hedge_dest = hedge_dest
+        self.winner: str | None = None
+        self.primary_response: Response | None = None
+        self._hedge: Future[bool] | None = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def start_hedge(self, executor: Executor, hedge: Callable[[], bool]) -> None:
+        with self._lock:
+            if self._hedge is None and not self._closed:
+                self._hedge = executor.submit(hedge)
+
+    def finish(self, who: str) -> bool:
+        with self._lock:
+            self._closed = True
+            if self.winner is None:
+                self.winner = who
+            won = self.winner == who
+        if won and who == _HEDGE:
+            self._abort_primary()
+        return won
+
+    def wait_for_hedge(self) -> bool:
+        with self._lock:
+            self._closed = True
+            hedge = self._hedge
+        return hedge is not None and hedge.result()
+
+    def _abort_primary(self) -> None:
+        # Wake up the primary request if it is blocked reading from a stalled connection
+        connection = getattr(self.primary_response and self.primary_response.raw, "connection", None)
+        sock = getattr(connection, "sock", None)
+        if sock is not None:
+            with contextlib.suppress(OSError):
+                sock.shutdown(socket.SHUT_RDWR)
+
+
+class _RaceLostError(Exception):
+    pass
+
+
+class _BadStatusError(Exception):
+    def __init__(self, status_code: int) -> None:
+        super().__init__(status_code)
+        self.status_code = status_code
@@ -0,0 +1,89 @@
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+
+class Transfer:
+    def __init__(self, on_stalled: Callable[[], None]) -> None:
+        self.start_time = time.monotonic()
+        self.n_bytes = 0
+        self.stall_reported = False
+        self.on_stalled = on_stalled
+
+    def age(self, now: float) -> float:
+        return now - self.start_time
+
+    def throughput(self, now: float) -> float:
+        return self.n_bytes / max(self.age(now), 1e-6)
+
+
+class TransferMonitor:
+    # A transfer is stalled when its throughput stays far below the median throughput
+    # of the other downloads, which includes the recently finished ones: the slowest
+    # transfers are usually the last ones running.
+    check_interval = 0.5
+    min_age = 3.0
+    stall_ratio = 0.2
+    min_samples = 2
+    min_sample_bytes = 64 * 1024
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._active: set[Transfer] = set()
+        self._finished_throughputs: deque[float] = deque(maxlen=16)
+        self._closed = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    @contextmanager
+    def track(self, on_stalled: Callable[[], None]) -> Iterator[Transfer]:
+        transfer = Transfer(on_stalled)
+        with self._lock:
+            self._active.add(transfer)
+            self._start_watchdog()
+        try:
+            yield transfer
+        finally:
+            with self._lock:
+                self._active.discard(transfer)
+                now = time.monotonic()
+                if transfer.n_bytes >= self.min_sample_bytes and not transfer.stall_reported:
+                    self._finished_throughputs.append(transfer.throughput(now))
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+
+    def find_stalled(self) -> list[Transfer]:
+        with self._lock:
+            now = time.monotonic()
+            mature = [t for t in self._active if t.age(now) >= self.min_age]
+            stalled = []
+            for transfer in mature:
+                if transfer.stall_reported:
+                    continue
+                reference = [t.throughput(now) for t in mature if t is not transfer]
+                reference.extend(self._finished_throughputs)
+                if len(reference) < self.min_samples:
+                    continue
+                if transfer.throughput(now) < self.stall_ratio * statistics.median(reference):
+                    transfer.stall_reported = True
+                    stalled.append(transfer)
+            return stalled
+
+    def _start_watchdog(self) -> None:
+        if self._watchdog is None:
+            self._watchdog = threading.Thread(target=self._watch, name="transfer-watchdog", daemon=True)
+            self._watchdog.start()
+
+    def _watch(self) -> None:
+        while not self._closed.wait(self.check_interval):
+            for transfer in self.find_stalled():
+                try:
+                    transfer.on_stalled()
+                except Exception as exc:
+                    logging.exception("Unexpected exception in stall handler", exc_info=exc)
@@ -0,0 +1,144 @@
+import io
+import tarfile
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from msys2dl.package import Environment, Package
+from msys2dl.utilities import AppError, connect_sqlite, decompress_zst
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (environment TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER);
+CREATE TABLE IF NOT EXISTS packages (
+    id INTEGER PRIMARY KEY, environment TEXT, entry TEXT, name TEXT, version TEXT, UNIQUE (environment, entry)
+);
+CREATE TABLE IF NOT EXISTS files (package_id INTEGER, path TEXT, reversed_path TEXT);
+CREATE INDEX IF NOT EXISTS files_reversed_path ON files (reversed_path);
+CREATE INDEX IF NOT EXISTS files_package ON files (package_id);
+"""
+
+
+@dataclass(frozen=True)
+class FileOwner:
+    package_name: str
+    package_version: str
+    path: str
+
+    def __str__(self) -> str:
+        return f"{self.package_name}-{self.package_version}: {self.path}"
+
+
+@dataclass
+class FilesIndexUpdate:
+    added: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+
+class FilesIndex:
+    # Inverted index of the pacman .files databases (file path -> package) in an SQLite file, so
+    # that lookups don't decompress the databases. Paths are also stored reversed: the paths
+    # ending with a file name are then a range of the index. Packages are stored by their
+    # database entry (name-version): an update only parses the file lists of entries that are new.
+    def __init__(self, path: Path) -> None:
+        self._path = path
+
+    def update(self, environment: Environment, files_db: Path) -> FilesIndexUpdate | None:
+        # Returns None if the index is already up to date with files_db
+        stat = files_db.stat()
+        with connect_sqlite(self._path, _SCHEMA, "files index") as conn:
+            source = conn.execute(
+                "SELECT mtime_ns, size FROM sources WHERE environment = ?", (environment.name,)
+            ).fetchone()
+            if source == (stat.st_mtime_ns, stat.st_size):
+                return None
+            indexed = dict(
+                conn.execute("SELECT entry, id FROM packages WHERE environment = ?", (environment.name,))
+            )
+            tar = tarfile.open(fileobj=io.BytesIO(decompress_zst(files_db.read_bytes())), mode="r")
+            members = {member.name: member for member in tar.getmembers() if member.isfile()}
+            entries = {name.split("/", 1)[0] for name in members}
+            result = FilesIndexUpdate(unchanged=len(entries & indexed.keys()))
+            for entry in indexed.keys() - entries:
+                conn.execute("DELETE FROM files WHERE package_id = ?", (indexed[entry],))
+                conn.execute("DELETE FROM packages WHERE id = ?", (indexed[entry],))
+                result.removed += 1
+            for entry in entries - indexed.keys():
+                package = self._read_package(tar, members, entry, environment)
+                package_id = conn.execute(
+                    "INSERT INTO packages (environment, entry, name, version) VALUES (?, ?, ?, ?)",
+                    (environment.name, entry, package.name, package.version),
+                ).lastrowid
+                paths = self._parse_files(self._read_member(tar, members.get(f"{entry}/files")))
+                conn.executemany(
+                    "INSERT INTO files (package_id, path, reversed_path) VALUES (?, ?, ?)",
+                    ((package_id, path, path[::-1]) for path in paths),
+                )
+                result.added += 1
+            conn.execute(
+                "INSERT OR REPLACE INTO sources (environment, mtime_ns, size) VALUES (?, ?, ?)",
+                (environment.name, stat.st_mtime_ns, stat.st_size),
+            )
+        return result
+
+    @property
+    def environments(self) -> set[Environment]:
+        with connect_sqlite(self._path, _SCHEMA, "files index") as conn:
+            names = [row[0] for row in conn.execute("SELECT environment FROM sources")]
+        return {env for env in Environment.all if env.name in names}
+
+    def which(self, path: str, environments: Iterable[Environment]) -> list[FileOwner]:
+        # Packages shipping path. It may be given in full, like mingw64/include/zlib.h, or by its
+        # last components, like zlib.h or include/zlib.h.
+        path = path.strip("/")
+        # Reversed, the paths ending with /path start with htap/: "0" is the character after "/"
+        reversed_path = path[::-1]
+        return self._query(
+            "(f.reversed_path = ? OR (f.reversed_path >= ? AND f.reversed_path < ?))",
+            (reversed_path, reversed_path + "/", reversed_path + "0"),
+            environments,
+        )
+
+    def search(self, pattern: str, environments: Iterable[Environment]) -> list[FileOwner]:
+        # Shell-style pattern: matched against the whole path if it contains a slash, otherwise
+        # against file names, including those of files at the top level
+        if "/" in pattern:
+            return self._query("f.path GLOB ?", (pattern,), environments)
+        return self._query("(f.path GLOB ? OR f.path GLOB ?)", (pattern, "*/" + pattern), environments)
+
+    def _query(
+        self, condition: str, params: tuple[str, ...], environments: Iterable[Environment]
+    ) -> list[FileOwner]:
+        # The unary + keeps SQLite from scanning all files of the environments
+        names = [env.name for env in environments]
+        placeholders = ", ".join("?" * len(names))
+        with connect_sqlite(self._path, _SCHEMA, "files index") as conn:
+            rows = conn.execute(
+                "SELECT p.name, p.version, f.path FROM files f JOIN packages p ON p.id = f.package_id "  # noqa: S608
+                f"WHERE {condition} AND +p.environment IN ({placeholders}) ORDER BY p.name, f.path",
+                (*params, *names),
+            ).fetchall()
+        return [FileOwner(*row) for row in rows]
+
+    @staticmethod
+    def _read_member(tar: tarfile.TarFile, member: tarfile.TarInfo | None) -> str:
+        file = tar.extractfile(member) if member is not None else None
+        return file.read().decode("utf-8") if file is not None else ""
+
+    @classmethod
+    def _read_package(
+        cls, tar: tarfile.TarFile, members: dict[str, tarfile.TarInfo], entry: str, environment: Environment
+    ) -> Package:
+        try:
+            return Package.from_desc(cls._read_member(tar, members.get(f"{entry}/desc")), environment)
+        except KeyError as exc:
+            raise AppError(f"invalid entry {entry} in the {environment.name} files database: missing {exc}")
+
+    @staticmethod
+    def _parse_files(content: str) -> list[str]:
+        # %FILES% section, directories end with a slash
+        return [
+            line
+            for line in content.splitlines()
+            if line and not line.startswith("%") and not line.endswith("/")
+        ]
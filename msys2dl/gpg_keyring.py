@@ -2,7 +2,11 @@ import re
 import tempfile
 from pathlib import Path
 
-from msys2dl.utilities import run_subprocess
+from msys2dl.utilities import AppError, run_subprocess
+
+
+class SignatureError(AppError):
+    pass
 
 
 class GpgKeybox:
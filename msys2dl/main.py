@@ -1,18 +1,32 @@
 import sys
 from argparse import ArgumentParser
 
-from msys2dl.application import Application
+from msys2dl.arguments import ApplicationOptions, configure_parser
 from msys2dl.commands.command import CommandType
+from msys2dl.commands.command_batch import CommandBatch
 from msys2dl.commands.command_extract import CommandExtract
+from msys2dl.commands.command_files import CommandSearch, CommandWhich
+from msys2dl.commands.command_gc import CommandGc
 from msys2dl.commands.command_make_deb import CommandMakeDeb
+from msys2dl.commands.command_serve import CommandServe
+from msys2dl.commands.command_sync import CommandSync
 from msys2dl.utilities import AppError
 
 
 def _run_app(argv: list[str] | None = None) -> None:
     # Configure parser
     parser = ArgumentParser()
-    Application.configure_parser(parser)
-    command_types: list[CommandType] = [CommandMakeDeb, CommandExtract]
+    configure_parser(parser)
+    command_types: list[CommandType] = [
+        CommandMakeDeb,
+        CommandExtract,
+        CommandSync,
+        CommandBatch,
+        CommandWhich,
+        CommandSearch,
+        CommandGc,
+        CommandServe,
+    ]
     subparsers = parser.add_subparsers(dest="command_name", required=True)
     for command_type in command_types:
         subparser = subparsers.add_parser(command_type.command_name)
@@ -21,8 +35,21 @@ def _run_app(argv: list[str] | None = None) -> None:
     # Parse command
     args = parser.parse_args(argv)
 
-    # RUn application
-    with Application(args) as app:
+    # Hand the command to a running server, the application isn't needed then
+    if args.server:
+        if args.command_name not in (CommandExtract.command_name, CommandMakeDeb.command_name):
+            raise AppError(f"--server only supports extract and make-deb, not {args.command_name}")
+        if args.command_name == CommandExtract.command_name and args.format != "dir":
+            raise AppError(f"--server only extracts into directories, not --format {args.format}")
+        from msys2dl.client import run_remote_command
+
+        run_remote_command(args.server, args)
+        return
+
+    # Run application. It pulls in the download stack, so it is imported once the arguments are valid.
+    from msys2dl.application import Application
+
+    with Application(ApplicationOptions.from_args(args)) as app:
         command_type = next(
             command_type for command_type in command_types if command_type.command_name == args.command_name
         )
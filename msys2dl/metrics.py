@@ -0,0 +1,283 @@
+import contextlib
+import json
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from msys2dl.download.download_callback import DownloadCallbacks
+from msys2dl.download.download_request import DownloadRequest
+from msys2dl.download.mirror_pool import MirrorPool
+from msys2dl.gpg_keyring import SignatureError
+from msys2dl.utilities import AppError
+
+_Labels = tuple[tuple[str, str], ...]
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = tuple(16 * 1024 * 4**i for i in range(9))  # 16 KiB .. 1 GiB
+
+
+class Metric(ABC):
+    type_name = "untyped"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+
+    # (name suffix, labels, value) in the order of the Prometheus text format
+    @abstractmethod
+    def samples(self) -> list[tuple[str, _Labels, float]]: ...
+
+    @abstractmethod
+    def to_json(self) -> list[dict[str, Any]]: ...
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        super().__init__(name, help_text)
+        self._values: dict[_Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[tuple[str, _Labels, float]]:
+        with self._lock:
+            return [("", labels, value) for labels, value in self._values.items()]
+
+    def to_json(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [{"labels": dict(labels), "value": value} for labels, value in self._values.items()]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+
+class _HistogramValues:
+    def __init__(self, n_buckets: int) -> None:
+        self.bucket_counts = [0] * n_buckets
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]) -> None:
+        super().__init__(name, help_text)
+        self.buckets = list(buckets)
+        self._values: dict[_Labels, _HistogramValues] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._values.setdefault(key, _HistogramValues(len(self.buckets)))
+            values.count += 1
+            values.sum += value
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    values.bucket_counts[i] += 1
+                    break
+
+    def samples(self) -> list[tuple[str, _Labels, float]]:
+        samples: list[tuple[str, _Labels, float]] = []
+        with self._lock:
+            for labels, values in self._values.items():
+                cumulative = 0
+                for upper_bound, count in zip(self.buckets, values.bucket_counts, strict=True):
+                    cumulative += count
+                    samples.append(("_bucket", (*labels, ("le", _format_value(upper_bound))), cumulative))
+                samples.append(("_bucket", (*labels, ("le", "+Inf")), values.count))
+                samples.append(("_sum", labels, values.sum))
+                samples.append(("_count", labels, values.count))
+        return samples
+
+    def to_json(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "labels": dict(labels),
+                    "count": values.count,
+                    "sum": values.sum,
+                    "buckets": dict(zip(self.buckets, values.bucket_counts, strict=True)),
+                }
+                for labels, values in self._values.items()
+            ]
+
+
+class Metrics:
+    # Counters and histograms of a run, written as a Prometheus textfile collector file or JSON.
+    # Collection is always on: it costs a few dictionary updates per download.
+    def __init__(self) -> None:
+        self._start_time = time.time()
+        self.cache_requests = Counter(
+            "msys2dl_cache_requests_total", "Files requested, by kind and whether they were cached"
+        )
+        self.cache_bytes = Counter(
+            "msys2dl_cache_bytes_total", "Bytes of requested files, by kind and whether they were cached"
+        )
+        self.downloads = Counter("msys2dl_downloads_total", "Finished downloads, by kind and result")
+        self.download_retries = Counter("msys2dl_download_retries_total", "Failed download attempts, by kind")
+        self.signature_failures = Counter(
+            "msys2dl_signature_failures_total", "Downloads rejected because of a bad signature"
+        )
+        self.download_size = Histogram(
+            "msys2dl_download_size_bytes", "Size of downloaded files", SIZE_BUCKETS
+        )
+        self.download_duration = Histogram(
+            "msys2dl_download_duration_seconds", "Duration of successful downloads", DURATION_BUCKETS
+        )
+        self.download_step_duration = Histogram(
+            "msys2dl_download_step_duration_seconds",
+            "Duration of download steps (waiting for the first byte, verifying the signature)",
+            DURATION_BUCKETS,
+        )
+        self.actions = Counter("msys2dl_actions_total", "Package actions, by command and result")
+        self.action_duration = Histogram(
+            "msys2dl_action_duration_seconds", "Duration of package actions, by command", DURATION_BUCKETS
+        )
+        self.mirror_requests = Counter("msys2dl_mirror_requests_total", "Requests sent to each mirror")
+        self.mirror_failures = Counter("msys2dl_mirror_failures_total", "Failed requests to each mirror")
+        self.mirror_bytes = Counter("msys2dl_mirror_bytes_total", "Bytes downloaded from each mirror")
+        self.mirror_latency = Gauge(
+            "msys2dl_mirror_latency_seconds", "Moving average of the time to first byte of each mirror"
+        )
+        self.mirror_throughput = Gauge(
+            "msys2dl_mirror_throughput_bytes_per_second", "Moving average of the throughput of each mirror"
+        )
+        self.run_duration = Gauge("msys2dl_run_duration_seconds", "Duration of the run")
+        self.last_run = Gauge(
+            "msys2dl_last_run_timestamp_seconds", "Time the run finished, in seconds since the epoch"
+        )
+
+    def all(self) -> list[Metric]:
+        return [value for value in vars(self).values() if isinstance(value, Metric)]
+
+    def record_cache_hit(self, kind: str, path: Path) -> None:
+        self.cache_requests.inc(kind=kind, result="hit")
+        with contextlib.suppress(OSError):
+            self.cache_bytes.inc(path.stat().st_size, kind=kind, source="cache")
+
+    def register_callbacks(self, kind: str, request: DownloadRequest, callbacks: DownloadCallbacks) -> None:
+        start_times: list[float] = []
+        self.cache_requests.inc(kind=kind, result="miss")
+
+        def on_progress(_bytes_downloaded: int, _bytes_total: int) -> None:
+            # Downloads report progress as soon as they start
+            if not start_times:
+                start_times.append(time.monotonic())
+
+        def on_success() -> None:
+            size = request.dest.stat().st_size
+            self.cache_bytes.inc(size, kind=kind, source="download")
+            self.download_size.observe(size, kind=kind)
+            if start_times:
+                self.download_duration.observe(time.monotonic() - start_times[0], kind=kind)
+            self.downloads.inc(kind=kind, result="success")
+
+        def on_failure(exc: Exception) -> None:
+            if isinstance(exc, InterruptedError):
+                self.downloads.inc(kind=kind, result="interrupted")
+                return
+            self.downloads.inc(kind=kind, result="failure")
+            if isinstance(exc, SignatureError):
+                self.signature_failures.inc(kind=kind)
+
+        callbacks.progress_handlers.register(on_progress)
+        callbacks.success_handlers.register(on_success)
+        callbacks.failure_handlers.register(on_failure)
+        callbacks.retry_handlers.register(lambda _error: self.download_retries.inc(kind=kind))
+        callbacks.span_handlers.register(
+            lambda step, start, end: self.download_step_duration.observe(end - start, kind=kind, step=step)
+        )
+
+    @contextmanager
+    def time_action(self, command: str) -> Iterator[None]:
+        start_time = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.actions.inc(command=command, result="failure")
+            raise
+        self.actions.inc(command=command, result="success")
+        self.action_duration.observe(time.monotonic() - start_time, command=command)
+
+    def record_mirrors(self, mirrors: MirrorPool) -> None:
+        for mirror in mirrors.mirrors:
+            self.mirror_requests.inc(mirror.n_requests, mirror=mirror.url)
+            self.mirror_failures.inc(mirror.n_failures, mirror=mirror.url)
+            self.mirror_bytes.inc(mirror.n_bytes, mirror=mirror.url)
+            if mirror.latency is not None:
+                self.mirror_latency.set(mirror.latency, mirror=mirror.url)
+            if mirror.throughput is not None:
+                self.mirror_throughput.set(mirror.throughput, mirror=mirror.url)
+
+    def write(self, path: Path, output_format: str) -> None:
+        now = time.time()
+        self.run_duration.set(now - self._start_time)
+        self.last_run.set(now)
+        if output_format == "json":
+            text = json.dumps(
+                {
+                    metric.name: {
+                        "type": metric.type_name,
+                        "help": metric.help_text,
+                        "values": metric.to_json(),
+                    }
+                    for metric in self.all()
+                },
+                indent=2,
+            )
+        else:
+            text = self.to_prometheus()
+        # The textfile collector may read the file at any time: replace it atomically
+        temp_path = path.with_name(path.name + ".tmp")
+        try:
+            temp_path.write_text(text, "utf-8")
+            temp_path.replace(path)
+        except OSError as exc:
+            raise AppError(f"failed to write metrics to {path}: {exc}")
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for metric in self.all():
+            samples = metric.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels)
+                name = metric.name + suffix
+                lines.append(
+                    f"{name}{{{label_text}}} {_format_value(value)}"
+                    if label_text
+                    else f"{name} {_format_value(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -0,0 +1,193 @@
+import gzip
+import hashlib
+import io
+import json
+import tarfile
+import zlib
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from msys2dl.package_store import PackageFile
+from msys2dl.utilities import AppError
+
+# An image in the OCI image layout (https://github.com/opencontainers/image-spec/blob/main/image-layout.md):
+#   oci-layout, index.json and blobs/sha256/<digest> for layers, configs and manifests
+LAYER_MEDIA_TYPE = "application/vnd.oci.image.layer.v1.tar+gzip"
+CONFIG_MEDIA_TYPE = "application/vnd.oci.image.config.v1+json"
+MANIFEST_MEDIA_TYPE = "application/vnd.oci.image.manifest.v1+json"
+INDEX_MEDIA_TYPE = "application/vnd.oci.image.index.v1+json"
+REF_NAME_ANNOTATION = "org.opencontainers.image.ref.name"
+# Package files of a layer, separated by spaces: a layer of the same package files is reused
+PACKAGES_ANNOTATION = "msys2dl.packages"
+
+
+@dataclass
+class Layer:
+    packages: tuple[str, ...]
+    digest: str
+    diff_id: str
+    size: int
+    reused: bool = False
+
+    @property
+    def descriptor(self) -> dict[str, Any]:
+        return {
+            "mediaType": LAYER_MEDIA_TYPE,
+            "digest": self.digest,
+            "size": self.size,
+            "annotations": {PACKAGES_ANNOTATION: " ".join(self.packages)},
+        }
+
+
+class _HashingWriter(io.RawIOBase):
+    # Hashes and counts the bytes on their way to the next writer
+    def __init__(self, out: io.BufferedIOBase) -> None:
+        super().__init__()
+        self.out = out
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self.sha256.update(data)
+        self.size += memoryview(data).nbytes
+        return self.out.write(data)
+
+    @property
+    def digest(self) -> str:
+        return f"sha256:{self.sha256.hexdigest()}"
+
+
+class OciImageLayout:
+    # Writes the packages of a package set as layers of an image in an OCI image layout. Layers
+    # are reproducible: members keep the order of the packages, and mtimes are reset.
+    # The layers of the images already in the layout are reused for the same package files, so
+    # an update only writes the layers of the changed packages. Each package gets its own layer
+    # unless there are more packages than max_layers: packages are then spread over max_layers
+    # layers by a hash of their names, so that a package keeps its layer.
+    def __init__(self, root: Path, max_layers: int = 100) -> None:
+        self.root = root
+        self.max_layers = max_layers
+        self._index: dict[str, Any] = {"schemaVersion": 2, "mediaType": INDEX_MEDIA_TYPE, "manifests": []}
+        self._known_layers: dict[tuple[str, ...], Layer] = {}
+        index_path = root / "index.json"
+        if index_path.exists():
+            try:
+                self._index = json.loads(index_path.read_text("utf-8"))
+                for manifest in self._index["manifests"]:
+                    self._load_layers(manifest)
+            except (OSError, ValueError, KeyError, TypeError) as exc:
+                raise AppError(f"invalid OCI image layout {root}: {exc!r}")
+
+    def group(self, package_files: Iterable[PackageFile]) -> list[list[PackageFile]]:
+        package_files = sorted(package_files, key=lambda package_file: package_file.metadata.name)
+        if len(package_files) <= self.max_layers:
+            return [[package_file] for package_file in package_files]
+        groups: list[list[PackageFile]] = [[] for _ in range(self.max_layers)]
+        for package_file in package_files:
+            groups[zlib.crc32(package_file.metadata.name.encode()) % self.max_layers].append(package_file)
+        return [group for group in groups if group]
+
+    def write_layer(self, package_files: list[PackageFile]) -> Layer:
+        packages = tuple(package_file.metadata.filename for package_file in package_files)
+        known = self._known_layers.get(packages)
+        if known is not None and self._blob_size(known.digest) == known.size:
+            return Layer(known.packages, known.digest, known.diff_id, known.size, reused=True)
+        blob_dir = self.root / "blobs" / "sha256"
+        blob_dir.mkdir(parents=True, exist_ok=True)
+        partial_path = blob_dir / f"{packages[0]}.part"
+        with partial_path.open("wb") as blob_file:
+            compressed = _HashingWriter(blob_file)
+            # No name and mtime in the gzip header: the same members give the same bytes
+            with gzip.GzipFile(filename="", mode="wb", fileobj=compressed, mtime=0, compresslevel=6) as gz:
+                uncompressed = _HashingWriter(gz)
+                with tarfile.open(fileobj=uncompressed, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+                    for package_file in package_files:
+                        for member, content in package_file.members():
+                            member.mtime = 0
+                            tar.addfile(member, content)
+        layer = Layer(packages, compressed.digest, uncompressed.digest, compressed.size)
+        partial_path.replace(self._blob_path(layer.digest))
+        self._known_layers[packages] = layer
+        return layer
+
+    def save(self, layers: list[Layer], tag: str, architecture: str = "amd64") -> str:
+        # Writes the image with the layers under the tag, replacing an image with the same tag.
+        # Returns the digest of the manifest. The architecture is that of the platform the image
+        # is for, not of the machine writing it, so the image is the same wherever it's written.
+        config = {
+            "architecture": architecture,
+            "os": "linux",
+            "config": {},
+            "rootfs": {"type": "layers", "diff_ids": [layer.diff_id for layer in layers]},
+        }
+        manifest = {
+            "schemaVersion": 2,
+            "mediaType": MANIFEST_MEDIA_TYPE,
+            "config": self._write_json_blob(CONFIG_MEDIA_TYPE, config),
+            "layers": [layer.descriptor for layer in layers],
+        }
+        manifest_descriptor = self._write_json_blob(MANIFEST_MEDIA_TYPE, manifest)
+        manifest_descriptor["annotations"] = {REF_NAME_ANNOTATION: tag}
+        self._index["manifests"] = [
+            m for m in self._index["manifests"] if m.get("annotations", {}).get(REF_NAME_ANNOTATION) != tag
+        ] + [manifest_descriptor]
+        self._write_file("oci-layout", json.dumps({"imageLayoutVersion": "1.0.0"}).encode())
+        self._write_file("index.json", json.dumps(self._index, indent=2).encode())
+        self._remove_unreferenced_blobs()
+        return str(manifest_descriptor["digest"])
+
+    def _load_layers(self, manifest_descriptor: dict[str, Any]) -> None:
+        if manifest_descriptor.get("mediaType") != MANIFEST_MEDIA_TYPE:
+            return
+        manifest = self._read_json_blob(manifest_descriptor["digest"])
+        diff_ids = self._read_json_blob(manifest["config"]["digest"])["rootfs"]["diff_ids"]
+        for descriptor, diff_id in zip(manifest["layers"], diff_ids):
+            packages = descriptor.get("annotations", {}).get(PACKAGES_ANNOTATION)
+            if packages and descriptor["mediaType"] == LAYER_MEDIA_TYPE:
+                layer = Layer(tuple(packages.split(" ")), descriptor["digest"], diff_id, descriptor["size"])
+                self._known_layers[layer.packages] = layer
+
+    def _remove_unreferenced_blobs(self) -> None:
+        # Layers of packages that were updated or dropped from all images
+        referenced = set()
+        for manifest_descriptor in self._index["manifests"]:
+            referenced.add(manifest_descriptor["digest"])
+            if manifest_descriptor.get("mediaType") == MANIFEST_MEDIA_TYPE:
+                manifest = self._read_json_blob(manifest_descriptor["digest"])
+                referenced.add(manifest["config"]["digest"])
+                referenced.update(layer["digest"] for layer in manifest["layers"])
+        for path in (self.root / "blobs" / "sha256").iterdir():
+            if f"sha256:{path.name}" not in referenced:
+                path.unlink()
+
+    def _blob_path(self, digest: str) -> Path:
+        algorithm, _, hex_digest = digest.partition(":")
+        if algorithm != "sha256" or not hex_digest.isalnum():
+            raise ValueError(f"unsupported digest {digest}")
+        return self.root / "blobs" / "sha256" / hex_digest
+
+    def _blob_size(self, digest: str) -> int | None:
+        path = self._blob_path(digest)
+        return path.stat().st_size if path.exists() else None
+
+    def _read_json_blob(self, digest: str) -> Any:
+        return json.loads(self._blob_path(digest).read_bytes())
+
+    def _write_json_blob(self, media_type: str, content: dict[str, Any]) -> dict[str, Any]:
+        data = json.dumps(content, separators=(",", ":")).encode()
+        digest = f"sha256:{hashlib.sha256(data).hexdigest()}"
+        self._blob_path(digest).parent.mkdir(parents=True, exist_ok=True)
+        self._blob_path(digest).write_bytes(data)
+        return {"mediaType": media_type, "digest": digest, "size": len(data)}
+
+    def _write_file(self, name: str, data: bytes) -> None:
+        # Replaced in one step: readers never see a partial index
+        path = self.root / name
+        partial_path = path.with_name(name + ".part")
+        partial_path.write_bytes(data)
+        partial_path.replace(path)
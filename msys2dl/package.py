@@ -1,6 +1,6 @@
 import re
 from collections import deque
-from collections.abc import Iterable, Iterator
+from collections.abc import Callable, Iterable, Iterator
 from dataclasses import dataclass, field
 from typing import ClassVar, Optional
 
@@ -28,6 +28,10 @@ class Environment:
     def database_download_path(self) -> str:
         return f"{self.path_prefix}/{self.name}/{self.name}.db"
 
+    @property
+    def files_database_download_path(self) -> str:
+        return f"{self.path_prefix}/{self.name}/{self.name}.files"
+
     def package_download_path(self, filename: str) -> str:
         return f"{self.path_prefix}/{self.name}/{filename}"
 
@@ -123,6 +127,8 @@ class Package:
         self, name_dict: dict[str, "Package"], provides_dict: dict[str, list["Package"]]
     ) -> None:
         self.dependencies = []
+        self.unknown_dependencies = []
+        self.conflicts = []
         for dep in self.dependencies_str:
             if dep in provides_dict:
                 provided_by = provides_dict[dep]
@@ -194,7 +200,10 @@ class PackageSet:
         self._set.add(package)
         return True
 
-    def add_dependencies_recursively(self, exclude: Iterable[Package] | None) -> None:
+    def add_dependencies_recursively(
+        self, exclude: Iterable[Package] | None, report: Callable[[str], None] = print
+    ) -> None:
+        # The choices among alternatives are passed to report
         found_alternatives: set[PackageAlternatives] = set()
         q = deque(self._set)
         alternatives_q: deque[PackageAlternatives] = deque()
@@ -218,11 +227,11 @@ class PackageSet:
                 chosen = next((alt for alt in alternatives.packages if alt in self._set), None)
                 if chosen:
                     # already chosen
-                    print(f"Alternatives: {chosen.name} is explicitly chosen from {alternatives}")
+                    report(f"Alternatives: {chosen.name} is explicitly chosen from {alternatives}")
                 else:
                     # select one
                     chosen = min(alternatives.packages, key=lambda p: p.name)
-                    print(f"Alternatives: selecting {chosen.name} from {alternatives}")
+                    report(f"Alternatives: selecting {chosen.name} from {alternatives}")
                 self.add(chosen)
                 q.append(chosen)
 
@@ -1,29 +1,85 @@
+import hashlib
 import io
 import tarfile
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
 from pathlib import Path
 
 from msys2dl.download.download_request import DownloadRequest
+from msys2dl.files_index import FilesIndex, FilesIndexUpdate
 from msys2dl.package import Environment, Package
 from msys2dl.utilities import AppError, decompress_zst
 
 
+@dataclass
+class DatabaseChanges:
+    added: list[Package] = field(default_factory=list)
+    updated: list[tuple[Package, Package]] = field(default_factory=list)  # old and new package
+    removed: list[Package] = field(default_factory=list)
+
+    @classmethod
+    def from_diff(cls, removed: Iterable[Package], added: Iterable[Package]) -> "DatabaseChanges":
+        removed_by_name = {p.name: p for p in removed}
+        changes = cls()
+        for p in added:
+            old = removed_by_name.pop(p.name, None)
+            if old is None:
+                changes.added.append(p)
+            else:
+                changes.updated.append((old, p))
+        changes.removed = list(removed_by_name.values())
+        return changes
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+    def __str__(self) -> str:
+        return f"{len(self.added)} added, {len(self.updated)} updated, {len(self.removed)} removed"
+
+
 class PackageDatabase:
+    # Database files are parsed on the first lookup, or when reload() is called. The .files
+    # databases listing the contents of the packages are only downloaded on request, and are
+    # looked up through files_index.
     def __init__(self, root: Path) -> None:
         self._root = root
+        self.files_index = FilesIndex(root / "files.sqlite")
         self._packages_name_dict: dict[str, "Package"] = {}
         self._packages_provides_dict: dict[str, list["Package"]] = {}
-        self.reload()
+        self._environments: set[Environment] = set()
+        # Snapshot of the last reload: database file stats, and packages by database entry
+        self._sources: dict[Environment, tuple[int, int]] = {}
+        self._entries: dict[Environment, dict[str, Package]] = {}
+        # Packages by the names in their dependencies and conflicts
+        self._dependents: dict[str, set[Package]] = {}
+        self._fingerprint: str | None = None
+        self._loaded = False
+
+    def make_download_requests(self, environments: Iterable[Environment]) -> list[DownloadRequest]:
+        return [
+            DownloadRequest(name=e.name, path=e.database_download_path, dest=self._database_file(e))
+            for e in environments
+        ]
 
-    def make_download_requests(
-        self, base_url: str, environments: Iterable[Environment]
-    ) -> list[DownloadRequest]:
+    def make_files_download_requests(self, environments: Iterable[Environment]) -> list[DownloadRequest]:
         return [
-            DownloadRequest(name=e.name, url=base_url + e.database_download_path, dest=self._database_file(e))
+            DownloadRequest(
+                name=e.name + ".files", path=e.files_database_download_path, dest=self._files_database_file(e)
+            )
             for e in environments
         ]
 
+    def update_files_index(self, environments: Iterable[Environment]) -> dict[Environment, FilesIndexUpdate]:
+        # Returns the changes for environments whose .files database changed since the last update
+        updates = {}
+        for env in environments:
+            update = self.files_index.update(env, self._files_database_file(env))
+            if update is not None:
+                updates[env] = update
+        return updates
+
     def get(self, full_name: str) -> Package | None:
+        self._ensure_loaded()
         return self._packages_name_dict.get(full_name)
 
     def get_or_raise(self, full_name: str) -> Package:
@@ -35,39 +91,124 @@ class PackageDatabase:
     def get_all_or_raise(self, full_names: Iterable[str]) -> list[Package]:
         return [self.get_or_raise(name) for name in full_names]
 
-    def reload(self) -> None:
-        self._packages_name_dict = {}
-        self._packages_provides_dict = {}
-        # Load packages
-        all_packages = []
+    @property
+    def environments(self) -> set[Environment]:
+        self._ensure_loaded()
+        return self._environments
+
+    def __iter__(self) -> Iterator[Package]:
+        self._ensure_loaded()
+        return iter(self._packages_name_dict.values())
+
+    @property
+    def fingerprint(self) -> str:
+        # Hash of the entries of the loaded databases: it changes with any package added, removed or
+        # updated, but not when a database file is downloaded again with the same content
+        self._ensure_loaded()
+        if self._fingerprint is None:
+            sha256 = hashlib.sha256()
+            for env in sorted(self._entries, key=lambda env: env.name):
+                for entry in sorted(self._entries[env]):
+                    sha256.update(f"{env.name}/{entry}\n".encode())
+            self._fingerprint = sha256.hexdigest()
+        return self._fingerprint
+
+    def reload(self) -> DatabaseChanges:
+        # Only database files that changed since the last reload are read, and only the entries
+        # (name-version directories) that are new are parsed. Links are then updated for the
+        # added packages and the packages depending on or conflicting with a changed name.
+        removed: list[Package] = []
+        added: list[Package] = []
         for env in Environment.all:
             db_file = self._database_file(env)
-            if db_file.exists():
-                all_packages.extend(self._load_from_file(env, db_file))
-        # Populate lookup dictionaries
-        for p in all_packages:
-            # Add package to name lookup
-            self._packages_name_dict[p.name] = p
-            # Add package to provides lookup
-            p_provides = {p.name, *p.provides}
-            for p_name in p_provides:
-                self._packages_provides_dict.setdefault(p_name, []).append(p)
-        # Populate dependencies
-        for p in all_packages:
+            old_entries = self._entries.get(env, {})
+            if not db_file.exists():
+                removed.extend(old_entries.values())
+                self._entries.pop(env, None)
+                self._sources.pop(env, None)
+                self._environments.discard(env)
+                continue
+            stat = db_file.stat()
+            source = (stat.st_mtime_ns, stat.st_size)
+            if self._sources.get(env) == source:
+                continue
+            new_entries = self._load_from_file(env, db_file, old_entries)
+            removed.extend(package for entry, package in old_entries.items() if entry not in new_entries)
+            added.extend(package for entry, package in new_entries.items() if entry not in old_entries)
+            self._entries[env] = new_entries
+            self._sources[env] = source
+            self._environments.add(env)
+        # Update lookup dictionaries
+        for p in removed:
+            self._remove_package(p)
+        for p in added:
+            self._add_package(p)
+        # Update links
+        changed_names = {name for p in removed + added for name in (p.name, *p.provides)}
+        relinked = set(added)
+        for name in changed_names:
+            relinked.update(
+                dependent
+                for dependent in self._dependents.get(name, ())
+                if self._packages_name_dict.get(dependent.name) is dependent
+            )
+        for p in relinked:
             p.resolve_package_links(self._packages_name_dict, self._packages_provides_dict)
+        if removed or added:
+            self._fingerprint = None
+        self._loaded = True
+        return DatabaseChanges.from_diff(removed, added)
+
+    def _add_package(self, package: Package) -> None:
+        self._packages_name_dict[package.name] = package
+        for name in {package.name, *package.provides}:
+            self._packages_provides_dict.setdefault(name, []).append(package)
+        for name in {*package.dependencies_str, *package.conflicts_str}:
+            self._dependents.setdefault(name, set()).add(package)
+
+    def _remove_package(self, package: Package) -> None:
+        # Packages compare by name: the lists and sets are filtered by identity, as a package may be
+        # removed and added in another version
+        if self._packages_name_dict.get(package.name) is package:
+            del self._packages_name_dict[package.name]
+        for name in {package.name, *package.provides}:
+            providers = [p for p in self._packages_provides_dict.get(name, []) if p is not package]
+            if providers:
+                self._packages_provides_dict[name] = providers
+            else:
+                self._packages_provides_dict.pop(name, None)
+        for name in {*package.dependencies_str, *package.conflicts_str}:
+            dependents = self._dependents.get(name, set())
+            dependents.discard(package)
+            if not dependents:
+                self._dependents.pop(name, None)
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.reload()
 
     def _database_file(self, environment: Environment) -> Path:
         return self._root / (environment.name + ".db")
 
+    def _files_database_file(self, environment: Environment) -> Path:
+        return self._root / (environment.name + ".files")
+
     @staticmethod
-    def _load_from_file(env: Environment, path: Path) -> list[Package]:
+    def _load_from_file(env: Environment, path: Path, known: dict[str, Package]) -> dict[str, Package]:
+        # Returns the packages by database entry; entries in known are not parsed again
         content = decompress_zst(path.read_bytes())
         tar = tarfile.open(fileobj=io.BytesIO(content), mode="r")
-        packages = []
+        packages = {}
         for member in tar.getmembers():
+            if not member.name.endswith("/desc"):
+                continue
+            entry = member.name.removesuffix("/desc")
+            if entry in known:
+                packages[entry] = known[entry]
+                continue
             file = tar.extractfile(member)
-            if file and member.name.endswith("/desc"):
-                packages.append(Package.from_desc(file.read().decode("utf-8"), environment=env))
+            if file:
+                packages[entry] = Package.from_desc(file.read().decode("utf-8"), environment=env)
         return packages
 
 
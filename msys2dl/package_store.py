@@ -1,12 +1,16 @@
+import contextlib
 import io
+import os
 import tarfile
-from collections.abc import Iterable
-from dataclasses import dataclass
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
 from pathlib import Path
 from tarfile import TarFile, TarInfo, data_filter
+from typing import IO
 
 from msys2dl.download.download_request import DownloadRequest
-from msys2dl.package import Package
+from msys2dl.package import Environment, Package
 from msys2dl.utilities import decompress_zst, sanitize_file_path
 
 
@@ -15,39 +19,145 @@ class PackageFile:
     metadata: Package
     path: Path
 
-    def extract(self, dst: Path) -> None:
+    def extract(self, dst: Path) -> list[str]:
+        # Returns the paths of the extracted files and links, relative to dst
+        extracted = []
+
         def need_to_extract(member: TarInfo, dest_path: str) -> TarInfo | None:
-            if not data_filter(member, dest_path):
-                return None
-            if member.name.startswith("."):
-                # No .MTREE and other pacman files
+            filtered = _filter_member(member, dest_path)
+            if not filtered:
                 return None
+            if not filtered.isdir():
+                extracted.append(filtered.name)
             return member
 
         self.as_tar_file().extractall(filter=need_to_extract, path=dst)
+        return extracted
+
+    def members(self) -> Iterator[tuple[TarInfo, IO[bytes] | None]]:
+        # The members extract() would write, filtered the same way, with the contents of regular
+        # files, to be written into another archive. Owners are root, and directories get the mode
+        # extraction would give them. A content is only valid until the next member is read.
+        tar = self.as_tar_file()
+        for member in tar:
+            # Checked against a directory that doesn't exist, so that only the member decides
+            filtered = _filter_member(member, "/nonexistent-msys2dl-root")
+            if not filtered:
+                continue
+            if filtered.mode is None:
+                filtered.mode = 0o755
+            filtered.uid = filtered.gid = 0
+            filtered.uname = filtered.gname = "root"
+            # The headers written are derived from the fields above
+            filtered.pax_headers = {}
+            yield filtered, tar.extractfile(member) if filtered.isreg() else None
 
     def as_tar_file(self) -> TarFile:
         tar_bytes = decompress_zst(self.path.read_bytes())
         return tarfile.open(fileobj=io.BytesIO(tar_bytes), mode="r")
 
 
+def _filter_member(member: TarInfo, dest_path: str) -> TarInfo | None:
+    if member.name.startswith("."):
+        # No .MTREE and other pacman files
+        return None
+    return data_filter(member, dest_path)
+
+
+@dataclass
+class GarbageCollectionResult:
+    removed_files: list[Path] = field(default_factory=list)
+    freed_bytes: int = 0
+    remaining_bytes: int = 0
+
+
+@dataclass
+class _CachedPackageFile:
+    path: Path
+    size: int
+    last_access: float
+
+
 class PackageStore:
+    orphaned_file_age: float = 60 * 60
+
     def __init__(self, root: Path) -> None:
         self.root = root
 
     def get_package_file(self, package: Package) -> PackageFile:
-        return PackageFile(package, self.path_for_package(package))
+        path = self.path_for_package(package)
+        self._mark_accessed(path)
+        return PackageFile(package, path)
 
     def path_for_package(self, package: Package) -> Path:
         return self.root / package.environment.name / sanitize_file_path(package.filename)
 
-    def make_download_request(self, base_url: str, package: Package) -> DownloadRequest:
+    def path_for_package_file_name(self, filename: str) -> Path:
+        environment = Environment.by_package_name_or_raise(filename)
+        return self.root / environment.name / sanitize_file_path(filename)
+
+    def make_download_request(self, package: Package) -> DownloadRequest:
         return DownloadRequest(
             name=str(package),
-            url=base_url + package.download_path,
+            path=package.download_path,
             dest=self.path_for_package(package),
             expected_size=package.compressed_size,
         )
 
-    def make_download_requests(self, base_url: str, packages: Iterable[Package]) -> list[DownloadRequest]:
-        return [self.make_download_request(base_url, package) for package in packages]
+    def make_download_requests(self, packages: Iterable[Package]) -> list[DownloadRequest]:
+        return [self.make_download_request(package) for package in packages]
+
+    def collect_garbage(
+        self, environments: Iterable[str], protected: Iterable[Path], max_size: int | None = None
+    ) -> GarbageCollectionResult:
+        # Without a size budget all unprotected files are removed,
+        # otherwise least recently used files are removed until the store fits into the budget
+        protected = set(protected)
+        result = GarbageCollectionResult()
+        candidates: list[_CachedPackageFile] = []
+        for env_name in environments:
+            env_dir = self.root / env_name
+            if not env_dir.is_dir():
+                continue
+            for path in env_dir.iterdir():
+                stat = path.stat()
+                if path.suffix == ".part" or (path.suffix == ".sig" and not path.with_suffix("").exists()):
+                    # Leftovers of interrupted downloads; recent ones may belong to a running download
+                    if time.time() - stat.st_mtime > self.orphaned_file_age:
+                        self._remove(path, stat.st_size, result)
+                elif path.suffix != ".sig":
+                    size = stat.st_size + self._sig_size(path)
+                    result.remaining_bytes += size
+                    if path not in protected:
+                        candidates.append(_CachedPackageFile(path, size, stat.st_atime))
+        candidates.sort(key=lambda f: f.last_access)
+        for candidate in candidates:
+            if max_size is not None and result.remaining_bytes <= max_size:
+                break
+            self._remove(candidate.path, candidate.size, result)
+            self._remove_sig(candidate.path)
+            result.remaining_bytes -= candidate.size
+        return result
+
+    @staticmethod
+    def _mark_accessed(path: Path) -> None:
+        # Access time is updated explicitly: filesystems are often mounted with noatime/relatime
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(path, (time.time(), path.stat().st_mtime))
+
+    @staticmethod
+    def _sig_path(path: Path) -> Path:
+        return path.with_name(path.name + ".sig")
+
+    def _sig_size(self, path: Path) -> int:
+        sig_path = self._sig_path(path)
+        return sig_path.stat().st_size if sig_path.exists() else 0
+
+    def _remove_sig(self, path: Path) -> None:
+        self._sig_path(path).unlink(missing_ok=True)
+
+    @staticmethod
+    def _remove(path: Path, size: int, result: GarbageCollectionResult) -> None:
+        path.unlink(missing_ok=True)
+        result.removed_files.append(path)
+        result.freed_bytes += size
@@ -1,11 +1,48 @@
+import threading
+import time
 from collections.abc import Iterable
+from datetime import timedelta
 
-from rich import table
+from rich import get_console, table
 from rich.console import ConsoleRenderable
-from rich.progress import BarColumn, DownloadColumn, MofNCompleteColumn, Progress, TaskID, TextColumn
+from rich.progress import (
+    BarColumn,
+    DownloadColumn,
+    MofNCompleteColumn,
+    Progress,
+    ProgressColumn,
+    Task,
+    TaskID,
+    TextColumn,
+    TimeElapsedColumn,
+    TimeRemainingColumn,
+)
+from rich.text import Text
 
 from msys2dl.download.download_callback import DownloadCallbacks
 from msys2dl.download.download_request import DownloadRequest
+from msys2dl.utilities import format_size
+
+
+class AppProgress(Progress):
+    def get_renderables(self) -> Iterable[ConsoleRenderable]:
+        for task in self.tasks:
+            progress_type = task.fields.get("progress_type")
+            if progress_type == "simple" or progress_type is None:
+                self.columns = (
+                    TextColumn("[progress.description]{task.description}"),
+                    MofNCompleteColumn(),
+                    BarColumn(),
+                    TimeElapsedColumn(),
+                )
+            if progress_type == "download":
+                self.columns = (
+                    TextColumn("[progress.description]{task.description}"),
+                    BarColumn(bar_width=None),
+                    "•",
+                    DownloadColumn(),
+                )
+            yield self.make_tasks_table([task])
 
 
 class ProgressCounter(Progress):
@@ -27,12 +64,53 @@ class ProgressCounter(Progress):
         self.advance(self._main_task_id, n)
 
 
+def create_download_progress(
+    total: int, description: str = "Downloading"
+) -> "DownloadProgress | DownloadProgressLog":
+    # A live display only makes sense on a terminal: logs get a summary line every few seconds
+    if get_console().is_terminal:
+        return DownloadProgress(total, description)
+    return DownloadProgressLog(total, description)
+
+
 class DownloadProgress(Progress):
+    # Shows a bar for at most max_rows downloads at a time. The other downloads are counted in a
+    # summary line, which also shows the throughput and the remaining time of all downloads.
+    max_rows = 8
+
     def __init__(self, total: int, description: str = "Downloading"):
+        # Set before the tasks are added: adding a task may render the display
+        self._rows: list[TaskID] = []
+        self._free_rows: list[TaskID] = []
+        # Active downloads without a row, in the order they started
+        self._waiting: dict[DownloadProgressTracker, None] = {}
+        self._rows_lock = threading.Lock()
         super().__init__()
-        self._total = total
         self._main_task_id = self.add_task(description, total=total)
-        self._name_column_width = len(description)
+        self._bytes_task_id = self.add_task("", total=None)
+        # The rows are created up front: adding or resetting a task refreshes the display, which
+        # takes the display lock and then _rows_lock on the refresh thread
+        self._rows = [self.add_task("", total=None, visible=False) for _ in range(self.max_rows)]
+        self._free_rows = list(self._rows)
+        self._total_bytes = 0
+        self._name_column = table.Column(width=len(description))
+        self._download_columns = (
+            TextColumn("[progress.description]{task.description}", table_column=self._name_column),
+            BarColumn(bar_width=None),
+            DownloadColumn(binary_units=True, table_column=table.Column(width=15)),
+        )
+        self._summary_columns = (
+            TextColumn("[progress.description]{task.description}", table_column=self._name_column),
+            BarColumn(bar_width=None),
+            DownloadColumn(binary_units=True, table_column=table.Column(width=15)),
+            _TransferSpeedColumn(table_column=table.Column(width=12)),
+            TimeRemainingColumn(table_column=table.Column(width=8)),
+        )
+        self._main_columns = (
+            TextColumn("[progress.description]{task.description}", table_column=self._name_column),
+            BarColumn(bar_width=None),
+            MofNCompleteColumn(table_column=table.Column(width=15)),
+        )
 
     def __enter__(self) -> "DownloadProgress":
         # override __enter__ for type checking
@@ -40,47 +118,96 @@ class DownloadProgress(Progress):
         return self
 
     def register_callbacks(self, request: DownloadRequest, callbacks: DownloadCallbacks) -> None:
-        self._name_column_width = max(self._name_column_width, len(request.name))
+        self._name_column.width = max(self._name_column.width or 0, len(request.name))
+        if request.expected_size is not None:
+            self._total_bytes += request.expected_size
+            self.update(self._bytes_task_id, total=self._total_bytes)
         DownloadProgressTracker(self, request).register_callbacks(callbacks)
 
     def get_renderables(self) -> Iterable[ConsoleRenderable]:
-        if not self.tasks:
+        # Runs on the refresh thread, while downloads update the rows
+        with self._rows_lock:
+            rows = list(self._rows)
+        tasks = {task.id: task for task in self.tasks}
+        if not tasks:
             return
-        main_task = next(task for task in self.tasks if task.id == self._main_task_id)
-        download_tasks = [task for task in self.tasks if task.id != self._main_task_id]
+        self.columns = self._download_columns
+        yield self.make_tasks_table([tasks[row] for row in rows if row in tasks and tasks[row].visible])
+        self.columns = self._summary_columns
+        yield self.make_tasks_table([tasks[self._bytes_task_id]])
+        self.columns = self._main_columns
+        yield self.make_tasks_table([tasks[self._main_task_id]])
 
-        # Render download progress bars
-        self.columns = (
-            TextColumn(
-                "[progress.description]{task.description}",
-                table_column=table.Column(width=self._name_column_width),
-            ),
-            BarColumn(bar_width=None),
-            DownloadColumn(binary_units=True, table_column=table.Column(width=15)),
-        )
-        yield self.make_tasks_table(download_tasks)
+    def advance_n_downloaded(self, n: int = 1) -> None:
+        self.advance(self._main_task_id, n)
 
-        # Render main progress bar
-        self.columns = (
-            TextColumn(
-                "[progress.description]{task.description}",
-                table_column=table.Column(width=self._name_column_width),
-            ),
-            BarColumn(bar_width=None),
-            MofNCompleteColumn(table_column=table.Column(width=15)),
+    def update_download(
+        self, tracker: "DownloadProgressTracker", bytes_downloaded: int, bytes_total: int
+    ) -> None:
+        with self._rows_lock:
+            if tracker.finished:
+                return
+            # Restarted downloads are not counted twice
+            self.advance(self._bytes_task_id, max(0, bytes_downloaded - tracker.counted_bytes))
+            tracker.counted_bytes = max(tracker.counted_bytes, bytes_downloaded)
+            tracker.bytes_downloaded = bytes_downloaded
+            tracker.bytes_total = bytes_total
+            if tracker.row is None and tracker not in self._waiting:
+                if self._free_rows:
+                    self._assign_row(self._free_rows.pop(0), tracker)
+                else:
+                    self._waiting[tracker] = None
+            if tracker.row is not None:
+                self.update(tracker.row, total=bytes_total, completed=bytes_downloaded)
+            self._update_n_waiting()
+
+    def finish_download(self, tracker: "DownloadProgressTracker") -> None:
+        with self._rows_lock:
+            tracker.finished = True
+            self._waiting.pop(tracker, None)
+            row, tracker.row = tracker.row, None
+            # Hand the row over to the download that has been waiting longest
+            if row is not None and self._waiting:
+                self._assign_row(row, next(iter(self._waiting)))
+            elif row is not None:
+                self.update(row, visible=False)
+                self._free_rows.append(row)
+            self._update_n_waiting()
+
+    def _update_n_waiting(self) -> None:
+        n_waiting = len(self._waiting)
+        self.update(self._bytes_task_id, description=f"+{n_waiting} more" if n_waiting else "")
+
+    def _assign_row(self, row: TaskID, tracker: "DownloadProgressTracker") -> None:
+        self._waiting.pop(tracker, None)
+        tracker.row = row
+        self.update(
+            row,
+            description=tracker.description,
+            total=tracker.bytes_total,
+            completed=tracker.bytes_downloaded,
+            visible=True,
         )
-        yield self.make_tasks_table([main_task])
 
-    def advance_n_downloaded(self, n: int = 1) -> None:
-        self.advance(self._main_task_id, n)
+
+class _TransferSpeedColumn(ProgressColumn):
+    # rich's TransferSpeedColumn uses decimal units, unlike DownloadColumn(binary_units=True)
+    def render(self, task: Task) -> Text:
+        speed = task.finished_speed or task.speed
+        if speed is None:
+            return Text("?", style="progress.data.speed")
+        return Text(f"{format_size(int(speed))}/s", style="progress.data.speed")
 
 
 class DownloadProgressTracker:
     def __init__(self, progress: DownloadProgress, request: DownloadRequest):
-        self._task_id: TaskID | None = None
         self._progress = progress
-        self._description = request.name
-        self._task_removed = False
+        self.description = request.name
+        self.row: TaskID | None = None
+        self.bytes_downloaded = 0
+        self.bytes_total = request.expected_size or 0
+        self.counted_bytes = 0
+        self.finished = False
 
     def register_callbacks(self, callbacks: DownloadCallbacks) -> None:
         callbacks.success_handlers.register(self.on_success)
@@ -88,17 +215,72 @@ class DownloadProgressTracker:
         callbacks.progress_handlers.register(self.on_progress)
 
     def on_progress(self, bytes_downloaded: int, bytes_total: int) -> None:
-        if self._task_removed:
-            return
-        if self._task_id is None:
-            self._task_id = self._progress.add_task(self._description, total=bytes_total)
-        self._progress.update(self._task_id, total=bytes_total, completed=bytes_downloaded)
+        self._progress.update_download(self, bytes_downloaded, bytes_total)
 
     def on_success(self) -> None:
         self._progress.advance_n_downloaded(1)
 
     def on_complete(self) -> None:
-        if not self._task_removed:
-            self._task_removed = True
-            if self._task_id is not None:
-                self._progress.remove_task(self._task_id)
+        self._progress.finish_download(self)
+
+
+class DownloadProgressLog:
+    # Line oriented progress for output that isn't a terminal, e.g. CI logs
+    interval = 5.0
+
+    def __init__(self, total: int, description: str = "Downloading"):
+        self._total = total
+        self._description = description
+        self._n_downloaded = 0
+        self._bytes_downloaded = 0
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._start_time = time.monotonic()
+        self._next_report_time = self._start_time + self.interval
+
+    def __enter__(self) -> "DownloadProgressLog":
+        self._start_time = time.monotonic()
+        self._next_report_time = self._start_time + self.interval
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        with self._lock:
+            self._report(time.monotonic())
+
+    def register_callbacks(self, request: DownloadRequest, callbacks: DownloadCallbacks) -> None:
+        self._total_bytes += request.expected_size or 0
+        counted_bytes = 0
+
+        def on_progress(bytes_downloaded: int, _bytes_total: int) -> None:
+            nonlocal counted_bytes
+            with self._lock:
+                self._bytes_downloaded += max(0, bytes_downloaded - counted_bytes)
+                counted_bytes = max(counted_bytes, bytes_downloaded)
+                self._maybe_report()
+
+        def on_success() -> None:
+            with self._lock:
+                self._n_downloaded += 1
+                self._maybe_report()
+
+        callbacks.progress_handlers.register(on_progress)
+        callbacks.success_handlers.register(on_success)
+
+    def _maybe_report(self) -> None:
+        now = time.monotonic()
+        if now >= self._next_report_time:
+            self._next_report_time = now + self.interval
+            self._report(now)
+
+    def _report(self, now: float) -> None:
+        rate = self._bytes_downloaded / max(now - self._start_time, 1e-6)
+        line = (
+            f"{self._description}: {self._n_downloaded}/{self._total}, {format_size(self._bytes_downloaded)}"
+        )
+        if self._total_bytes:
+            line += f" of {format_size(self._total_bytes)}"
+        line += f", {format_size(int(rate))}/s"
+        if self._total_bytes and rate > 0 and self._n_downloaded < self._total:
+            remaining = max(0, self._total_bytes - self._bytes_downloaded) / rate
+            line += f", {timedelta(seconds=int(remaining))} left"
+        print(line, flush=True)
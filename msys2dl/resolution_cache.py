@@ -0,0 +1,57 @@
+import hashlib
+import json
+from collections.abc import Iterable
+from pathlib import Path
+
+from msys2dl.utilities import connect_sqlite
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resolutions (request TEXT PRIMARY KEY, fingerprint TEXT, packages TEXT);
+"""
+
+
+def make_request_key(
+    include: Iterable[str], exclude: Iterable[str], with_dependencies: bool, check_conflicts: bool
+) -> str:
+    # The order and repetitions of the names don't change the resolved set
+    return json.dumps(
+        {
+            "include": sorted(set(include)),
+            "exclude": sorted(set(exclude)),
+            "with_dependencies": with_dependencies,
+            "check_conflicts": check_conflicts,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+
+
+class ResolutionCache:
+    # Resolved package sets by request in an SQLite file, so that a request made again doesn't walk
+    # the dependency graph. Each set is stored with the fingerprint of the databases it was resolved
+    # against: a lookup with another fingerprint misses, and storing a set drops the sets of
+    # previous database versions.
+    def __init__(self, path: Path) -> None:
+        self._path = path
+
+    def get(self, fingerprint: str, request: str) -> list[str] | None:
+        with connect_sqlite(self._path, _SCHEMA, "resolution cache") as conn:
+            row = conn.execute(
+                "SELECT packages FROM resolutions WHERE request = ? AND fingerprint = ?",
+                (self._hash(request), fingerprint),
+            ).fetchone()
+        if row is None:
+            return None
+        return [name for name in row[0].split("\n") if name]
+
+    def put(self, fingerprint: str, request: str, package_names: Iterable[str]) -> None:
+        with connect_sqlite(self._path, _SCHEMA, "resolution cache") as conn:
+            conn.execute("DELETE FROM resolutions WHERE fingerprint != ?", (fingerprint,))
+            conn.execute(
+                "INSERT OR REPLACE INTO resolutions (request, fingerprint, packages) VALUES (?, ?, ?)",
+                (self._hash(request), fingerprint, "\n".join(sorted(package_names))),
+            )
+
+    @staticmethod
+    def _hash(request: str) -> str:
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
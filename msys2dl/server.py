@@ -0,0 +1,173 @@
+import contextlib
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+
+from msys2dl.api import Msys2dl
+from msys2dl.utilities import AppError
+
+# Requests and responses are single JSON objects, one per line and connection:
+#   {"command": "extract" | "make-deb" | "download" | "resolve", "packages": [full names],
+#    "exclude": [full names], "with_dependencies": bool, "check_conflicts": bool, "output": absolute path}
+#   make-deb also takes an optional "bundle" name, "bundle_version" and "apt_index": bool
+#   {"ok": true, "result": [...], "messages": [lines for the user]} or {"ok": false, "error": message}
+COMMANDS = ("extract", "make-deb", "download", "resolve")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_UnixServer"
+
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline())
+            response = {"ok": True, **self.server.owner.handle(request)}
+        except AppError as exc:
+            response = {"ok": False, "error": exc.display()}
+        except InterruptedError:
+            response = {"ok": False, "error": "interrupted"}
+        except (ValueError, KeyError, TypeError) as exc:
+            response = {"ok": False, "error": f"invalid request: {exc!r}"}
+        except Exception as exc:
+            # A bug in one request must not end the connection without an answer
+            logging.exception("Unexpected exception handling a request", exc_info=exc)
+            response = {"ok": False, "error": f"internal error: {exc!r}"}
+        with contextlib.suppress(OSError):
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: Path, owner: "Server") -> None:
+        self.owner = owner
+        super().__init__(str(path), _Handler)
+
+
+class Server:
+    # Serves requests of local clients with one Msys2dl instance, so that the package databases,
+    # keys and download connections stay loaded between requests. Identical requests arriving
+    # while one is running share its result; the databases are refreshed in the background.
+    def __init__(self, msys2dl: Msys2dl, socket_path: Path, refresh_interval: float | None = None) -> None:
+        self._msys2dl = msys2dl
+        self._socket_path = socket_path
+        self._refresh_interval = refresh_interval
+        self._in_flight: dict[str, Future[dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._remove_stale_socket()
+        old_umask = os.umask(0o077)  # only the owner may connect
+        try:
+            self._server = _UnixServer(socket_path, self)
+        finally:
+            os.umask(old_umask)
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, name="server", daemon=True),
+            threading.Thread(target=self._refresh_loop, name="refresh", daemon=True),
+        ]
+
+    def __enter__(self) -> "Server":
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self._stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+        self._socket_path.unlink(missing_ok=True)
+
+    def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        key = json.dumps(request, sort_keys=True)
+        with self._lock:
+            future = self._in_flight.get(key)
+            is_owner = future is None
+            if future is None:
+                future = self._in_flight[key] = Future()
+        if not is_owner:
+            return future.result()
+        try:
+            future.set_result(self._execute(request))
+        except Exception as exc:
+            future.set_exception(exc)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result()
+
+    def _execute(self, request: dict[str, Any]) -> dict[str, Any]:
+        command = request["command"]
+        if command not in COMMANDS:
+            raise ValueError(f"unknown command {command!r}")
+        packages = list(request["packages"])
+        options: dict[str, Any] = {
+            "exclude": list(request.get("exclude", [])),
+            "with_dependencies": bool(request.get("with_dependencies", True)),
+            "check_conflicts": bool(request.get("check_conflicts", True)),
+        }
+        if command == "resolve":
+            resolved = self._msys2dl.resolve(packages, **options)
+            return {"result": [str(package) for package in resolved], "messages": []}
+        if command == "download":
+            package_files = self._msys2dl.download(packages, **options)
+            return {
+                "result": [str(package_file.path) for package_file in package_files],
+                "messages": [f"Downloaded {package_file.metadata}" for package_file in package_files],
+            }
+        output_dir = Path(request["output"])
+        if not output_dir.is_absolute():
+            raise ValueError("output must be an absolute path")
+        if command == "extract":
+            package_files = self._msys2dl.extract(packages, output_dir, **options)
+            return {
+                "result": [str(package_file.path) for package_file in package_files],
+                "messages": [f"Extracted {package_file.metadata}" for package_file in package_files],
+            }
+        deb_paths = self._msys2dl.make_deb(
+            packages,
+            output_dir,
+            bundle=request.get("bundle"),
+            bundle_version=str(request.get("bundle_version", "1")),
+            apt_index=bool(request.get("apt_index", False)),
+            **options,
+        )
+        return {
+            "result": [str(path) for path in deb_paths],
+            "messages": [f"Generated {path.name}" for path in deb_paths],
+        }
+
+    def _refresh_loop(self) -> None:
+        if not self._refresh_interval:
+            return
+        while not self._stopped.wait(self._refresh_interval):
+            try:
+                self._msys2dl.refresh()
+            except (AppError, InterruptedError) as exc:
+                message = exc.display() if isinstance(exc, AppError) else "interrupted"
+                print(f"Warning: failed to refresh the package databases: {message}")
+            except Exception as exc:
+                # Keep refreshing: the next attempt may succeed
+                logging.exception("Unexpected exception refreshing the package databases", exc_info=exc)
+
+    def _remove_stale_socket(self) -> None:
+        if not self._socket_path.exists():
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(str(self._socket_path))
+            except OSError:
+                # Left behind by a server that didn't stop cleanly
+                self._socket_path.unlink()
+                return
+        raise AppError(f"another server is listening on {self._socket_path}")
@@ -0,0 +1,114 @@
+import json
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass, field
+from pathlib import Path, PurePosixPath
+
+from msys2dl.package import Package
+from msys2dl.utilities import AppError
+
+
+@dataclass
+class InstalledPackage:
+    filename: str
+    files: list[str]
+
+
+@dataclass
+class SyncPlan:
+    install: list[Package] = field(default_factory=list)
+    update: list[Package] = field(default_factory=list)
+    remove: list[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.install or self.update or self.remove)
+
+
+class Sysroot:
+    # A directory kept in sync with a package set. The packages extracted into it and the files
+    # they own are recorded in a state file, so that a sync only touches packages whose file name
+    # changed, and removes the files of packages that were dropped or replaced.
+    state_file_name = ".msys2dl-installed.json"
+    state_version = 1
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.packages: dict[str, InstalledPackage] = {}
+        state_path = root / self.state_file_name
+        if not state_path.exists():
+            return
+        try:
+            state = json.loads(state_path.read_text("utf-8"))
+            version = state.get("version") if isinstance(state, dict) else None
+            if version == self.state_version:
+                self.packages = {
+                    name: InstalledPackage(**installed) for name, installed in state["packages"].items()
+                }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as exc:
+            raise AppError(f"invalid sysroot state {state_path}: {exc}")
+        if version != self.state_version:
+            raise AppError(f"unsupported sysroot state {state_path}, remove it to extract all packages again")
+
+    def plan(self, packages: Iterable[Package]) -> SyncPlan:
+        plan = SyncPlan()
+        names = set()
+        for package in sorted(packages, key=lambda p: p.name):
+            names.add(package.name)
+            installed = self.packages.get(package.name)
+            if installed is None:
+                plan.install.append(package)
+            elif installed.filename != package.filename:
+                plan.update.append(package)
+            else:
+                plan.unchanged += 1
+        plan.remove = sorted(name for name in self.packages if name not in names)
+        return plan
+
+    def record(self, package: Package, files: list[str]) -> list[str]:
+        # Returns the files of the replaced version, to be removed once all packages are extracted
+        replaced = self.packages.get(package.name)
+        self.packages[package.name] = InstalledPackage(package.filename, sorted(files))
+        return replaced.files if replaced is not None else []
+
+    def forget(self, name: str) -> list[str]:
+        # Returns the files of the package, to be removed once all packages are extracted
+        return self.packages.pop(name).files
+
+    def remove_files(self, files: Iterable[str]) -> int:
+        # Removes the files not owned by an installed package, and the directories left empty.
+        # Returns the number of removed files.
+        owned = {file for installed in self.packages.values() for file in installed.files}
+        n_removed = 0
+        directories: set[Path] = set()
+        for file in set(files) - owned:
+            path = self._path(file)
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            except OSError as exc:
+                raise AppError(f"failed to remove {path}: {exc}")
+            n_removed += 1
+            directories.update(parent for parent in path.parents if parent.is_relative_to(self.root))
+        for directory in sorted(directories, key=lambda d: len(d.parts), reverse=True):
+            if directory != self.root and directory.is_dir() and not any(directory.iterdir()):
+                directory.rmdir()
+        return n_removed
+
+    def _path(self, file: str) -> Path:
+        # Files come from the state file: never remove anything outside the sysroot
+        relative = PurePosixPath(file)
+        if relative.is_absolute() or ".." in relative.parts:
+            raise AppError(f"invalid file {file} in sysroot state")
+        return self.root / relative
+
+    def save(self) -> None:
+        state = {
+            "version": self.state_version,
+            "packages": {name: asdict(installed) for name, installed in sorted(self.packages.items())},
+        }
+        # Written in place only once complete: an interrupted sync keeps the previous state
+        state_path = self.root / self.state_file_name
+        partial_path = state_path.with_name(state_path.name + ".part")
+        partial_path.write_text(json.dumps(state), "utf-8")
+        partial_path.replace(state_path)
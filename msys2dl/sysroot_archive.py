@@ -0,0 +1,76 @@
+import tarfile
+from pathlib import Path
+from types import TracebackType
+
+from msys2dl.package_store import PackageFile
+from msys2dl.utilities import AppError
+
+
+class SysrootArchive:
+    # A sysroot written as one tar.zst archive instead of a directory tree: the members of the
+    # packages are streamed into a multithreaded zstd compressor, so that nothing but the archive
+    # is written. Directories shared by packages are written once; a file or link in more than one
+    # package is a conflict, or with check_conflicts off, only the first one is kept.
+    def __init__(self, path: Path, check_conflicts: bool = True, level: int = 3) -> None:
+        # zstandard is slow to import: only archives need it here
+        import zstandard as zstd
+
+        self.path = path
+        self.check_conflicts = check_conflicts
+        self.n_duplicates = 0
+        self._owners: dict[str, str] = {}
+        self._directories: set[str] = set()
+        self._partial_path = path.with_name(path.name + ".part")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self._partial_path.open("wb")
+        except OSError as exc:
+            raise AppError(f"failed to write archive {path}: {exc}")
+        compressor = zstd.ZstdCompressor(level=level, threads=-1)
+        self._writer = compressor.stream_writer(self._file, closefd=False)
+        self._flush_frame = zstd.FLUSH_FRAME
+        self._tar = tarfile.open(fileobj=self._writer, mode="w|", format=tarfile.PAX_FORMAT)
+
+    def __enter__(self) -> "SysrootArchive":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def add(self, package_file: PackageFile) -> None:
+        package = str(package_file.metadata)
+        for member, content in package_file.members():
+            name = member.name.rstrip("/")
+            if member.isdir() and name in self._directories:
+                continue
+            owner = self._owners.get(name) or ("a directory" if name in self._directories else None)
+            if owner is not None:
+                if self.check_conflicts:
+                    raise AppError(f"{name} is in {owner} and {package}")
+                print(f"Warning: skipped {name} of {package}, already in {owner}")
+                self.n_duplicates += 1
+                continue
+            if member.isdir():
+                self._directories.add(name)
+            else:
+                self._owners[name] = package
+            self._tar.addfile(member, content)
+
+    def close(self) -> None:
+        # Moved in place only once complete
+        self._tar.close()
+        self._writer.flush(self._flush_frame)
+        self._file.close()
+        self._partial_path.replace(self.path)
+
+    def discard(self) -> None:
+        self._file.close()
+        self._partial_path.unlink(missing_ok=True)
@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from msys2dl.download.download_callback import DownloadCallbacks
+from msys2dl.download.download_request import DownloadRequest
+from msys2dl.utilities import AppError
+
+
+class _DownloadRecord:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.start: float | None = None
+        self.end: float | None = None
+        self.n_bytes = 0
+        self.retries: list[str] = []
+        self.spans: list[tuple[str, float, float]] = []
+        self.error: str | None = None
+
+    def on_progress(self, bytes_downloaded: int, _bytes_total: int) -> None:
+        if self.start is None:
+            self.start = time.monotonic()
+        self.n_bytes = bytes_downloaded
+
+    def on_span(self, name: str, start: float, end: float) -> None:
+        self.start = start if self.start is None else min(self.start, start)
+        self.spans.append((name, start, end))
+
+    def on_failure(self, exc: Exception) -> None:
+        self.error = exc.display() if isinstance(exc, AppError) else str(exc) or type(exc).__name__
+
+    def on_complete(self) -> None:
+        self.end = time.monotonic()
+
+
+class Tracer:
+    # Records spans in the Chrome trace event format, which chrome://tracing, Perfetto and
+    # speedscope open. Downloads run concurrently, so each one goes to the first free lane.
+    download_lane_tid = 1_000_000
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._pid = os.getpid()
+        self._start_time = time.monotonic()
+        self._lock = threading.Lock()
+        self._events: list[dict[str, Any]] = []
+        self._thread_names: dict[int, str] = {}
+        self._downloads: list[_DownloadRecord] = []
+
+    @contextmanager
+    def span(self, name: str, **args: object) -> Iterator[None]:
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            thread = threading.current_thread()
+            with self._lock:
+                self._thread_names.setdefault(thread.ident or 0, thread.name)
+                self._events.append(
+                    self._make_event(name, "phase", start, time.monotonic(), thread.ident or 0, args)
+                )
+
+    def register_callbacks(self, request: DownloadRequest, callbacks: DownloadCallbacks) -> None:
+        record = _DownloadRecord(request.name)
+        with self._lock:
+            self._downloads.append(record)
+        callbacks.progress_handlers.register(record.on_progress)
+        callbacks.span_handlers.register(record.on_span)
+        callbacks.retry_handlers.register(record.retries.append)
+        callbacks.failure_handlers.register(record.on_failure)
+        callbacks.complete_handlers.register(record.on_complete)
+
+    def write(self) -> None:
+        with self._lock:
+            events = [*self._events, *self._download_events()]
+            events.extend(
+                {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+                for tid, name in self._thread_names.items()
+            )
+        try:
+            self._path.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}), "utf-8")
+        except OSError as exc:
+            raise AppError(f"failed to write trace {self._path}: {exc}")
+
+    def _download_events(self) -> list[dict[str, Any]]:
+        # Downloads that never started have no span
+        intervals = sorted(
+            ((r.start, r.end, r) for r in self._downloads if r.start is not None and r.end is not None),
+            key=lambda interval: interval[:2],
+        )
+        lane_end_times: list[float] = []
+        events = []
+        for start, end, record in intervals:
+            lane = next(
+                (i for i, lane_end in enumerate(lane_end_times) if lane_end <= start), len(lane_end_times)
+            )
+            if lane == len(lane_end_times):
+                lane_end_times.append(end)
+                self._thread_names[self.download_lane_tid + lane] = f"download lane {lane + 1}"
+            lane_end_times[lane] = end
+            tid = self.download_lane_tid + lane
+            args: dict[str, object] = {"bytes": record.n_bytes, "retries": len(record.retries)}
+            if record.retries:
+                args["retry_errors"] = record.retries
+            if record.error is not None:
+                args["error"] = record.error
+            events.append(self._make_event(record.name, "download", start, end, tid, args))
+            events.extend(
+                self._make_event(name, "download", max(span_start, start), min(span_end, end), tid, {})
+                for name, span_start, span_end in record.spans
+            )
+        return events
+
+    def _make_event(
+        self, name: str, category: str, start: float, end: float, tid: int, args: dict[str, object]
+    ) -> dict[str, Any]:
+        return {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - self._start_time) * 1e6),
+            "dur": round((end - start) * 1e6),
+            "pid": self._pid,
+            "tid": tid,
+            "args": args,
+        }
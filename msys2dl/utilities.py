@@ -1,21 +1,13 @@
+import contextlib
+import re
+import sqlite3
 import subprocess
-from collections.abc import Iterable
+from collections.abc import Iterator
 from dataclasses import dataclass
 from pathlib import Path, PurePath
 from typing import Optional
 from urllib.parse import quote
 
-import zstandard as zstd
-from rich.console import ConsoleRenderable
-from rich.progress import (
-    BarColumn,
-    DownloadColumn,
-    MofNCompleteColumn,
-    Progress,
-    TextColumn,
-    TimeElapsedColumn,
-)
-
 
 def sanitize_file_path(path_str: str) -> PurePath:
     path = PurePath("./" + quote(path_str, safe="/"))
@@ -26,28 +18,30 @@ def sanitize_file_path(path_str: str) -> PurePath:
     return path
 
 
-class AppProgress(Progress):
-    def get_renderables(self) -> Iterable[ConsoleRenderable]:
-        for task in self.tasks:
-            progress_type = task.fields.get("progress_type")
-            if progress_type == "simple" or progress_type is None:
-                self.columns = (
-                    TextColumn("[progress.description]{task.description}"),
-                    MofNCompleteColumn(),
-                    BarColumn(),
-                    TimeElapsedColumn(),
-                )
-            if progress_type == "download":
-                self.columns = (
-                    TextColumn("[progress.description]{task.description}"),
-                    BarColumn(bar_width=None),
-                    "•",
-                    DownloadColumn(),
-                )
-            yield self.make_tasks_table([task])
+def parse_size(text: str) -> int:
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*", text, flags=re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {text}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** " KMGT".index(unit.upper() or " "))
+
+
+def format_size(n_bytes: int) -> str:
+    if n_bytes < 1024:
+        return f"{n_bytes} B"
+    size = n_bytes / 1024
+    for unit in ("KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
 
 
 def decompress_zst(inp: bytes) -> bytes:
+    # Imported on first use: zstandard is slow to import and most command lines fail or
+    # print help before any package is read
+    import zstandard as zstd
+
     decompressor = zstd.ZstdDecompressor()
     stream_reader = decompressor.stream_reader(inp)
     return stream_reader.read()
@@ -111,3 +105,22 @@ class AppError(Exception):
     @classmethod
     def wrap(cls, message: str, other: "AppError") -> "AppError":
         return cls(message=message, wrapped=other)
+
+
+@contextlib.contextmanager
+def connect_sqlite(path: Path, schema: str, description: str) -> Iterator[sqlite3.Connection]:
+    # One connection per operation: commands may run on different threads. The operation is one
+    # transaction, and SQLite errors, like a database locked by another process, raise AppError.
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path)
+    except (OSError, sqlite3.Error) as exc:
+        raise AppError(f"can't open {description} {path}: {exc}")
+    try:
+        with conn:
+            conn.executescript(schema)
+            yield conn
+    except sqlite3.Error as exc:
+        raise AppError(f"failed to access {description} {path}: {exc}")
+    finally:
+        conn.close()
@@ -0,0 +1,103 @@
+# Checks that --max-rate holds against a local mirror stand-in, with both download engines.
+#
+#   python -m unittest discover -s tests -t .
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from benchmarks.common import make_download_requests, make_signed_files, no_callbacks, timed
+from benchmarks.fake_mirror import FakeMirror
+from benchmarks.signing import ThrowawayKey
+from msys2dl.download.async_downloader import AsyncDownloader
+from msys2dl.download.download_engine import DownloadEngine
+from msys2dl.download.mirror_pool import MirrorPool
+from msys2dl.download.parallel_downloader import ParallelDownloader
+from msys2dl.download.rate_limiter import HostConnectionLimiter, TokenBucket
+from msys2dl.download.simple_downloader import SimpleDownloader
+
+MAX_RATE = 1024 * 1024
+N_PACKAGES = 8
+PACKAGE_SIZE = 256 * 1024
+N_CONCURRENT = 4
+# Allowed deviation of the achieved rate: the first burst and the connection setup skew short runs
+TOLERANCE = 0.2
+
+
+class TestRateLimit(unittest.TestCase):
+    key: ThrowawayKey
+    files: dict[str, bytes]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.key = ThrowawayKey()
+        cls.files = make_signed_files(cls.key, [PACKAGE_SIZE] * N_PACKAGES)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.key.__exit__(None, None, None)
+
+    def make_engine(self, name: str, url: str, tmp: Path, rate_limiter: TokenBucket) -> DownloadEngine:
+        keybox = self.key.make_keybox(tmp / "keybox.gpg")
+        if name == "asyncio":
+            return AsyncDownloader(
+                keybox=keybox, mirrors=MirrorPool([url]), n_concurrent=N_CONCURRENT, rate_limiter=rate_limiter
+            )
+        return ParallelDownloader(
+            downloader=SimpleDownloader(keybox, MirrorPool([url]), rate_limiter=rate_limiter),
+            n_threads=N_CONCURRENT,
+        )
+
+    def test_achieved_rate(self) -> None:
+        n_bytes = sum(len(content) for content in self.files.values())
+        for engine_name in ("threads", "asyncio"):
+            with (
+                self.subTest(engine=engine_name),
+                tempfile.TemporaryDirectory() as tmp_str,
+                FakeMirror(self.files) as mirror,
+            ):
+                tmp = Path(tmp_str)
+                engine = self.make_engine(engine_name, mirror.url, tmp, TokenBucket(MAX_RATE))
+                requests = make_download_requests(self.files, tmp)
+                try:
+                    seconds = timed(lambda: engine.execute_requests(requests, no_callbacks))
+                finally:
+                    engine.close()
+                rate = n_bytes / seconds
+                self.assertLess(abs(rate / MAX_RATE - 1), TOLERANCE, f"{rate:.0f} B/s")
+
+    def test_interrupted_wait(self) -> None:
+        # A reader in debt for 10 s stops at the next interrupt check
+        bucket = TokenBucket(MAX_RATE)
+        bucket.reserve(10 * MAX_RATE)
+        deadline = time.monotonic() + 0.3
+
+        def check_interrupted() -> None:
+            if time.monotonic() >= deadline:
+                raise InterruptedError()
+
+        start = time.monotonic()
+        with self.assertRaises(InterruptedError):
+            next(bucket.limit(iter([b"data"]), 4, check_interrupted))
+        self.assertLess(time.monotonic() - start, 0.3 + 2 * TokenBucket.wait_slice)
+
+    def test_interrupted_slot_wait(self) -> None:
+        # A request waiting for a connection to a busy host stops at the next interrupt check
+        limiter = HostConnectionLimiter(1)
+        deadline = time.monotonic() + 0.3
+
+        def check_interrupted() -> None:
+            if time.monotonic() >= deadline:
+                raise InterruptedError()
+
+        start = time.monotonic()
+        with (
+            limiter.slot("http://host/a", check_interrupted),
+            self.assertRaises(InterruptedError),
+            limiter.slot("http://host/b", check_interrupted),
+        ):
+            pass
+        self.assertLess(time.monotonic() - start, 0.3 + 2 * HostConnectionLimiter.wait_slice)
+        # The interrupted request didn't take the slot
+        with limiter.slot("http://host/c", check_interrupted):
+            pass